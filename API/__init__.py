@@ -1,28 +1,43 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
-from flask_mail import Mail
 from flask_cors import CORS
-from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
 from API.config import Config
+from API.profiling import init_lazy_load_guard
+from API.pool import init_engine_options
+from API.routing import RoutingSession, init_replica_routing
+from API.ratelimit import init_rate_limiter
+from API.integrations import init_integrations
+from API.negotiation import init_negotiation
 
 
-db = SQLAlchemy()
-mail = Mail()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 bcrypt = Bcrypt()
-migrate = Migrate()
 cors = CORS()
 
 
-def create_app():  # config_class=Config
+def create_app(config_class=Config):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_class)
+    if app.config["PROXY_FIX_HOPS"]:
+        hops = app.config["PROXY_FIX_HOPS"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
 
+    init_engine_options(app)
     db.init_app(app)
     bcrypt.init_app(app)
-    mail.init_app(app)
-    migrate.init_app(app, db)
     cors.init_app(app, supports_credentials=True)
+    init_lazy_load_guard()
+    init_replica_routing(app)
+    init_rate_limiter(app)
+    init_integrations(app)
+    init_negotiation(app)
+
+    from API.tokens import init_tokens
+    init_tokens(app)
+    from API.inventory.consumption import init_consumption
+    init_consumption(app)
 
     from API.shop.routes import shops
     from API.services.routes import services
@@ -32,6 +47,11 @@ def create_app():  # config_class=Config
     from API.notifications.routes import notifications_blueprint
     from API.equipment.routes import equipment_blueprint
     from API.employees.routes import employees_blueprint
+    from API.main.routes import main
+    from API.forecasts.routes import forecasts_blueprint
+    from API.kpis.routes import kpis_blueprint
+    from API.payroll.routes import payroll_blueprint
+    from API.organizations.routes import organizations_blueprint
     app.register_blueprint(shops)
     app.register_blueprint(services)
     app.register_blueprint(expenses)
@@ -40,5 +60,13 @@ def create_app():  # config_class=Config
     app.register_blueprint(notifications_blueprint)
     app.register_blueprint(equipment_blueprint)
     app.register_blueprint(employees_blueprint)
+    app.register_blueprint(main)
+    app.register_blueprint(forecasts_blueprint)
+    app.register_blueprint(kpis_blueprint)
+    app.register_blueprint(payroll_blueprint)
+    app.register_blueprint(organizations_blueprint)
+
+    from API.commands import register_commands
+    register_commands(app)
 
     return app
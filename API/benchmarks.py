@@ -0,0 +1,178 @@
+import random
+import statistics
+import time
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import insert
+from API import db
+from API.models import BarberShop
+from API.shop.search import search_shops, autocomplete_shops
+
+BENCHMARK_EMAIL_DOMAIN = "benchmark.invalid"
+LOCATIONS = (
+    ("Nairobi", ("Nairobi", "Westlands", "Kasarani")),
+    ("Mombasa", ("Mombasa", "Nyali", "Likoni")),
+    ("Kisumu", ("Kisumu", "Maseno")),
+    ("Nakuru", ("Nakuru", "Naivasha")),
+)
+NAME_WORDS = ("Classic", "Royal", "Sharp", "Fresh", "Kings", "Elite", "Urban", "Prime", "Fade", "Golden")
+NAME_SUFFIXES = ("Cuts", "Barbers", "Kinyozi", "Grooming", "Studio")
+
+
+def seed_benchmark_shops(count, batch_size=5000, seed=0):
+    """
+        Insert synthetic shops for benchmarking. They are recognisable by their email domain.
+        :param count: Shops to insert
+        :param batch_size: Rows per insert
+        :param seed: Random seed, so runs are comparable
+        :return: Seconds taken
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    for batch_start in range(0, count, batch_size):
+        rows = []
+        for i in range(batch_start, min(batch_start + batch_size, count)):
+            county, cities = rng.choice(LOCATIONS)
+            rows.append(dict(
+                public_id=f"bench{i:x}",
+                shop_name=f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {rng.choice(NAME_SUFFIXES)} {i}",
+                email=f"shop{i}@{BENCHMARK_EMAIL_DOMAIN}",
+                password="!",
+                phone="0",
+                county=county,
+                city=rng.choice(cities)
+            ))
+        db.session.execute(insert(BarberShop), rows)
+        db.session.commit()
+    return time.perf_counter() - started
+
+
+def remove_benchmark_shops():
+    """
+        :return: Number of synthetic shops deleted
+    """
+    deleted = BarberShop.query.filter(BarberShop.email.like(f"%@{BENCHMARK_EMAIL_DOMAIN}")) \
+        .delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def _percentiles(timings):
+    timings = sorted(timings)
+    return dict(
+        p50=statistics.median(timings),
+        p95=timings[max(0, int(len(timings) * 0.95) - 1)],
+        max=timings[-1]
+    )
+
+
+def search_benchmark(queries=200, seed=1):
+    """
+        Time the shop search and autocomplete queries the directory endpoints run
+        :param queries: Queries timed per scenario
+        :param seed: Random seed
+        :return: {scenario: dict(p50, p95, max)} in ms
+    """
+    rng = random.Random(seed)
+    words = [word.lower() for word in NAME_WORDS + NAME_SUFFIXES]
+
+    def location():
+        county, cities = rng.choice(LOCATIONS)
+        return dict(county=county, city=rng.choice(cities))
+
+    scenarios = dict(
+        name=lambda: (search_shops, dict(name=rng.choice(words))),
+        name_county_city=lambda: (search_shops, dict(name=rng.choice(words), **location())),
+        deep_page=lambda: (search_shops, dict(name=rng.choice(words), offset=rng.randrange(0, 5000, 10))),
+        autocomplete=lambda: (autocomplete_shops, dict(prefix=rng.choice(NAME_WORDS)[:rng.randint(2, 5)])),
+    )
+    results = {}
+    for scenario, make_query in scenarios.items():
+        timings = []
+        for func, kwargs in (make_query() for _ in range(queries)):
+            start = time.perf_counter()
+            func(**kwargs)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[scenario] = _percentiles(timings)
+    return results
+
+
+def load_test(url, concurrency=10, duration=10.0, headers=None):
+    """
+        Hammer a running server with concurrent keep-alive clients
+        :param url: Endpoint to request
+        :param concurrency: Number of client threads
+        :param duration: Seconds to run for
+        :param headers: Extra request headers
+        :return: Requests per second, latency percentiles in ms and error counts
+    """
+    import threading
+    import httpx
+    from concurrent.futures import ThreadPoolExecutor
+
+    latencies, errors = [], defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client_loop():
+        local_latencies, local_errors = [], defaultdict(int)
+        with httpx.Client(headers=headers, timeout=30) as client:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = client.get(url)
+                except httpx.HTTPError as e:
+                    local_errors[type(e).__name__] += 1
+                    continue
+                local_latencies.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    local_errors[str(response.status_code)] += 1
+        with lock:
+            latencies.extend(local_latencies)
+            for key, count in local_errors.items():
+                errors[key] += count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client_loop)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000, 2) if latencies else None
+
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 2),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "errors": dict(errors)
+    }
+
+
+def format_benchmark(data, repeat=50):
+    """
+        Bytes on the wire and encode time for every response format and compression pair
+        :param data: Decoded JSON document, e.g. an endpoint's response
+        :param repeat: Encodes timed per pair
+        :return: List of (format, encoding, bytes, mean encode ms)
+    """
+    from API.negotiation import X_MSGPACK, encode_body, compress_body
+
+    encodings = [None] + current_app.extensions["response_encodings"]
+    results = []
+    for mimetype in current_app.extensions["response_formats"]:
+        if mimetype == X_MSGPACK:
+            continue
+        for encoding in encodings:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                body = encode_body(data, mimetype)
+                if encoding:
+                    body = compress_body(body, encoding)
+            results.append((mimetype, encoding or "identity", len(body), (time.perf_counter() - start) / repeat * 1000))
+    return results
@@ -0,0 +1,70 @@
+import threading
+import time
+
+
+class ShopCache:
+    """
+        Small per-process cache keyed by shop id.
+        Entries live until they are invalidated or their ttl (seconds) runs out.
+        With a ttl, expired entries are swept on set at most once per ttl, so keys that are
+        never read again (past days, old months) don't accumulate.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + ttl if ttl is not None else None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, shop_id, key=None):
+        """
+            Fetch a cached value
+            :param shop_id: Barbershop id
+            :param key: Optional sub key, e.g. a date or month
+            :return: Cached value or None
+        """
+        with self._lock:
+            entry = self._entries.get((shop_id, key))
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[(shop_id, key)]
+                return None
+            return value
+
+    def set(self, shop_id, value, key=None):
+        """
+            Store a value
+            :param shop_id: Barbershop id
+            :param value: Value to cache
+            :param key: Optional sub key
+            :return: None
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._next_sweep is not None and now >= self._next_sweep:
+                self._sweep(now)
+            self._entries[(shop_id, key)] = (value, now)
+
+    def _sweep(self, now):
+        for cache_key in [cache_key for cache_key, (_, stored_at) in self._entries.items() if now - stored_at > self.ttl]:
+            del self._entries[cache_key]
+        self._next_sweep = now + self.ttl
+
+    def invalidate(self, shop_id):
+        """
+            Drop every entry cached for the shop
+            :param shop_id: Barbershop id
+            :return: None
+        """
+        with self._lock:
+            for cache_key in [cache_key for cache_key in self._entries if cache_key[0] == shop_id]:
+                del self._entries[cache_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
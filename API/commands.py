@@ -0,0 +1,258 @@
+import datetime
+import time
+import click
+from flask import current_app
+from API.profiling import profile_startup
+
+# Job modules are imported inside each command so web workers never load them (numpy in particular)
+
+
+@click.command("purge-idempotency-keys")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows deleted per statement")
+def purge_idempotency_keys_command(batch_size):
+    """Delete expired Idempotency-Key records. Run periodically, e.g. from cron."""
+    from API.idempotency import purge_expired_keys
+    start = time.perf_counter()
+    deleted = purge_expired_keys(batch_size=batch_size)
+    click.echo(f"Purged {deleted} expired idempotency keys in {time.perf_counter() - start:.2f}s")
+
+
+@click.command("purge-revoked-tokens")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows deleted per statement")
+def purge_revoked_tokens_command(batch_size):
+    """Delete expired refresh tokens and revocations of access tokens that have expired anyway."""
+    from API.tokens import purge_expired_revocations, purge_expired_refresh_tokens
+    start = time.perf_counter()
+    revocations = purge_expired_revocations(batch_size=batch_size)
+    refresh_tokens = purge_expired_refresh_tokens(batch_size=batch_size)
+    click.echo(
+        f"Purged {revocations} expired token revocations and {refresh_tokens} refresh tokens "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+
+
+@click.command("prune-notifications")
+@click.option("--days", type=int, default=None, help="Retention period. Defaults to NOTIFICATION_RETENTION_DAYS")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows deleted per statement")
+def prune_notifications_command(days, batch_size):
+    """Delete read notifications older than the retention period."""
+    from API.notifications.retention import prune_read_notifications
+    days = days if days is not None else current_app.config["NOTIFICATION_RETENTION_DAYS"]
+    start = time.perf_counter()
+    deleted = prune_read_notifications(days, batch_size=batch_size)
+    click.echo(f"Pruned {deleted} read notifications older than {days} days in {time.perf_counter() - start:.2f}s")
+
+
+@click.command("forecast-sales")
+@click.option("--history-days", type=int, default=None, help="Defaults to FORECAST_HISTORY_DAYS")
+@click.option("--horizon", type=int, default=None, help="Defaults to FORECAST_HORIZON_DAYS")
+@click.option("--chunk-size", default=500, show_default=True, help="Shops fitted per batch")
+def forecast_sales_command(history_days, horizon, chunk_size):
+    """Fit revenue forecasts for every shop and store them for the forecast endpoint."""
+    from API.forecasts.jobs import run_sales_forecasts
+    result = run_sales_forecasts(
+        history_days or current_app.config["FORECAST_HISTORY_DAYS"],
+        horizon or current_app.config["FORECAST_HORIZON_DAYS"],
+        chunk_size=chunk_size,
+        progress=lambda done, total: click.echo(f"  {done}/{total} shops")
+    )
+    click.echo(f"Forecast {result['shops']} shops, {result['rows']} rows in {result['seconds']}s")
+
+
+@click.command("compute-kpis")
+@click.option("--year", type=int, default=None, help="Defaults to the current year")
+@click.option("--month", type=click.IntRange(1, 12), default=None, help="Defaults to the current month")
+@click.option("--chunk-size", default=500, show_default=True, help="Shops processed per batch")
+def compute_kpis_command(year, month, chunk_size):
+    """Recompute the per-shop KPI summary tables for a month. Run nightly."""
+    from API.kpis.jobs import run_kpis
+    now = datetime.datetime.utcnow()
+    result = run_kpis(
+        year or now.year,
+        month or now.month,
+        chunk_size=chunk_size,
+        progress=lambda done, total: click.echo(f"  {done}/{total} shops")
+    )
+    click.echo(
+        f"KPIs for {result['shops']} shops: {result['sales_scanned']} sales scanned, "
+        f"{result['rows']} rows written in {result['seconds']}s ({result['rows_per_second']} rows/s)"
+    )
+
+
+@click.command("run-payroll")
+@click.option("--year", type=int, default=None, help="Defaults to the year of the previous month")
+@click.option("--month", type=int, default=None, help="Defaults to the previous month")
+@click.option("--chunk-size", default=500, show_default=True, help="Shops processed per batch")
+def run_payroll_command(year, month, chunk_size):
+    """Compute salaries and commissions for every shop and record them as Payroll expenses. Run monthly."""
+    from API.payroll.jobs import run_payroll
+    previous_month = datetime.datetime.utcnow().date().replace(day=1) - datetime.timedelta(days=1)
+    year = year or previous_month.year
+    month = month or previous_month.month
+    result = run_payroll(
+        year,
+        month,
+        chunk_size=chunk_size,
+        progress=lambda done, total: click.echo(f"  {done}/{total} shops")
+    )
+    click.echo(
+        f"Payroll {year}-{month:02d} for {result['shops']} shops: {result['runs']} runs, "
+        f"{result['employees']} employees, {result['total']} paid in {result['seconds']}s"
+    )
+
+
+@click.command("estimate-inventory")
+@click.option("--history-days", type=int, default=None, help="Defaults to INVENTORY_HISTORY_DAYS")
+@click.option("--chunk-size", default=500, show_default=True, help="Shops processed per batch")
+def estimate_inventory_command(history_days, chunk_size):
+    """Estimate product consumption rates and predicted low dates from the inventory history. Run nightly."""
+    from API.inventory.events import run_inventory_estimates
+    result = run_inventory_estimates(
+        history_days or current_app.config["INVENTORY_HISTORY_DAYS"],
+        chunk_size=chunk_size,
+        progress=lambda done, total: click.echo(f"  {done}/{total} shops")
+    )
+    click.echo(f"Estimated {result['products']} products for {result['shops']} shops in {result['seconds']}s")
+
+
+@click.command("apply-consumption")
+@click.option("--batch-size", default=1000, show_default=True, help="Sales applied per transaction")
+def apply_consumption_command(batch_size):
+    """Take the service recipes of recorded sales off the inventory stock. Cron fallback for INVENTORY_CONSUMPTION_ASYNC."""
+    from API.inventory.consumption import apply_pending_consumption
+    result = apply_pending_consumption(batch_size=batch_size)
+    click.echo(
+        f"Applied {result['sales']} sales to {result['products']} products, notified {result['notified_shops']} shops"
+    )
+
+
+@click.command("archive-sales")
+@click.option("--before-year", type=int, default=None,
+              help="First year kept in the hot table. Defaults to the current year minus SALES_HOT_YEARS - 1")
+@click.option("--batch-size", default=5000, show_default=True, help="Rows moved per transaction")
+def archive_sales_command(before_year, batch_size):
+    """Move sales of closed years from the sales table into the sales_archive partitions."""
+    from API.sales.archive import archive_sales
+    if before_year is None:
+        before_year = datetime.datetime.utcnow().year - current_app.config["SALES_HOT_YEARS"] + 1
+    if before_year > datetime.datetime.utcnow().year:
+        raise click.BadParameter("the current year and later stay in the hot table", param_hint="--before-year")
+    result = archive_sales(
+        before_year,
+        batch_size=batch_size,
+        progress=lambda year, moved: click.echo(f"  {year}: {moved} rows")
+    )
+    total = sum(result["moved"].values())
+    click.echo(f"Archived {total} sales from years before {before_year} in {result['seconds']}s")
+
+
+@click.command("profile-startup")
+@click.option("--runs", default=5, show_default=True, help="Cold starts measured, each in a fresh interpreter")
+@click.option("--top", default=15, show_default=True, help="Slowest top-level imports listed")
+@click.option("--budget-ms", type=float, default=None, help="Exit with status 1 if the median cold start exceeds this")
+def profile_startup_command(runs, top, budget_ms):
+    """Measure worker cold start: import-time breakdown and create_app timing."""
+    result = profile_startup(runs=runs, top=top)
+    click.echo(f"{'module':<40}{'self ms':>10}{'cumulative ms':>16}")
+    for name, self_ms, cumulative_ms in result["imports"]:
+        click.echo(f"{name:<40}{self_ms:>10.1f}{cumulative_ms:>16.1f}")
+    click.echo(
+        f"Cold start over {runs} runs (median): import API {result['import_ms']}ms, "
+        f"create_app {result['create_app_ms']}ms, total {result['total_ms']}ms"
+    )
+    if budget_ms is not None and result["total_ms"] > budget_ms:
+        click.echo(f"Cold start {result['total_ms']}ms is over the {budget_ms}ms budget")
+        raise SystemExit(1)
+
+
+@click.command("load-test")
+@click.argument("url")
+@click.option("--concurrency", default=10, show_default=True, help="Concurrent clients")
+@click.option("--duration", default=10.0, show_default=True, help="Seconds to run for")
+@click.option("--header", "headers", multiple=True, help="Extra header as 'Name: value'")
+def load_test_command(url, concurrency, duration, headers):
+    """Measure requests per second against a running server, e.g. one gunicorn profile."""
+    from API.benchmarks import load_test
+    headers = dict(h.split(":", 1) for h in headers)
+    result = load_test(url, concurrency=concurrency, duration=duration,
+                       headers={k.strip(): v.strip() for k, v in headers.items()})
+    click.echo(
+        f"{result['requests']} requests in {result['seconds']}s: {result['rps']} req/s, "
+        f"p50 {result['p50_ms']}ms, p95 {result['p95_ms']}ms, p99 {result['p99_ms']}ms"
+    )
+    if result["errors"]:
+        click.echo(f"Errors: {result['errors']}")
+
+
+@click.command("benchmark-formats")
+@click.argument("path")
+@click.option("--header", "headers", multiple=True, help="Request header as 'Name: value', e.g. the access token")
+@click.option("--repeat", default=50, show_default=True, help="Encodes timed per format")
+def benchmark_formats_command(path, headers, repeat):
+    """Compare response formats and compression for one endpoint: bytes on the wire and encode time."""
+    from API.benchmarks import format_benchmark
+    headers = {k.strip(): v.strip() for k, v in (h.split(":", 1) for h in headers)}
+    response = current_app.test_client().get(path, headers=headers)
+    if response.mimetype != "application/json":
+        raise click.ClickException(f"{path} returned {response.status_code} {response.mimetype}")
+    click.echo(f"{'format':<42}{'encoding':<10}{'bytes':>10}{'encode ms':>12}")
+    for mimetype, encoding, size, encode_ms in format_benchmark(response.get_json(), repeat=repeat):
+        click.echo(f"{mimetype:<42}{encoding:<10}{size:>10}{encode_ms:>12.3f}")
+
+
+@click.command("benchmark-search")
+@click.option("--shops", default=100000, show_default=True, help="Synthetic shops seeded before timing")
+@click.option("--queries", default=200, show_default=True, help="Queries timed per scenario")
+@click.option("--keep/--cleanup", default=False, help="Keep the synthetic shops for further runs")
+def benchmark_search_command(shops, queries, keep):
+    """Seed synthetic shops and time the shop directory search and autocomplete. Never run against production."""
+    from API.benchmarks import seed_benchmark_shops, remove_benchmark_shops, search_benchmark
+    if shops:
+        click.echo(f"Seeded {shops} shops in {seed_benchmark_shops(shops):.1f}s")
+    try:
+        click.echo(f"{'scenario':<20}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for scenario, timing in search_benchmark(queries=queries).items():
+            click.echo(f"{scenario:<20}{timing['p50']:>10.2f}{timing['p95']:>10.2f}{timing['max']:>10.2f}")
+    finally:
+        if not keep:
+            click.echo(f"Removed {remove_benchmark_shops()} synthetic shops")
+
+
+@click.command("calibrate-password-hash")
+@click.option("--target-ms", type=int, default=None, help="Target verification time. Defaults to PASSWORD_HASH_TARGET_MS")
+@click.option("--samples", default=3, show_default=True, help="Verifications timed per cost")
+@click.option("--save/--dry-run", default=True, help="Record the chosen cost as the password policy")
+def calibrate_password_hash_command(target_ms, samples, save):
+    """Benchmark bcrypt costs on this machine and pick the highest within the target verification time."""
+    from API.passwords import calibrate, record_policy
+    target_ms = target_ms or current_app.config["PASSWORD_HASH_TARGET_MS"]
+    cost, timings = calibrate(target_ms, current_app.config["PASSWORD_HASH_MIN_COST"], samples=samples)
+    for candidate, ms in timings.items():
+        click.echo(f"  cost {candidate:>2}: {ms:8.1f}ms{'  <- chosen' if candidate == cost else ''}")
+    if timings[cost] > target_ms:
+        click.echo(f"Even the minimum cost {cost} is slower than {target_ms}ms on this machine")
+    if save:
+        record_policy(cost, target_ms, timings[cost])
+        click.echo(f"Password policy set to cost {cost}. Existing hashes are upgraded on next login")
+
+
+def register_commands(app):
+    """
+        Register the maintenance and batch CLI commands on the app
+        :param app: Flask app
+        :return: None
+    """
+    app.cli.add_command(purge_idempotency_keys_command)
+    app.cli.add_command(purge_revoked_tokens_command)
+    app.cli.add_command(prune_notifications_command)
+    app.cli.add_command(forecast_sales_command)
+    app.cli.add_command(compute_kpis_command)
+    app.cli.add_command(run_payroll_command)
+    app.cli.add_command(estimate_inventory_command)
+    app.cli.add_command(apply_consumption_command)
+    app.cli.add_command(archive_sales_command)
+    app.cli.add_command(profile_startup_command)
+    app.cli.add_command(load_test_command)
+    app.cli.add_command(benchmark_formats_command)
+    app.cli.add_command(benchmark_search_command)
+    app.cli.add_command(calibrate_password_hash_command)
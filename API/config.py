@@ -1,11 +1,112 @@
 import os
 
 
+def _optional_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def _bool(name, default):
+    value = os.environ.get(name)
+    return default if value is None else value.lower() in ("1", "true", "yes")
+
+
+def _keys(name):
+    # "kid:secret,kid:secret"
+    entries = [entry.split(":", 1) for entry in os.environ.get(name, "").split(",") if entry.strip()]
+    return {kid.strip(): secret.strip() for kid, secret in entries}
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET')
+    # Token signing keys by kid. Tokens are signed with JWT_ACTIVE_KID; every listed key still verifies,
+    # so a new key can be added, made active, and the old one removed once its tokens expire.
+    # Without keys, SECRET signs tokens under the "default" kid.
+    JWT_KEYS = _keys('KINYOZI_JWT_KEYS')
+    JWT_ACTIVE_KID = os.environ.get('KINYOZI_JWT_ACTIVE_KID')
+    ACCESS_TOKEN_MINUTES = int(os.environ.get('ACCESS_TOKEN_MINUTES', 120))
+    # Refresh tokens let clients get new access tokens without logging in again
+    REFRESH_TOKEN_DAYS = int(os.environ.get('REFRESH_TOKEN_DAYS', 30))
+    # Password hashing. 'flask calibrate-password-hash' picks the highest bcrypt cost that verifies within
+    # PASSWORD_HASH_TARGET_MS on this hardware; PASSWORD_HASH_COST overrides it, BCRYPT_LOG_ROUNDS applies
+    # until a calibration is recorded. Hashes with another cost are rehashed on the next login.
+    PASSWORD_HASH_TARGET_MS = int(os.environ.get('PASSWORD_HASH_TARGET_MS', 250))
+    PASSWORD_HASH_MIN_COST = int(os.environ.get('PASSWORD_HASH_MIN_COST', 10))
+    PASSWORD_HASH_COST = _optional_int('PASSWORD_HASH_COST')
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    PASSWORD_POLICY_REFRESH_SECONDS = int(os.environ.get('PASSWORD_POLICY_REFRESH_SECONDS', 300))
+    # How often each worker pulls token revocations made by other workers
+    TOKEN_REVOCATION_SYNC_SECONDS = int(os.environ.get('TOKEN_REVOCATION_SYNC_SECONDS', 30))
     SQLALCHEMY_DATABASE_URI = os.environ.get('KINYOZI_DB')  # "sqlite:///app.db"
+    # Optional read replica. GET requests read from it unless the client wrote recently.
+    SQLALCHEMY_BINDS = {'replica': os.environ['KINYOZI_REPLICA_DB']} if os.environ.get('KINYOZI_REPLICA_DB') else {}
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+    # Connection pool, per gunicorn worker. Ignored for SQLite.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = _bool('DB_POOL_PRE_PING', True)
+    DB_STATEMENT_TIMEOUT_MS = _optional_int('DB_STATEMENT_TIMEOUT_MS')  # Postgres only
+    # Readiness probe fails once this share of the pool is checked out
+    DB_POOL_SATURATION_THRESHOLD = float(os.environ.get('DB_POOL_SATURATION_THRESHOLD', 0.9))
     MAIL_SERVER = 'smtp.googlemail.com'
     MAIL_PORT = 587
     MAIL_USE_TLS = True
     MAIL_USERNAME = os.environ.get('EMAIL_ADDRESS')
     MAIL_PASSWORD = os.environ.get('EMAIL_PASSWORD')
+    # Mobile app backend proxied by the barbers/appointments routes
+    MOBILE_APP_URL = os.environ.get('KINYOZI_MOBILE_URL', 'https://app.mykinyozi.com/api')
+    MOBILE_APP_TIMEOUT = float(os.environ.get('KINYOZI_MOBILE_TIMEOUT', 10))
+    # Per-worker cap on mobile app calls in flight. Each proxy call holds one of the worker's
+    # threads until upstream answers, so by default half of GUNICORN_THREADS stays free for other routes.
+    MOBILE_APP_MAX_CONCURRENCY = int(os.environ.get(
+        'KINYOZI_MOBILE_MAX_CONCURRENCY', max(int(os.environ.get('GUNICORN_THREADS', 4)) // 2, 1)
+    ))
+    # Reverse proxies in front of the app. When set, the client address (used by the rate limiter for
+    # anonymous requests) and scheme are read from the X-Forwarded-* headers they add. 0 trusts none.
+    PROXY_FIX_HOPS = int(os.environ.get('PROXY_FIX_HOPS', 0))
+    RATELIMIT_ENABLED = _bool('RATELIMIT_ENABLED', True)
+    RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL')  # e.g. redis://localhost:6379/0
+    # Token bucket rate limits as "<requests>/<seconds>" per logged-in shop or employee (or client address)
+    # and route class
+    RATELIMIT_CLASSES = {
+        'read': os.environ.get('RATELIMIT_READ', '300/60'),
+        'write': os.environ.get('RATELIMIT_WRITE', '120/60'),
+        'dashboard': os.environ.get('RATELIMIT_DASHBOARD', '30/60'),
+        'auth': os.environ.get('RATELIMIT_AUTH', '10/60'),
+    }
+    # How long create responses are kept for Idempotency-Key replays
+    IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+    # How long a key stays claimed by a request in progress. Retries take the key over after this, so a
+    # worker that died mid-request doesn't block its key. Keep it above the request timeout (GUNICORN_TIMEOUT).
+    IDEMPOTENCY_LEASE_SECONDS = int(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', 60))
+    # Read notifications older than this are removed by 'flask prune-notifications'
+    NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 90))
+    # Revenue forecasting batch job
+    FORECAST_HISTORY_DAYS = int(os.environ.get('FORECAST_HISTORY_DAYS', 84))
+    FORECAST_HORIZON_DAYS = int(os.environ.get('FORECAST_HORIZON_DAYS', 35))
+    # Inventory history used by 'flask estimate-inventory' to estimate consumption rates
+    INVENTORY_HISTORY_DAYS = int(os.environ.get('INVENTORY_HISTORY_DAYS', 180))
+    # Stock share at or below which a product with a capacity is LOW (2) and CRITICALLY LOW (1)
+    INVENTORY_LOW_RATIO = float(os.environ.get('INVENTORY_LOW_RATIO', 0.5))
+    INVENTORY_CRITICAL_RATIO = float(os.environ.get('INVENTORY_CRITICAL_RATIO', 0.2))
+    # Recorded sales are taken off the stock by a background thread per worker, after this delay so
+    # sales arriving together are applied in one batch. When off, run 'flask apply-consumption' from cron.
+    INVENTORY_CONSUMPTION_ASYNC = _bool('INVENTORY_CONSUMPTION_ASYNC', True)
+    INVENTORY_CONSUMPTION_DELAY_SECONDS = float(os.environ.get('INVENTORY_CONSUMPTION_DELAY_SECONDS', 2))
+    # Expense account payroll runs are recorded on, created per shop on its first run
+    PAYROLL_EXPENSE_ACCOUNT = os.environ.get('PAYROLL_EXPENSE_ACCOUNT', 'Payroll')
+    # Years of sales kept in the hot sales table (current year included) by 'flask archive-sales'
+    SALES_HOT_YEARS = int(os.environ.get('SALES_HOT_YEARS', 2))
+    # Straight-line depreciation period used by the equipment asset value report
+    EQUIPMENT_USEFUL_LIFE_YEARS = int(os.environ.get('EQUIPMENT_USEFUL_LIFE_YEARS', 5))
+    # JSON responses at least this large are compressed with brotli or gzip when the client accepts it
+    COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+    # Import mail, migrations, the mobile app client, numpy and the response encoders on first use, not at worker boot.
+    # Turn off when the server preloads the app before forking workers.
+    LAZY_INTEGRATIONS = _bool('KINYOZI_LAZY_INTEGRATIONS', True)
+    # Maximum lazy loads allowed per request when TESTING is on. None disables the guard.
+    LAZY_LOAD_LIMIT = _optional_int('KINYOZI_LAZY_LOAD_LIMIT')
@@ -0,0 +1,119 @@
+import datetime
+from sqlalchemy import event, func
+from API import db
+from API.cache import ShopCache
+from API.models import Sale, SaleArchive, Service
+
+TOP_SERVICES = 5
+MAX_PERFORMANCE_MONTHS = 36
+# Closed months only change when a sale or service of the shop is edited or deleted. This worker drops
+# them right away; the ttl bounds how long other workers keep serving the old numbers.
+performance_cache = ShopCache(ttl=3600)
+
+
+def last_months(today, count):
+    """
+        :param today: Reference date
+        :param count: Number of months, the current one included
+        :return: list of (year, month), oldest first
+    """
+    months = []
+    year, month = today.year, today.month
+    for _ in range(count):
+        months.append((year, month))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return months[::-1]
+
+
+def compute_months(shop_id, employee_id, months):
+    """
+        Sales count and revenue per month and service for one employee, from one grouped query per table
+        :param shop_id: Barbershop id
+        :param employee_id: Employee id
+        :param months: list of (year, month), oldest first
+        :return: {(year, month): dict(sales, revenue, services={service_id: [name, sales, revenue]})}
+    """
+    first, last = months[0], months[-1]
+    stats = {period: dict(sales=0, revenue=0, services={}) for period in months}
+    for model in (Sale, SaleArchive):
+        rows = (
+            db.session.query(
+                model.year, model.month, Service.id, Service.service,
+                func.count(model.id), func.coalesce(func.sum(Service.charges), 0)
+            )
+            .join(Service, model.service_id == Service.id)
+            .filter(
+                model.shop_id == shop_id,
+                model.employee_id == employee_id,
+                model.year.between(first[0], last[0]),
+                model.year * 100 + model.month >= first[0] * 100 + first[1],
+                model.year * 100 + model.month <= last[0] * 100 + last[1]
+            )
+            .group_by(model.year, model.month, Service.id, Service.service)
+            .all()
+        )
+        for year, month, service_id, service, sales, revenue in rows:
+            period = stats.get((year, month))
+            if period is None:
+                # Cached month inside the queried range
+                continue
+            period["sales"] += sales
+            period["revenue"] += revenue
+            totals = period["services"].setdefault(service_id, [service, 0, 0])
+            totals[1] += sales
+            totals[2] += revenue
+    return stats
+
+
+def employee_performance(shop_id, employee_id, months=6, today=None):
+    """
+        Sales count, revenue, top services and monthly trend of one employee.
+        Closed months come from the cache, only the missing ones and the current month are queried.
+        :param shop_id: Barbershop id
+        :param employee_id: Employee id
+        :param months: Months covered, the current one included
+        :param today: Reference date, defaults to the current UTC date
+        :return: dict
+    """
+    periods = last_months(today or datetime.datetime.utcnow().date(), months)
+    current = periods[-1]
+    stats = {}
+    for period in periods[:-1]:
+        cached = performance_cache.get(shop_id, (employee_id, period))
+        if cached is not None:
+            stats[period] = cached
+
+    missing = [period for period in periods if period not in stats]
+    for period, values in compute_months(shop_id, employee_id, missing).items():
+        stats[period] = values
+        if period != current:
+            performance_cache.set(shop_id, values, (employee_id, period))
+
+    services = {}
+    for period in periods:
+        for service_id, (service, sales, revenue) in stats[period]["services"].items():
+            totals = services.setdefault(service_id, dict(id=service_id, service=service, sales=0, revenue=0))
+            totals["sales"] += sales
+            totals["revenue"] += revenue
+
+    sales_count = sum(stats[period]["sales"] for period in periods)
+    revenue = sum(stats[period]["revenue"] for period in periods)
+    return dict(
+        sales_count=sales_count,
+        revenue=revenue,
+        average_ticket=round(revenue / sales_count, 2) if sales_count else 0,
+        top_services=sorted(services.values(), key=lambda row: row["revenue"], reverse=True)[:TOP_SERVICES],
+        trend=dict(
+            months=[f"{year}-{month:02d}" for year, month in periods],
+            sales=[stats[period]["sales"] for period in periods],
+            revenue=[stats[period]["revenue"] for period in periods]
+        )
+    )
+
+
+@event.listens_for(Sale, "after_update")
+@event.listens_for(Sale, "after_delete")
+@event.listens_for(Service, "after_update")
+@event.listens_for(Service, "after_delete")
+def invalidate_performance(mapper, connection, target):
+    performance_cache.invalidate(target.shop_id)
@@ -1,20 +1,24 @@
 from flask import Blueprint, request, jsonify, make_response
 from API.models import Employee, Service
 from API import db, bcrypt
-import os
-import jwt
 from API.serializer import serialize_employee, serialize_services, serialize_inventory
 import secrets
 from ..utils import shop_login_required, \
-    send_employee_created_email, employee_login_required, auth_mobile_app, verify_api_key
+    send_employee_created_email, employee_login_required, verify_api_key
+from ..mobile import mobile_app_request, mobile_app_errors
+from ..idempotency import idempotent
+from ..ratelimit import rate_limit_class
+from ..tokens import issue_session
+from ..passwords import hash_password, verify_password
+from .performance import employee_performance, MAX_PERFORMANCE_MONTHS
 import datetime
-import requests
 
 employees_blueprint = Blueprint("employees", __name__, url_prefix="/API/employees")
 
 
 @employees_blueprint.route("/create/<string:public_id>", methods=["POST"])
 @shop_login_required
+@idempotent
 def create_employee(current_user, public_id):
     """
         Create new Employee from shop dashboard
@@ -78,6 +82,7 @@ def fetch_employees(current_user, public_id):
 
 
 @employees_blueprint.route("/setup", methods=["PUT"])
+@rate_limit_class("auth")
 @verify_api_key
 def setup_account_password():
     """
@@ -89,7 +94,7 @@ def setup_account_password():
     if not employee:
         return jsonify(dict(message="Not Found")), 404
 
-    hashed_password = bcrypt.generate_password_hash(data["password"].strip()).decode("utf-8")
+    hashed_password = hash_password(data["password"].strip())
     employee.password = hashed_password
     employee.active = True
     db.session.commit()
@@ -105,11 +110,10 @@ def remove_employee(current_user, staff_id):
         :param current_user: Logged in shop owner
         :return: 401, 404, 200
     """
-    employee = Employee.query.filter_by(id=staff_id).first()
+    employee = Employee.for_shop(current_user).filter_by(id=staff_id).first()
     if not employee:
-        return jsonify(dict(message="Employee doesn't exist")), 404
-
-    if employee.shop_id != current_user.id:
+        if not Employee.exists(staff_id):
+            return jsonify(dict(message="Employee doesn't exist")), 404
         return jsonify(dict(message="Not allowed")), 401
 
     data = request.get_json()
@@ -149,11 +153,10 @@ def update_employee(current_user, staff_id):
         :param staff_id: employee public id
         :return: 404, 401, 200
     """
-    employee = Employee.query.filter_by(id=staff_id).first()
+    employee = Employee.for_shop(current_user).filter_by(id=staff_id).first()
     if not employee:
-        return jsonify(dict(message="Not Found")), 404
-
-    if employee.shop_id != current_user.id:
+        if not Employee.exists(staff_id):
+            return jsonify(dict(message="Not Found")), 404
         return jsonify(dict(message="Not Allowed")), 401
 
     data = request.get_json()
@@ -195,31 +198,27 @@ def fetch_single_employee(current_user, public_id):
 
 
 @employees_blueprint.route("/login", methods=["POST"])
+@rate_limit_class("auth")
 def employee_login():
     """
         Employee Login
         :return: 401, 404, 200
     """
     auth = request.get_json()
-    employee = Employee.query.filter_by(email=auth["username"].strip()).first()
+    employee = Employee.query.options(*Employee.load_profile("shop")).filter_by(email=auth["username"].strip()).first()
     if not auth or not auth["password"] or not auth["username"]:
         return make_response("Could not verify", 401, {"WWW.Authenticate": "Basic realm=Login required!"})
     if not employee:
         return make_response("Incorrect Email", 404, {"WWW.Authenticate": "Basic realm=Login required!"})
     if not employee.password:
         return make_response("Password not Set", 401, {"WWW.Authenticate": "Basic realm=Login required!"})
-    if bcrypt.check_password_hash(employee.password, auth["password"].strip()):
-        token = jwt.encode(
-            {
-                "public_id": employee.public_id,
-                "exp": datetime.datetime.utcnow() + datetime.timedelta(minutes=120)
-            },
-            os.environ.get('SECRET'),
-            algorithm="HS256"
-        )
-        return jsonify(
-            {"Token": token, "public_id": employee.public_id, "shop_id": employee.shop.public_id, "role": employee.role}
-        ), 200
+    if verify_password(employee, auth["password"].strip()):
+        return jsonify(dict(
+            issue_session(employee, "employee"),
+            public_id=employee.public_id,
+            shop_id=employee.shop.public_id,
+            role=employee.role
+        )), 200
     else:
         return make_response("Incorrect password", 401, {"WWW.Authenticate": "Basic realm=Login required!"})
 
@@ -227,22 +226,18 @@ def employee_login():
 # BARBERS
 @employees_blueprint.route("/barbers/all/<string:public_id>", methods=["GET"])
 @shop_login_required
+@mobile_app_errors
 def fetch_all_barbers(current_user, public_id):
     """
         Fetch all barbers for a specific shop
         :param current_user: Logged In shop owner
         :param public_id: shop public_id
-        :return: 401, 200
+        :return: 401, 200, 502, 503, 504
     """
     if current_user.public_id != public_id:
         return jsonify(dict(message="Not allowed")), 401
 
-    token = auth_mobile_app()
-    url = r"https://app.mykinyozi.com/api/mobile/barbers"
-    headers = {
-        "Authorization": f"Bearer {token}"
-    }
-    response = requests.get(url, headers=headers)
+    response = mobile_app_request("GET", "/mobile/barbers")
     if response.status_code == 200:
         barbers = response.json().get("data")
     else:
@@ -258,25 +253,19 @@ def fetch_all_barbers(current_user, public_id):
 
 @employees_blueprint.route("/barbers/verify/<string:barber_id>", methods=["PUT"])
 @shop_login_required
+@mobile_app_errors
 def verify_barber(current_user, barber_id):
     """
         Verify Barber
         :param current_user:
         :param barber_id:
-        :return: 400, 200
+        :return: 400, 200, 502, 503, 504
     """
-    token = auth_mobile_app()
-    url = f"https://app.mykinyozi.com/api/mobile/barbers/{barber_id}"
-    headers = {
-        "Authorization": f"Bearer {token}"
-    }
-    data = {"status": "ACTIVE"}
-
     password = request.get_json()["password"]
     if not bcrypt.check_password_hash(current_user.password, password):
         return jsonify(dict(error="Incorrect Password"))
 
-    response = requests.put(url, json=data, headers=headers)
+    response = mobile_app_request("PUT", f"/mobile/barbers/{barber_id}", json={"status": "ACTIVE"})
     if response.status_code != 200:
         return jsonify(response.json()), response.status_code
     return jsonify(response.json()), 200
@@ -284,25 +273,19 @@ def verify_barber(current_user, barber_id):
 
 @employees_blueprint.route("/barbers/deactivate/<string:barber_id>", methods=["PUT"])
 @shop_login_required
+@mobile_app_errors
 def deactivate_barber(current_user, barber_id):
     """
         Deactivate barber
         :param current_user:
         :param barber_id:
-        :return: 400, 200
+        :return: 400, 200, 502, 503, 504
     """
-    token = auth_mobile_app()
-    url = f"https://app.mykinyozi.com/api/mobile/barbers/{barber_id}"
-    headers = {
-        "Authorization": f"Bearer {token}"
-    }
-    data = {"status": "INACTIVE"}
-
     password = request.get_json()["password"]
     if not bcrypt.check_password_hash(current_user.password, password):
         return jsonify(dict(error="Incorrect Password"))
 
-    response = requests.put(url, json=data, headers=headers)
+    response = mobile_app_request("PUT", f"/mobile/barbers/{barber_id}", json={"status": "INACTIVE"})
     if response.status_code != 200:
         return jsonify(response.json()), response.status_code
     return jsonify(response.json()), 200
@@ -310,22 +293,18 @@ def deactivate_barber(current_user, barber_id):
 
 @employees_blueprint.route("/barbers/appointments/<string:public_id>", methods=["GET"])
 @shop_login_required
+@mobile_app_errors
 def appointments(current_user, public_id):
     """
         Get barbers' appointments
         :param current_user: Logged in shop owner
         :param public_id: Shop public_id
-        :return: 401, 200
+        :return: 401, 200, 502, 503, 504
     """
     if current_user.public_id != public_id:
         return jsonify(dict(message="Not Allowed")), 401
 
-    token = auth_mobile_app()
-    url = f"https://app.mykinyozi.com/api/mobile/appointments/barbershop/{current_user.id}"
-    headers = {
-        "Authorization": f"Bearer {token}"
-    }
-    response = requests.get(url, headers=headers)
+    response = mobile_app_request("GET", f"/mobile/appointments/barbershop/{current_user.id}")
     if response.status_code == 200:
         appointments = response.json().get("data")
     else:
@@ -355,3 +334,47 @@ def appointments(current_user, public_id):
         )
         all_appointments.append(appointment_details)
     return jsonify(dict(data=all_appointments)), 200
+
+
+@employees_blueprint.route("/performance/<int:staff_id>", methods=["GET"])
+@rate_limit_class("dashboard")
+@shop_login_required
+def fetch_employee_performance(current_user, staff_id):
+    """
+        Sales count, revenue, top services and monthly trend of a barber over the last ?months= (default 6)
+        :param current_user: Logged in shop owner
+        :param staff_id: Employee id
+        :return: 404, 401, 400, 200
+    """
+    employee = Employee.for_shop(current_user).filter_by(id=staff_id).first()
+    if not employee:
+        if not Employee.exists(staff_id):
+            return jsonify(dict(message="Employee doesn't exist")), 404
+        return jsonify(dict(message="Not allowed")), 401
+
+    months = request.args.get("months", 6, type=int)
+    if not 1 <= months <= MAX_PERFORMANCE_MONTHS:
+        return jsonify(dict(message=f"months must be between 1 and {MAX_PERFORMANCE_MONTHS}")), 400
+
+    performance = employee_performance(current_user.id, employee.id, months)
+    return jsonify(dict(employee=serialize_employee(employee), **performance)), 200
+
+
+@employees_blueprint.route("/my-performance/<string:public_id>", methods=["GET"])
+@rate_limit_class("dashboard")
+@employee_login_required
+def fetch_my_performance(current_user, public_id):
+    """
+        Performance of the logged-in barber over the last ?months= (default 6)
+        :param current_user: Logged in employee
+        :param public_id: Employee public_id
+        :return: 401, 400, 200
+    """
+    if current_user.public_id != public_id:
+        return jsonify(dict(message="Not Allowed")), 401
+
+    months = request.args.get("months", 6, type=int)
+    if not 1 <= months <= MAX_PERFORMANCE_MONTHS:
+        return jsonify(dict(message=f"months must be between 1 and {MAX_PERFORMANCE_MONTHS}")), 400
+
+    return jsonify(employee_performance(current_user.shop_id, current_user.id, months)), 200
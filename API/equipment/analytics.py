@@ -0,0 +1,113 @@
+import datetime
+from flask import current_app
+from sqlalchemy import event, func, case, literal, select, Float
+from API import db
+from API.cache import ShopCache
+from API.models import Equipment
+
+# Other workers don't see the invalidation below; the ttl bounds how long they serve an old report
+depreciation_cache = ShopCache(ttl=3600)
+
+
+def equipment_stats(shop):
+    """
+        Cost, faulty count, oldest and newest equipment computed in a single aggregate query
+        :param shop: BarberShop
+        :return: dict
+    """
+    def name_by_date(order):
+        return (
+            select(Equipment.equipment_name)
+            .where(Equipment.shop_id == shop.id, Equipment.bought_on.isnot(None))
+            .order_by(order)
+            .limit(1)
+            .scalar_subquery()
+        )
+
+    row = db.session.query(
+        func.coalesce(func.sum(Equipment.price), 0).label("cost"),
+        func.coalesce(func.sum(case((Equipment.faulty.is_(True), 1), else_=0)), 0).label("faulty"),
+        name_by_date(Equipment.bought_on).label("oldest"),
+        name_by_date(Equipment.bought_on.desc()).label("newest"),
+    ).filter(Equipment.shop_id == shop.id).one()
+
+    return dict(cost=row.cost, faulty=row.faulty, oldest=row.oldest, newest=row.newest)
+
+
+def _age_in_days(now):
+    """
+        SQL expression for the age of each equipment in days
+        :param now: Reference datetime
+        :return: SQL expression
+    """
+    if db.engine.dialect.name == "sqlite":
+        return func.julianday(literal(now)) - func.julianday(Equipment.bought_on)
+    return func.extract("epoch", literal(now) - Equipment.bought_on) / 86400
+
+
+def depreciation_report(shop, today=None):
+    """
+        Straight-line depreciation of every equipment by bought_on.
+        Results are cached per shop and day until the shop's equipment changes, for an hour at most.
+        :param shop: BarberShop
+        :param today: Reference date, defaults to the current UTC date
+        :return: dict
+    """
+    today = today or datetime.datetime.utcnow().date()
+    report = depreciation_cache.get(shop.id, today)
+    if report is not None:
+        return report
+
+    useful_life_years = current_app.config["EQUIPMENT_USEFUL_LIFE_YEARS"]
+    life_days = useful_life_years * 365.25
+    now = datetime.datetime.combine(today, datetime.time())
+
+    age = func.coalesce(_age_in_days(now), 0).cast(Float)
+    depreciation = case(
+        (age <= 0, 0),
+        (age >= life_days, Equipment.price),
+        else_=Equipment.price * age / life_days
+    )
+    rows = (
+        db.session.query(
+            Equipment.id,
+            Equipment.equipment_name,
+            Equipment.bought_on,
+            Equipment.price,
+            age.label("age_days"),
+            depreciation.label("depreciation"),
+            (Equipment.price - depreciation).label("book_value"),
+        )
+        .filter(Equipment.shop_id == shop.id)
+        .order_by(Equipment.bought_on)
+        .all()
+    )
+
+    items = []
+    for row in rows:
+        items.append(dict(
+            id=row.id,
+            equipment=row.equipment_name,
+            bought_on=row.bought_on.strftime("%Y-%m-%d") if row.bought_on else None,
+            price=row.price,
+            age_days=int(row.age_days),
+            depreciation=round(row.depreciation, 2),
+            book_value=round(row.book_value, 2)
+        ))
+    report = dict(
+        as_of=today.strftime("%Y-%m-%d"),
+        useful_life_years=useful_life_years,
+        total_cost=sum(item["price"] for item in items),
+        total_depreciation=round(sum(item["depreciation"] for item in items), 2),
+        total_book_value=round(sum(item["book_value"] for item in items), 2),
+        equipments=items
+    )
+    depreciation_cache.set(shop.id, report, today)
+    return report
+
+
+@event.listens_for(Equipment, "after_insert")
+@event.listens_for(Equipment, "after_update")
+@event.listens_for(Equipment, "after_delete")
+def invalidate_depreciation(mapper, connection, target):
+    depreciation_cache.invalidate(target.shop_id)
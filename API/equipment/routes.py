@@ -3,12 +3,16 @@ from API import db, bcrypt
 from API.models import Equipment
 from ..utils import shop_login_required
 from ..serializer import serialize_equipment
+from .analytics import equipment_stats, depreciation_report
+from ..idempotency import idempotent
+from ..ratelimit import rate_limit_class
 
 equipment_blueprint = Blueprint("equipment", __name__, url_prefix="/API/equipments")
 
 
 @equipment_blueprint.route("/create/<string:public_id>", methods=["POST"])
 @shop_login_required
+@idempotent
 def new_equipment(current_user, public_id):
     """
         Record new equipment
@@ -42,28 +46,27 @@ def fetch_all_equipments(current_user, public_id):
         :param public_id: Barbershop public_ID
         :return: 401, 200
     """
-    equipment_cost = 0
-    faulty_equipment = 0
     if current_user.public_id != public_id:
         return jsonify(dict(message="Not allowed")), 401
     all_equipments = []
-    equipments_query = current_user.equipments.order_by(Equipment.bought_on)
-    for equipment in equipments_query:
-        equipment_cost += equipment.price
-        if equipment.faulty:
-            faulty_equipment += 1
+    for equipment in current_user.equipments.order_by(Equipment.bought_on):
         all_equipments.append(serialize_equipment(equipment))
-    oldest_equipment = equipments_query[0].equipment_name
-    newest_equipment = current_user.equipments.order_by(Equipment.bought_on.desc()).first()
-    return jsonify(dict(
-        equipments=all_equipments,
-        stats={
-            "cost": equipment_cost,
-            "faulty": faulty_equipment,
-            "oldest": oldest_equipment,
-            "newest": newest_equipment.equipment_name
-    }
-    )), 200
+    return jsonify(dict(equipments=all_equipments, stats=equipment_stats(current_user))), 200
+
+
+@equipment_blueprint.route("/depreciation/<string:public_id>", methods=["GET"])
+@rate_limit_class("dashboard")
+@shop_login_required
+def equipment_depreciation(current_user, public_id):
+    """
+        Straight-line depreciation and current asset value of the barbershop's equipment
+        :param current_user: currently logged-in user
+        :param public_id: Barbershop public_ID
+        :return: 401, 200
+    """
+    if current_user.public_id != public_id:
+        return jsonify(dict(message="Not allowed")), 401
+    return jsonify(depreciation_report(current_user)), 200
 
 
 @equipment_blueprint.route("/faulty/<int:equipment_id>", methods=["PUT"])
@@ -75,10 +78,10 @@ def mark_as_faulty(current_user, equipment_id):
         :param equipment_id: Equipment ID
         :return: 404, 401, 200
     """
-    equipment = Equipment.query.filter_by(id=equipment_id).first()
+    equipment = Equipment.for_shop(current_user).filter_by(id=equipment_id).first()
     if not equipment:
-        return jsonify(message="Not Found"), 404
-    if current_user.public_id != equipment.shop.public_id:
+        if not Equipment.exists(equipment_id):
+            return jsonify(message="Not Found"), 404
         return jsonify(dict(message="Not allowed")), 401
 
     data = request.get_json()
@@ -99,11 +102,10 @@ def remove_equipment(current_user, equipment_id):
         :param equipment_id: Equipment ID
         :return: 404, 401, 200
     """
-    equipment = Equipment.query.filter_by(id=equipment_id).first()
+    equipment = Equipment.for_shop(current_user).filter_by(id=equipment_id).first()
     if not equipment:
-        return jsonify(message="Not Found"), 404
-
-    if current_user.public_id != equipment.shop.public_id:
+        if not Equipment.exists(equipment_id):
+            return jsonify(message="Not Found"), 404
         return jsonify(dict(message="Not allowed")), 401
 
     data = request.get_json()
@@ -2,14 +2,18 @@ from flask import Blueprint, request, jsonify
 from API.models import ExpenseAccounts, BarberShop, Expenses
 from API import db, bcrypt
 import datetime
+from sqlalchemy import func
 from ..utils import shop_login_required, verify_api_key
 from ..serializer import serialize_accounts, serialize_expenses
+from ..idempotency import idempotent
+from ..ratelimit import rate_limit_class
 
 expenses = Blueprint('expenses', __name__)
 
 
 @expenses.route("/API/expense-account/create/<string:public_id>", methods=["POST"])
 @shop_login_required
+@idempotent
 def create_expense_account(current_user, public_id):
     """
         Create expense accounts for the barbershop
@@ -22,7 +26,9 @@ def create_expense_account(current_user, public_id):
     if current_user.public_id != public_id:
         return jsonify(dict(message="Permission Denied")), 401
 
-    if data["accountName"].strip().lower() in [acc.account_name.lower() for acc in current_user.expense_accounts]:
+    account_exists = ExpenseAccounts.for_shop(current_user) \
+        .filter(func.lower(ExpenseAccounts.account_name) == data["accountName"].strip().lower()).first()
+    if account_exists:
         return jsonify(dict(
             message=f"{data['accountName']} account already exists."
         )), 409
@@ -64,11 +70,10 @@ def update_expense_account(current_user, account_id):
         :return: 404, 401, 200
     """
     data = request.get_json()
-    expense_account = ExpenseAccounts.query.filter_by(id=account_id).first()
+    expense_account = ExpenseAccounts.for_shop(current_user).filter_by(id=account_id).first()
     if not expense_account:
-        return jsonify(dict(message="Expense Account not found")), 404
-
-    if expense_account.shop.public_id != current_user.public_id:
+        if not ExpenseAccounts.exists(account_id):
+            return jsonify(dict(message="Expense Account not found")), 404
         return jsonify(dict(message="You don't have the permission to perform this action")), 401
 
     expense_account.account_name = data["accountName"].strip().title()
@@ -86,11 +91,10 @@ def delete_expense_account(current_user, account_id):
         :param account_id: ID for account to be deleted.
         :return: 404, 401, 200
     """
-    expense_account = ExpenseAccounts.query.filter_by(id=account_id).first()
+    expense_account = ExpenseAccounts.for_shop(current_user).filter_by(id=account_id).first()
     if not expense_account:
-        return jsonify(dict(message="Expense Account not found")), 404
-
-    if account_id not in [acc.id for acc in current_user.expense_accounts]:
+        if not ExpenseAccounts.exists(account_id):
+            return jsonify(dict(message="Expense Account not found")), 404
         return jsonify(dict(message="Permission Denied")), 401
 
     data = request.get_json()
@@ -111,6 +115,7 @@ def delete_expense_account(current_user, account_id):
 
 # EXPENSES
 @expenses.route("/API/expenses/fetch/<string:public_id>", methods=["GET"])
+@rate_limit_class("dashboard")
 @shop_login_required
 def fetch_expenses(current_user, public_id):
     """
@@ -122,21 +127,28 @@ def fetch_expenses(current_user, public_id):
     if current_user.public_id != public_id:
         return jsonify(dict(message="You do not have permission to perform this action")), 401
 
-    all_expenses = Expenses.query.order_by(Expenses.created_at.desc()).all()
-    all_years = [sale.year for sale in Expenses.query.all()]
-    unique_years = list(set(all_years))
+    all_expenses = (
+        Expenses.for_shop(current_user)
+        .options(*Expenses.load_profile("account"))
+        .order_by(Expenses.created_at.desc())
+        .all()
+    )
+    unique_years = [
+        row.year for row in
+        Expenses.for_shop(current_user).with_entities(Expenses.year).distinct().order_by(Expenses.year)
+    ]
     all_accounts = [{"account": acc.account_name, "accountId": acc.id} for acc in current_user.expense_accounts]
     current_user_expenses = []
     for expense in all_expenses:
-        if expense.account.shop.public_id == current_user.public_id:
-            expense_info = serialize_expenses(expense)
-            expense_info["account"] = expense.account.account_name
-            current_user_expenses.append(expense_info)
+        expense_info = serialize_expenses(expense)
+        expense_info["account"] = expense.account.account_name
+        current_user_expenses.append(expense_info)
     return jsonify(dict(expenses=current_user_expenses, years=unique_years, accounts=all_accounts)), 200
 
 
 @expenses.route("/API/expense/create/<string:public_id>", methods=["POST"])
 @shop_login_required
+@idempotent
 def create_expense(current_user, public_id):
     """
         Create expenses
@@ -147,6 +159,9 @@ def create_expense(current_user, public_id):
     if current_user.public_id != public_id:
         return jsonify(dict(message="You do not have permission to perform this action")), 401
     data = request.get_json()
+    if not ExpenseAccounts.for_shop(current_user).filter_by(id=data["expenseAccount"]).first():
+        return jsonify(dict(message="Expense Account not found")), 404
+
     new_expense = Expenses(
         expense=data["expenseName"].strip().title(),
         amount=data["expenseAmount"],
@@ -169,11 +184,10 @@ def delete_expense(current_user, expense_id):
         :param expense_id: ID of the expense to be deleted.
         :return: 404, 401, 200.
     """
-    expense = Expenses.query.filter_by(id=expense_id).first()
+    expense = Expenses.for_shop(current_user).filter_by(id=expense_id).first()
     if not expense:
-        return jsonify(dict(message="This expense doesn't exist")), 404
-
-    if expense.account.shop.public_id != current_user.public_id:
+        if not Expenses.exists(expense_id):
+            return jsonify(dict(message="This expense doesn't exist")), 404
         return jsonify(dict(message="You don't permission to perform this action")), 401
 
     data = request.get_json()
@@ -194,11 +208,10 @@ def update_expense(current_user, expense_id):
         :param expense_id: ID of expense being updated
         :return: 404, 401, 200
     """
-    current_expense = Expenses.query.filter_by(id=expense_id).first()
+    current_expense = Expenses.for_shop(current_user).filter_by(id=expense_id).first()
     if not current_expense:
-        return jsonify(dict(message="This expense doesn't exist")), 404
-
-    if current_expense.account.shop.public_id != current_user.public_id:
+        if not Expenses.exists(expense_id):
+            return jsonify(dict(message="This expense doesn't exist")), 404
         return jsonify(dict(message="You don't permission to perform this action")), 401
 
     data = request.get_json()
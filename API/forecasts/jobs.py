@@ -0,0 +1,78 @@
+import datetime
+import time
+import numpy as np
+from sqlalchemy import func, insert
+from API import db
+from API.models import BarberShop, Sale, Service, SalesForecast
+from .model import forecast_daily_revenue
+
+
+def _as_date(value):
+    # SQLite returns DATE() as a string, Postgres as a date
+    return value if isinstance(value, datetime.date) else datetime.date.fromisoformat(value)
+
+
+def daily_revenue_matrix(shop_ids, start, days):
+    """
+        Daily revenue per shop from one grouped query
+        :param shop_ids: Shop ids, one row each
+        :param start: First day of the window
+        :param days: Number of days in the window
+        :return: (len(shop_ids), days) array, zero on days without sales
+    """
+    rows = (
+        db.session.query(Sale.shop_id, func.date(Sale.date_created).label("day"), func.sum(Service.charges))
+        .join(Service, Sale.service_id == Service.id)
+        .filter(Sale.shop_id.in_(shop_ids), Sale.date_created >= datetime.datetime.combine(start, datetime.time()))
+        .group_by(Sale.shop_id, func.date(Sale.date_created))
+        .all()
+    )
+    position = {shop_id: index for index, shop_id in enumerate(shop_ids)}
+    matrix = np.zeros((len(shop_ids), days))
+    for shop_id, day, revenue in rows:
+        offset = (_as_date(day) - start).days
+        if 0 <= offset < days:
+            matrix[position[shop_id], offset] = revenue or 0
+    return matrix
+
+
+def run_sales_forecasts(history_days, horizon, chunk_size=500, today=None, progress=None):
+    """
+        Fit and store revenue forecasts for every shop, a chunk of shops at a time
+        :param history_days: Days of history used to fit the model
+        :param horizon: Days forecast from today onwards
+        :param chunk_size: Shops per chunk
+        :param today: First forecast day, defaults to the current UTC date
+        :param progress: Optional callback(shops_done, total_shops)
+        :return: dict with shops, rows and seconds
+    """
+    started = time.perf_counter()
+    today = today or datetime.datetime.utcnow().date()
+    start = today - datetime.timedelta(days=history_days)
+    generated_at = datetime.datetime.utcnow()
+    shop_ids = [row.id for row in db.session.query(BarberShop.id).order_by(BarberShop.id)]
+
+    rows_written = 0
+    for chunk_start in range(0, len(shop_ids), chunk_size):
+        chunk = shop_ids[chunk_start:chunk_start + chunk_size]
+        forecasts = forecast_daily_revenue(daily_revenue_matrix(chunk, start, history_days), horizon)
+
+        rows = [
+            dict(
+                shop_id=shop_id,
+                day=today + datetime.timedelta(days=step),
+                revenue=round(float(forecasts[index, step]), 2),
+                generated_at=generated_at
+            )
+            for index, shop_id in enumerate(chunk)
+            for step in range(horizon)
+        ]
+        SalesForecast.query.filter(SalesForecast.shop_id.in_(chunk)).delete(synchronize_session=False)
+        if rows:
+            db.session.execute(insert(SalesForecast), rows)
+        db.session.commit()
+        rows_written += len(rows)
+        if progress:
+            progress(min(chunk_start + chunk_size, len(shop_ids)), len(shop_ids))
+
+    return dict(shops=len(shop_ids), rows=rows_written, seconds=round(time.perf_counter() - started, 2))
@@ -0,0 +1,61 @@
+import itertools
+import numpy as np
+
+SEASON_LENGTH = 7  # weekday seasonality on daily revenue
+ALPHAS = (0.2, 0.4, 0.6)
+BETAS = (0.05, 0.15)
+GAMMAS = (0.1, 0.3)
+
+
+def _holt_winters(series, alpha, beta, gamma):
+    """
+        Additive Holt-Winters run over every shop at once
+        :param series: (shops, days) array of daily revenue
+        :return: (level, trend, seasonal, sse) where seasonal is (shops, SEASON_LENGTH)
+                 aligned so that column j is the season of day index days + j
+    """
+    n_days = series.shape[1]
+    first_week = series[:, :SEASON_LENGTH]
+    second_week = series[:, SEASON_LENGTH:2 * SEASON_LENGTH]
+    level = first_week.mean(axis=1)
+    trend = (second_week.mean(axis=1) - level) / SEASON_LENGTH
+    seasonal = first_week - level[:, None]
+    sse = np.zeros(series.shape[0])
+
+    for t in range(SEASON_LENGTH, n_days):
+        season_index = t % SEASON_LENGTH
+        observed = series[:, t]
+        season = seasonal[:, season_index]
+        sse += (observed - (level + trend + season)) ** 2
+
+        previous_level = level
+        level = alpha * (observed - season) + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous_level) + (1 - beta) * trend
+        seasonal[:, season_index] = gamma * (observed - level) + (1 - gamma) * season
+
+    order = (np.arange(SEASON_LENGTH) + n_days) % SEASON_LENGTH
+    return level, trend, seasonal[:, order], sse
+
+
+def forecast_daily_revenue(series, horizon):
+    """
+        Fit weekday-seasonal Holt-Winters for every shop (row) and forecast the next days.
+        Smoothing parameters are picked per shop from a small grid by in-sample squared error.
+        :param series: (shops, days) array of daily revenue, days >= 2 * SEASON_LENGTH
+        :param horizon: Number of days to forecast
+        :return: (shops, horizon) array of non-negative forecasts
+    """
+    series = np.asarray(series, dtype=float)
+    if series.shape[1] < 2 * SEASON_LENGTH:
+        raise ValueError(f"Need at least {2 * SEASON_LENGTH} days of history")
+
+    steps = np.arange(1, horizon + 1)
+    best_sse = np.full(series.shape[0], np.inf)
+    best_forecast = np.zeros((series.shape[0], horizon))
+    for alpha, beta, gamma in itertools.product(ALPHAS, BETAS, GAMMAS):
+        level, trend, seasonal, sse = _holt_winters(series, alpha, beta, gamma)
+        forecast = level[:, None] + trend[:, None] * steps + seasonal[:, (steps - 1) % SEASON_LENGTH]
+        better = sse < best_sse
+        best_sse[better] = sse[better]
+        best_forecast[better] = forecast[better]
+    return np.clip(best_forecast, 0, None)
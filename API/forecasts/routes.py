@@ -0,0 +1,57 @@
+import calendar
+import datetime
+from flask import Blueprint, jsonify
+from sqlalchemy import func, case
+from API import db
+from API.models import Sale, Service, SalesForecast
+from ..utils import shop_login_required
+from ..ratelimit import rate_limit_class
+
+forecasts_blueprint = Blueprint("forecasts", __name__, url_prefix="/API/forecasts")
+
+
+@forecasts_blueprint.route("/sales/<string:public_id>", methods=["GET"])
+@rate_limit_class("dashboard")
+@shop_login_required
+def sales_forecast(current_user, public_id):
+    """
+        Expected sales for the current month from the precomputed forecasts
+        :param current_user: Currently logged-in user
+        :param public_id: Barbershop public_id
+        :return: 401, 200
+    """
+    if current_user.public_id != public_id:
+        return jsonify(dict(message="Not allowed")), 401
+
+    today = datetime.datetime.utcnow().date()
+    month_end = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+
+    today_start = datetime.datetime.combine(today, datetime.time())
+    month_to_date, today_so_far = (
+        db.session.query(
+            func.coalesce(func.sum(Service.charges), 0),
+            func.coalesce(func.sum(case((Sale.date_created >= today_start, Service.charges), else_=0)), 0)
+        )
+        .select_from(Sale)
+        .join(Service, Sale.service_id == Service.id)
+        .filter(Sale.shop_id == current_user.id, Sale.year == today.year, Sale.month == today.month)
+        .one()
+    )
+    forecasts = (
+        SalesForecast.query
+        .filter(SalesForecast.shop_id == current_user.id, SalesForecast.day >= today)
+        .order_by(SalesForecast.day)
+        .all()
+    )
+    # month_to_date already holds today's sales, so only the part of today's forecast they haven't reached is added
+    remaining_month = sum(
+        max(forecast.revenue - today_so_far, 0) if forecast.day == today else forecast.revenue
+        for forecast in forecasts if forecast.day <= month_end
+    )
+
+    return jsonify(dict(
+        month_to_date=month_to_date,
+        expected_month_total=round(month_to_date + remaining_month, 2) if forecasts else None,
+        generated_at=forecasts[0].generated_at.strftime("%Y-%m-%d %H:%M:%S") if forecasts else None,
+        daily=[dict(day=forecast.day.strftime("%Y-%m-%d"), revenue=forecast.revenue) for forecast in forecasts]
+    )), 200
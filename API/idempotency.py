@@ -0,0 +1,113 @@
+import datetime
+import hashlib
+from functools import wraps
+from flask import request, jsonify, make_response, current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from API import db
+from API.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def idempotent(func):
+    """
+        Replay the stored response when a create request is retried with the same Idempotency-Key.
+        Requests without the header are handled as before.
+        :param func: route function
+        :return:
+    """
+    @wraps(func)
+    def decorated(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER, "").strip()
+        if not key:
+            return func(*args, **kwargs)
+        if len(key) > 64:
+            return jsonify(dict(message=f"{IDEMPOTENCY_HEADER} must be at most 64 characters")), 400
+
+        scope = (request.view_args or {}).get("public_id") or request.path
+        request_hash = _sha256(request.method.encode() + request.path.encode() + request.get_data())
+        now = datetime.datetime.utcnow()
+
+        record = IdempotencyKey.query.filter_by(key=key, scope=scope).first()
+        if record and record.expires_at > now:
+            if record.request_hash != request_hash:
+                return jsonify(dict(message=f"{IDEMPOTENCY_HEADER} was already used for a different request")), 422
+            if record.status_code is None:
+                return jsonify(dict(message="A request with this key is still being processed")), 409
+            response = current_app.response_class(
+                record.response_body, status=record.status_code, mimetype="application/json"
+            )
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+
+        # Claim the key for a short lease before running the route so concurrent retries can't both write
+        lease_expires_at = now + datetime.timedelta(seconds=current_app.config["IDEMPOTENCY_LEASE_SECONDS"])
+        if record:
+            # A stored response past its ttl, or a claim whose request never finished. Only one retry takes it over.
+            record_id = record.id
+            claimed = db.session.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.id == record_id, IdempotencyKey.expires_at <= now)
+                .values(request_hash=request_hash, expires_at=lease_expires_at,
+                        status_code=None, response_body=None, response_hash=None)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            if not claimed:
+                return jsonify(dict(message="A request with this key is still being processed")), 409
+        else:
+            record = IdempotencyKey(key=key, scope=scope, request_hash=request_hash, expires_at=lease_expires_at)
+            db.session.add(record)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                return jsonify(dict(message="A request with this key is still being processed")), 409
+            record_id = record.id
+
+        try:
+            response = make_response(func(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            IdempotencyKey.query.filter_by(id=record_id).delete()
+            db.session.commit()
+            raise
+
+        if not 200 <= response.status_code < 300:
+            # Only successful writes are replayed; failed requests can be corrected and retried with the same key
+            IdempotencyKey.query.filter_by(id=record_id).delete()
+        else:
+            body = response.get_data()
+            # Finished responses are kept for the full ttl
+            ttl = datetime.timedelta(hours=current_app.config["IDEMPOTENCY_KEY_TTL_HOURS"])
+            IdempotencyKey.query.filter_by(id=record_id).update(dict(
+                expires_at=datetime.datetime.utcnow() + ttl,
+                status_code=response.status_code,
+                response_body=body.decode("utf-8"),
+                response_hash=_sha256(body)
+            ))
+        db.session.commit()
+        return response
+    return decorated
+
+
+def purge_expired_keys(batch_size=1000):
+    """
+        Delete expired idempotency keys in batches
+        :param batch_size: Rows deleted per statement
+        :return: Number of deleted rows
+    """
+    now = datetime.datetime.utcnow()
+    deleted = 0
+    while True:
+        ids = [row.id for row in db.session.query(IdempotencyKey.id)
+               .filter(IdempotencyKey.expires_at <= now).limit(batch_size)]
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.query.filter(IdempotencyKey.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
@@ -0,0 +1,49 @@
+import importlib
+import click
+from flask import current_app
+
+# Heavy modules only a few routes or CLI commands need. With LAZY_INTEGRATIONS on they are
+# imported on first use instead of while a worker boots.
+LAZY_MODULES = ("flask_mail", "flask_migrate", "httpx", "numpy", "msgpack", "brotli")
+
+
+def get_mail():
+    """
+        Flask-Mail state for the current app, imported and initialised on first use
+        :return: Mail state with a send() method
+    """
+    if "mail" not in current_app.extensions:
+        from flask_mail import Mail
+        Mail().init_app(current_app)
+    return current_app.extensions["mail"]
+
+
+def init_migrate(app):
+    """
+        Register Flask-Migrate (and with it alembic) on the app
+        :param app: Flask app
+        :return: None
+    """
+    if "migrate" not in app.extensions:
+        from flask_migrate import Migrate
+        from API import db
+        Migrate(app, db)
+
+
+def init_integrations(app):
+    """
+        Eager mode imports every lazy integration while the app is built, which suits a
+        preloading server that forks workers from a warm master.
+        In lazy mode Flask-Migrate is still registered when the app is built by the flask CLI,
+        since 'flask db' needs it before any command runs.
+        :param app: Flask app
+        :return: None
+    """
+    if not app.config["LAZY_INTEGRATIONS"]:
+        for name in LAZY_MODULES:
+            importlib.import_module(name)
+        with app.app_context():
+            get_mail()
+        init_migrate(app)
+    elif click.get_current_context(silent=True) is not None:
+        init_migrate(app)
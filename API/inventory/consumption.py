@@ -0,0 +1,198 @@
+import datetime
+import threading
+import time
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import func, update
+from API import db
+from API.models import Sale, ServiceRecipe, Inventory, Notification, BarberShop
+from .events import record_inventory_event, LOW_LEVEL, CRITICAL_LEVEL
+
+LEVEL_NAMES = {1: "CRITICALLY LOW", 2: "LOW", 3: "NORMAL"}
+
+
+def stock_level(stock, capacity):
+    """
+        :param stock: Quantity on hand
+        :param capacity: Quantity when full
+        :return: Inventory level 1-3
+    """
+    share = stock / capacity if capacity else 0
+    if share <= current_app.config["INVENTORY_CRITICAL_RATIO"]:
+        return CRITICAL_LEVEL
+    if share <= current_app.config["INVENTORY_LOW_RATIO"]:
+        return LOW_LEVEL
+    return 3
+
+
+def stock_for_level(level, capacity):
+    """
+        Top of a level's band, used when a level is set by hand on a product with a capacity
+        :return: Quantity
+    """
+    if level <= CRITICAL_LEVEL:
+        return capacity * current_app.config["INVENTORY_CRITICAL_RATIO"]
+    if level == LOW_LEVEL:
+        return capacity * current_app.config["INVENTORY_LOW_RATIO"]
+    return capacity
+
+
+def _notify_low_stock(crossed):
+    """
+        One notification per shop listing the products that dropped to a lower level.
+        Committed with the batch; the emails are sent after the commit.
+        :param crossed: {shop_id: [(product name, level)]}
+        :return: list of send_low_inventory_email kwargs
+    """
+    shops = {shop.id: shop for shop in BarberShop.query.filter(BarberShop.id.in_(crossed))}
+    emails = []
+    for shop_id, products in crossed.items():
+        db.session.add(Notification(
+            title="Inventory Running Low",
+            message=", ".join(f"{name} is {LEVEL_NAMES[level].lower()}" for name, level in products),
+            shop_id=shop_id
+        ))
+        emails += [
+            dict(recipient=shops[shop_id].email, inventory_name=name, shop_name=shops[shop_id].shop_name, level=str(level))
+            for name, level in products
+        ]
+    return emails
+
+
+def _send_low_stock_emails(emails):
+    from API.utils import send_low_inventory_email
+    for email in emails:
+        try:
+            send_low_inventory_email(**email)
+        except Exception:
+            current_app.logger.exception("Low inventory email to %s failed", email["recipient"])
+
+
+def _claim_sales(batch_size):
+    """
+        Mark a batch of pending sales as applied and return their ids, in the transaction that applies them.
+        The conditional UPDATE only returns sales no other applier has claimed: a concurrent claim waits on
+        the row (Postgres) or database (SQLite) lock and re-checks stock_applied, so a sale is counted once.
+        On Postgres, SKIP LOCKED picks sales other appliers are not already holding.
+        :param batch_size: Sales per batch
+        :return: (claimed ids, whether any sale was pending)
+    """
+    pending = db.session.query(Sale.id).filter(Sale.stock_applied.is_(False)).order_by(Sale.id).limit(batch_size)
+    if db.engine.dialect.name == "postgresql":
+        pending = pending.with_for_update(skip_locked=True)
+    candidates = [row.id for row in pending]
+    if not candidates:
+        return [], False
+    claimed = db.session.execute(
+        update(Sale)
+        .where(Sale.id.in_(candidates), Sale.stock_applied.is_(False))
+        .values(stock_applied=True)
+        .returning(Sale.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    return claimed, True
+
+
+def apply_pending_consumption(batch_size=1000):
+    """
+        Take the recipes of recorded sales off the stock, a batch of sales at a time.
+        Sales are claimed with a conditional UPDATE so concurrent appliers never double count.
+        Shops are notified only for products whose level drops to LOW or below.
+        :param batch_size: Sales per batch
+        :return: dict with sales applied, products updated and shops notified
+    """
+    totals = dict(sales=0, products=0, notified_shops=0)
+    while True:
+        sale_ids, pending = _claim_sales(batch_size)
+        if not pending:
+            return totals
+        if not sale_ids:
+            # Another applier claimed the whole batch first
+            db.session.commit()
+            continue
+
+        usage = dict(
+            db.session.query(ServiceRecipe.inventory_id, func.sum(ServiceRecipe.amount))
+            .join(Sale, Sale.service_id == ServiceRecipe.service_id)
+            .filter(Sale.id.in_(sale_ids))
+            .group_by(ServiceRecipe.inventory_id)
+            .all()
+        )
+        crossed = defaultdict(list)
+        products = (
+            Inventory.query.filter(Inventory.id.in_(usage), Inventory.capacity.isnot(None)).with_for_update().all()
+            if usage else []
+        )
+        for product in products:
+            level_before = product.product_level
+            product.stock = max((product.stock if product.stock is not None else product.capacity) - usage[product.id], 0)
+            level = stock_level(product.stock, product.capacity)
+            if level != level_before:
+                product.product_level = level
+                product.modified_at = datetime.datetime.utcnow()
+                record_inventory_event(product, "consumed", level_before)
+                if level < level_before and level <= LOW_LEVEL:
+                    crossed[product.shop_id].append((product.product_name, level))
+
+        emails = _notify_low_stock(crossed) if crossed else []
+        db.session.commit()
+        # After the commit so a slow mail server doesn't hold the inventory row locks
+        _send_low_stock_emails(emails)
+        totals["sales"] += len(sale_ids)
+        totals["products"] += len(products)
+        totals["notified_shops"] += len(crossed)
+
+
+class ConsumptionWorker:
+    """
+        Background thread, one per worker process, that applies recorded sales to the stock
+        a short delay after record_sale so sales arriving together share a batch
+    """
+
+    def __init__(self, app, delay):
+        self._app = app
+        self._delay = delay
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def notify(self):
+        # Started on first use so a preloading master never forks a running thread
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="inventory-consumption", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self._delay)
+            self._wake.clear()
+            with self._app.app_context():
+                try:
+                    apply_pending_consumption()
+                except Exception:
+                    db.session.rollback()
+                    self._app.logger.exception("Applying inventory consumption failed")
+                finally:
+                    db.session.remove()
+
+
+def schedule_consumption():
+    """
+        Have the background thread apply recorded sales. No-op when INVENTORY_CONSUMPTION_ASYNC is off.
+        :return: None
+    """
+    worker = current_app.extensions.get("inventory_consumption")
+    if worker:
+        worker.notify()
+
+
+def init_consumption(app):
+    """
+        :param app: Flask app
+        :return: None
+    """
+    if app.config["INVENTORY_CONSUMPTION_ASYNC"]:
+        app.extensions["inventory_consumption"] = ConsumptionWorker(app, app.config["INVENTORY_CONSUMPTION_DELAY_SECONDS"])
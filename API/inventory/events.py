@@ -0,0 +1,173 @@
+import datetime
+import time
+from itertools import groupby
+from sqlalchemy import insert
+from API import db
+from API.models import BarberShop, Inventory, InventoryEvent, InventoryConsumption
+
+LOW_LEVEL = 2
+CRITICAL_LEVEL = 1
+
+
+def record_inventory_event(record, event, level_before=None):
+    """
+        Append a level change to the inventory history. Committed with the caller's transaction.
+        :param record: Inventory after the change
+        :param event: created, updated or replenished
+        :param level_before: Level before the change
+        :return: None
+    """
+    db.session.add(InventoryEvent(
+        inventory_id=record.id,
+        shop_id=record.shop_id,
+        event=event,
+        level_before=level_before,
+        level_after=int(record.product_level),
+        created_at=record.modified_at or datetime.datetime.utcnow()
+    ))
+
+
+def inventory_history(inventory_id, since):
+    """
+        Level history of one product as parallel arrays
+        :param inventory_id: Inventory id
+        :param since: Oldest event returned
+        :return: dict with times and levels
+    """
+    rows = (
+        db.session.query(InventoryEvent.created_at, InventoryEvent.level_after)
+        .filter(InventoryEvent.inventory_id == inventory_id, InventoryEvent.created_at >= since)
+        .order_by(InventoryEvent.created_at, InventoryEvent.id)
+        .all()
+    )
+    return dict(
+        times=[row.created_at.strftime("%Y-%m-%d %H:%M:%S") for row in rows],
+        levels=[row.level_after for row in rows]
+    )
+
+
+def days_per_level(events):
+    """
+        Average time a product stays on a level before dropping one, over every drop in the history.
+        Replenishing starts a new depletion cycle.
+        :param events: (level_after, created_at) ordered by time
+        :return: days or None when no drop was observed
+    """
+    total_days, total_steps = 0.0, 0
+    level, since = None, None
+    for level_after, created_at in events:
+        if level is not None and level_after < level:
+            total_days += (created_at - since).total_seconds() / 86400
+            total_steps += level - level_after
+        if level_after != level:
+            level, since = level_after, created_at
+    return total_days / total_steps if total_steps else None
+
+
+def predict_level_at(level, since, rate, target_level):
+    """
+        :param level: Current level
+        :param since: When the product reached its current level
+        :param rate: Days per level, or None
+        :param target_level: Level to predict
+        :return: When the product reaches target_level, since if it already has, None if unknown
+    """
+    if level <= target_level:
+        return since
+    if rate is None:
+        return None
+    return since + datetime.timedelta(days=rate * (level - target_level))
+
+
+def compute_chunk_consumption(shop_ids, history_start):
+    """
+        Consumption estimates for the products of a chunk of shops from one history query
+        :param shop_ids: Shop ids
+        :param history_start: Oldest event considered
+        :return: rows for inventory_consumption
+    """
+    products = (
+        db.session.query(Inventory.id, Inventory.shop_id, Inventory.product_level, Inventory.modified_at)
+        .filter(Inventory.shop_id.in_(shop_ids))
+        .all()
+    )
+    events = (
+        db.session.query(InventoryEvent.inventory_id, InventoryEvent.level_after, InventoryEvent.created_at)
+        .filter(InventoryEvent.shop_id.in_(shop_ids), InventoryEvent.created_at >= history_start)
+        .order_by(InventoryEvent.inventory_id, InventoryEvent.created_at, InventoryEvent.id)
+        .all()
+    )
+    history = {
+        inventory_id: [(row.level_after, row.created_at) for row in rows]
+        for inventory_id, rows in groupby(events, key=lambda row: row.inventory_id)
+    }
+
+    computed_at = datetime.datetime.utcnow()
+    rows = []
+    for product in products:
+        product_events = history.get(product.id, [])
+        rate = days_per_level(product_events)
+        since = product.modified_at or computed_at
+        # The product reached its level at the last change in its history
+        for level_after, created_at in reversed(product_events):
+            if level_after != product.product_level:
+                break
+            since = created_at
+        rows.append(dict(
+            inventory_id=product.id,
+            shop_id=product.shop_id,
+            level=product.product_level,
+            days_per_level=round(rate, 3) if rate is not None else None,
+            predicted_low_at=predict_level_at(product.product_level, since, rate, LOW_LEVEL),
+            predicted_critical_at=predict_level_at(product.product_level, since, rate, CRITICAL_LEVEL),
+            computed_at=computed_at
+        ))
+    return rows
+
+
+def run_inventory_estimates(history_days, chunk_size=500, progress=None):
+    """
+        Recompute consumption estimates for every shop
+        :param history_days: Days of history considered
+        :param chunk_size: Shops per chunk
+        :param progress: Optional callback(shops_done, total_shops)
+        :return: dict with shops, products and seconds
+    """
+    started = time.perf_counter()
+    history_start = datetime.datetime.utcnow() - datetime.timedelta(days=history_days)
+    shop_ids = [row.id for row in db.session.query(BarberShop.id).order_by(BarberShop.id)]
+    products = 0
+
+    for chunk_start in range(0, len(shop_ids), chunk_size):
+        chunk = shop_ids[chunk_start:chunk_start + chunk_size]
+        rows = compute_chunk_consumption(chunk, history_start)
+        InventoryConsumption.query.filter(InventoryConsumption.shop_id.in_(chunk)).delete(synchronize_session=False)
+        if rows:
+            db.session.execute(insert(InventoryConsumption), rows)
+        db.session.commit()
+        products += len(rows)
+        if progress:
+            progress(min(chunk_start + chunk_size, len(shop_ids)), len(shop_ids))
+
+    return dict(shops=len(shop_ids), products=products, seconds=round(time.perf_counter() - started, 2))
+
+
+def predicted_low(shop_id, within_days):
+    """
+        Products already low or predicted to run low within the window, soonest first
+        :param shop_id: Barbershop id
+        :param within_days: Window in days
+        :return: list of rows
+    """
+    horizon = datetime.datetime.utcnow() + datetime.timedelta(days=within_days)
+    return (
+        db.session.query(
+            Inventory.id, Inventory.product_name, InventoryConsumption.level, InventoryConsumption.days_per_level,
+            InventoryConsumption.predicted_low_at, InventoryConsumption.predicted_critical_at,
+            InventoryConsumption.computed_at
+        )
+        .join(Inventory, InventoryConsumption.inventory_id == Inventory.id)
+        .filter(InventoryConsumption.shop_id == shop_id, InventoryConsumption.predicted_low_at <= horizon)
+        .order_by(InventoryConsumption.predicted_low_at)
+        .all()
+    )
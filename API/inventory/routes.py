@@ -1,15 +1,21 @@
 import datetime
 from flask import Blueprint, request, jsonify
+from sqlalchemy.orm import contains_eager
 from API import db, bcrypt
 from API.models import Inventory, BarberShop
 from ..utils import shop_login_required, send_low_inventory_email, verify_api_key
 from ..serializer import serialize_inventory
+from ..idempotency import idempotent
+from ..ratelimit import rate_limit_class
+from .events import record_inventory_event, inventory_history, predicted_low
+from .consumption import stock_for_level
 
 inventory = Blueprint("inventory", __name__)
 
 
 @inventory.route("/API/inventory/create/<string:public_id>", methods=["POST"])
 @shop_login_required
+@idempotent
 def add_inventory(current_user, public_id):
     """
         Create new inventory
@@ -21,13 +27,19 @@ def add_inventory(current_user, public_id):
         return jsonify(dict(message="You do not have permission to perform this action")), 401
 
     data = request.get_json()
+    # With a capacity the product starts full and sales of services using it bring the level down
+    capacity = float(data["capacity"]) if data.get("capacity") else None
     new_inventory = Inventory(
         product_name=data["productName"].strip().title(),
-        product_level=data["productLevel"],
+        product_level=3 if capacity else data["productLevel"],
+        stock=capacity,
+        capacity=capacity,
         modified_at=datetime.datetime.utcnow(),
         shop_id=current_user.id
     )
     db.session.add(new_inventory)
+    db.session.flush()
+    record_inventory_event(new_inventory, "created")
     db.session.commit()
     return jsonify(dict(message="Inventory has been Recorded")), 201
 
@@ -40,14 +52,17 @@ def update_inventory(inventory_id):
         :param inventory_id:
         :return: 404, 500, 200
     """
-    inventory_record = Inventory.query.filter_by(id=inventory_id).first()
+    data = request.get_json()
+    # Scoped to the shop in SQL; the joined shop also fills inventory_record.shop for the email below
+    inventory_record = (
+        Inventory.query.join(BarberShop, Inventory.shop_id == BarberShop.id)
+        .options(contains_eager(Inventory.shop))
+        .filter(Inventory.id == inventory_id, BarberShop.public_id == data["shopId"])
+        .first()
+    )
     if not inventory_record:
         return jsonify(dict(message="Record not found")), 404
 
-    data = request.get_json()
-    if inventory_record.shop.public_id != data["shopId"]:
-        return jsonify(dict(message="Not Allowed")), 401
-
     if int(data["productLevel"]) <= 2 and inventory_record.product_level > 2:
         shop_email = inventory_record.shop.email
         product_name = inventory_record.product_name
@@ -62,8 +77,12 @@ def update_inventory(inventory_id):
         except:
             return jsonify(dict(message="An error occurred. Please try again")), 500
 
+    level_before = inventory_record.product_level
     inventory_record.product_level = data["productLevel"]
+    if inventory_record.capacity:
+        inventory_record.stock = stock_for_level(int(data["productLevel"]), inventory_record.capacity)
     inventory_record.modified_at = datetime.datetime.utcnow()
+    record_inventory_event(inventory_record, "updated", level_before)
     db.session.commit()
 
     return jsonify(dict(message="Record updated successfully")), 200
@@ -94,11 +113,13 @@ def delete_inventory(current_user, inventory_id):
         Delete inventory item
         :param inventory_id: id of inventory to be deleted
         :param current_user: Logged in Shop Owner
-        :return:
+        :return: 404, 401, 200
     """
-    record = Inventory.query.filter_by(id=inventory_id).first()
+    record = Inventory.for_shop(current_user).filter_by(id=inventory_id).first()
     if not record:
-        return jsonify(dict(message="Inventory Item not found")), 404
+        if not Inventory.exists(inventory_id):
+            return jsonify(dict(message="Inventory Item not found")), 404
+        return jsonify(dict(message="Not Allowed")), 401
 
     data = request.get_json()
     if not bcrypt.check_password_hash(current_user.password, data["password"].strip()):
@@ -117,7 +138,7 @@ def replenish_inventory(inventory_id):
         :param inventory_id: Inventory item ID
         :return: 400, 200
     """
-    inventory_record = Inventory.query.filter_by(id=inventory_id).first()
+    inventory_record = Inventory.query.options(*Inventory.load_profile("shop")).filter_by(id=inventory_id).first()
     if not inventory_record:
         return jsonify(dict(message="Record not found")), 404
 
@@ -128,7 +149,61 @@ def replenish_inventory(inventory_id):
     if not bcrypt.check_password_hash(inventory_record.shop.password, data["password"].strip()):
         return jsonify(dict(message="Incorrect Password")), 401
 
+    level_before = inventory_record.product_level
     inventory_record.product_level = 3
+    inventory_record.stock = inventory_record.capacity
     inventory_record.modified_at = datetime.datetime.utcnow()
+    record_inventory_event(inventory_record, "replenished", level_before)
     db.session.commit()
     return jsonify(dict(message="Record replenished successfully")), 200
+
+
+@inventory.route("/API/inventory/history/<int:inventory_id>", methods=["GET"])
+@shop_login_required
+def fetch_inventory_history(current_user, inventory_id):
+    """
+        Level history of a product as parallel times/levels arrays. ?days= limits the window (default 90)
+        :param current_user: Logged in Shop Owner
+        :param inventory_id: Inventory item ID
+        :return: 404, 401, 200
+    """
+    record = Inventory.for_shop(current_user).filter_by(id=inventory_id).first()
+    if not record:
+        if not Inventory.exists(inventory_id):
+            return jsonify(dict(message="Inventory Item not found")), 404
+        return jsonify(dict(message="Not Allowed")), 401
+
+    days = request.args.get("days", 90, type=int)
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+    return jsonify(dict(inventory_id=record.id, product=record.product_name, **inventory_history(record.id, since))), 200
+
+
+@inventory.route("/API/inventory/predicted-low/<string:public_id>", methods=["GET"])
+@rate_limit_class("dashboard")
+@shop_login_required
+def fetch_predicted_low(current_user, public_id):
+    """
+        Products that are low or predicted to run low within ?days= (default 7), from the
+        estimates precomputed by 'flask estimate-inventory'
+        :param current_user: Logged in Shop Owner
+        :param public_id: Barbershop public_id
+        :return: 401, 200
+    """
+    if current_user.public_id != public_id:
+        return jsonify(dict(message="You do not have permission to perform this action")), 401
+
+    days = request.args.get("days", 7, type=int)
+    products = [
+        dict(
+            id=row.id,
+            product=row.product_name,
+            level=row.level,
+            days_per_level=row.days_per_level,
+            predicted_low_at=row.predicted_low_at.strftime("%Y-%m-%d %H:%M:%S"),
+            predicted_critical_at=row.predicted_critical_at.strftime("%Y-%m-%d %H:%M:%S")
+            if row.predicted_critical_at else None,
+            computed_at=row.computed_at.strftime("%Y-%m-%d %H:%M:%S")
+        )
+        for row in predicted_low(current_user.id, days)
+    ]
+    return jsonify(dict(products=products, days=days)), 200
@@ -0,0 +1,151 @@
+import datetime
+import time
+from sqlalchemy import func, insert, or_, select, union_all
+from API import db
+from API.models import (
+    BarberShop, Sale, SaleArchive, Service, Expenses, ExpenseAccounts, Employee, ShopKpi, ServiceKpi, PaymentMethodKpi
+)
+
+
+def _period_sales(shop_ids, year, month):
+    """
+        Sales of the period from the hot table and the archive, so archived months keep their KPIs.
+        Each side filters on year/month so Postgres only scans the matching partition.
+        :param shop_ids: Shop ids in the chunk
+        :param year: Year of the period
+        :param month: Month of the period
+        :return: Subquery of shop_id, service_id, payment_method, employee_id
+    """
+    return union_all(*(
+        select(model.shop_id, model.service_id, model.payment_method, model.employee_id)
+        .where(model.shop_id.in_(shop_ids), model.year == year, model.month == month)
+        for model in (Sale, SaleArchive)
+    )).subquery()
+
+
+def compute_chunk_kpis(shop_ids, year, month):
+    """
+        KPIs for a chunk of shops from one grouped query per metric
+        :param shop_ids: Shop ids in the chunk
+        :param year: Year of the period
+        :param month: Month of the period
+        :return: (shop rows, service rows, payment method rows, sales scanned)
+    """
+    sales = _period_sales(shop_ids, year, month)
+    service_rows = (
+        db.session.query(
+            sales.c.shop_id, sales.c.service_id, func.count().label("sales_count"),
+            func.sum(Service.charges).label("revenue")
+        )
+        .join(Service, sales.c.service_id == Service.id)
+        .group_by(sales.c.shop_id, sales.c.service_id)
+        .all()
+    )
+    payment_rows = (
+        db.session.query(
+            sales.c.shop_id, sales.c.payment_method, func.count().label("transactions"),
+            func.sum(Service.charges).label("revenue")
+        )
+        .join(Service, sales.c.service_id == Service.id)
+        .group_by(sales.c.shop_id, sales.c.payment_method)
+        .all()
+    )
+    expenses = dict(
+        db.session.query(ExpenseAccounts.shop_id, func.sum(Expenses.amount))
+        .join(Expenses, Expenses.expense_account == ExpenseAccounts.id)
+        .filter(ExpenseAccounts.shop_id.in_(shop_ids), Expenses.year == year, Expenses.month == month)
+        .group_by(ExpenseAccounts.shop_id)
+        .all()
+    )
+    # Deactivation isn't dated, so staff of the period are those with sales in it
+    # plus the currently active staff who had joined by the end of it
+    period_end = datetime.datetime(year + month // 12, month % 12 + 1, 1)
+    employees = dict(
+        db.session.query(Employee.shop_id, func.count(Employee.id))
+        .filter(
+            Employee.shop_id.in_(shop_ids),
+            or_(
+                Employee.id.in_(select(sales.c.employee_id).where(sales.c.employee_id.isnot(None))),
+                Employee.active.is_(True) & (Employee.create_date < period_end)
+            )
+        )
+        .group_by(Employee.shop_id)
+        .all()
+    )
+
+    totals = {}
+    for row in service_rows:
+        revenue, count = totals.get(row.shop_id, (0, 0))
+        totals[row.shop_id] = (revenue + row.revenue, count + row.sales_count)
+
+    computed_at = datetime.datetime.utcnow()
+    shop_kpis = []
+    for shop_id in shop_ids:
+        revenue, sales_count = totals.get(shop_id, (0, 0))
+        shop_expenses = expenses.get(shop_id) or 0
+        staff = employees.get(shop_id, 0)
+        shop_kpis.append(dict(
+            shop_id=shop_id, year=year, month=month,
+            revenue=revenue,
+            sales_count=sales_count,
+            average_ticket=round(revenue / sales_count, 2) if sales_count else 0,
+            expenses=shop_expenses,
+            expense_ratio=round(shop_expenses / revenue, 4) if revenue else None,
+            employees=staff,
+            revenue_per_employee=round(revenue / staff, 2) if staff else None,
+            computed_at=computed_at
+        ))
+    service_kpis = [
+        dict(shop_id=row.shop_id, service_id=row.service_id, year=year, month=month,
+             sales_count=row.sales_count, revenue=row.revenue)
+        for row in service_rows
+    ]
+    payment_kpis = [
+        dict(shop_id=row.shop_id, year=year, month=month, payment_method=row.payment_method,
+             transactions=row.transactions, revenue=row.revenue)
+        for row in payment_rows
+    ]
+    sales_scanned = sum(row.sales_count for row in service_rows)
+    return shop_kpis, service_kpis, payment_kpis, sales_scanned
+
+
+def run_kpis(year, month, chunk_size=500, progress=None):
+    """
+        Recompute the KPI summary tables for every shop for one month
+        :param year: Year of the period
+        :param month: Month of the period
+        :param chunk_size: Shops per chunk
+        :param progress: Optional callback(shops_done, total_shops)
+        :return: dict with shops, sales scanned, rows written, seconds and rows per second
+        :raises ValueError: month is not 1-12
+    """
+    if not 1 <= month <= 12:
+        raise ValueError(f"Invalid month {month}")
+    started = time.perf_counter()
+    shop_ids = [row.id for row in db.session.query(BarberShop.id).order_by(BarberShop.id)]
+    sales_scanned = 0
+    rows_written = 0
+
+    for chunk_start in range(0, len(shop_ids), chunk_size):
+        chunk = shop_ids[chunk_start:chunk_start + chunk_size]
+        shop_kpis, service_kpis, payment_kpis, scanned = compute_chunk_kpis(chunk, year, month)
+
+        for model, rows in ((ShopKpi, shop_kpis), (ServiceKpi, service_kpis), (PaymentMethodKpi, payment_kpis)):
+            model.query.filter(model.shop_id.in_(chunk), model.year == year, model.month == month) \
+                .delete(synchronize_session=False)
+            if rows:
+                db.session.execute(insert(model), rows)
+            rows_written += len(rows)
+        db.session.commit()
+        sales_scanned += scanned
+        if progress:
+            progress(min(chunk_start + chunk_size, len(shop_ids)), len(shop_ids))
+
+    seconds = time.perf_counter() - started
+    return dict(
+        shops=len(shop_ids),
+        sales_scanned=sales_scanned,
+        rows=rows_written,
+        seconds=round(seconds, 2),
+        rows_per_second=round((sales_scanned + rows_written) / seconds) if seconds else 0
+    )
@@ -0,0 +1,62 @@
+import datetime
+from flask import Blueprint, jsonify, request
+from API.models import Service, ShopKpi, ServiceKpi, PaymentMethodKpi
+from ..utils import shop_login_required
+from ..ratelimit import rate_limit_class
+
+kpis_blueprint = Blueprint("kpis", __name__, url_prefix="/API/kpis")
+
+
+@kpis_blueprint.route("/<string:public_id>", methods=["GET"])
+@rate_limit_class("dashboard")
+@shop_login_required
+def fetch_kpis(current_user, public_id):
+    """
+        Precomputed KPIs for a month (defaults to the current month)
+        :param current_user: Currently logged-in user
+        :param public_id: Barbershop public_id
+        :return: 401, 400, 404, 200
+    """
+    if current_user.public_id != public_id:
+        return jsonify(dict(message="Not allowed")), 401
+
+    now = datetime.datetime.utcnow()
+    year = request.args.get("year", now.year, type=int)
+    month = request.args.get("month", now.month, type=int)
+    if not 1 <= month <= 12:
+        return jsonify(dict(message="Invalid month")), 400
+
+    kpi = ShopKpi.query.filter_by(shop_id=current_user.id, year=year, month=month).first()
+    if not kpi:
+        return jsonify(dict(message="KPIs not computed for this period yet")), 404
+
+    services = (
+        ServiceKpi.query.with_entities(Service.service, ServiceKpi.sales_count, ServiceKpi.revenue)
+        .join(Service, ServiceKpi.service_id == Service.id)
+        .filter(ServiceKpi.shop_id == current_user.id, ServiceKpi.year == year, ServiceKpi.month == month)
+        .order_by(ServiceKpi.revenue.desc())
+        .all()
+    )
+    payment_methods = (
+        PaymentMethodKpi.query
+        .filter_by(shop_id=current_user.id, year=year, month=month)
+        .order_by(PaymentMethodKpi.transactions.desc())
+        .all()
+    )
+    return jsonify(dict(
+        year=year,
+        month=month,
+        revenue=kpi.revenue,
+        sales_count=kpi.sales_count,
+        average_ticket=kpi.average_ticket,
+        expenses=kpi.expenses,
+        expense_ratio=kpi.expense_ratio,
+        employees=kpi.employees,
+        revenue_per_employee=kpi.revenue_per_employee,
+        computed_at=kpi.computed_at.strftime("%Y-%m-%d %H:%M:%S"),
+        services=[dict(service=row.service, sales=row.sales_count, revenue=row.revenue) for row in services],
+        payment_methods=[
+            dict(method=row.payment_method, transactions=row.transactions, revenue=row.revenue)
+            for row in payment_methods
+        ]
+    )), 200
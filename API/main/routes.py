@@ -0,0 +1,38 @@
+from flask import Blueprint, jsonify, current_app
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from API import db
+from ..pool import pool_metrics
+from ..ratelimit import rate_limit_class
+
+main = Blueprint("main", __name__, url_prefix="/API/health")
+
+
+@main.route("/live", methods=["GET"])
+@rate_limit_class("exempt")
+def live():
+    """
+        Liveness probe. The worker is up and serving requests.
+        :return: 200
+    """
+    return jsonify(dict(status="ok")), 200
+
+
+@main.route("/ready", methods=["GET"])
+@rate_limit_class("exempt")
+def ready():
+    """
+        Readiness probe. Checks the database answers and reports pool saturation
+        :return: 503, 200
+    """
+    metrics = pool_metrics(db.engine)
+    try:
+        db.session.execute(text("SELECT 1"))
+    except SQLAlchemyError:
+        return jsonify(dict(status="unavailable", database=False, pool=metrics)), 503
+    finally:
+        db.session.remove()
+
+    saturated = metrics.get("saturation", 0) >= current_app.config["DB_POOL_SATURATION_THRESHOLD"]
+    status_code = 503 if saturated else 200
+    return jsonify(dict(status="saturated" if saturated else "ok", database=True, pool=metrics)), status_code
@@ -0,0 +1,136 @@
+import datetime
+import os
+import threading
+from functools import wraps
+import jwt
+from flask import current_app, jsonify
+from API import db
+from API.models import BarbersAppToken
+
+_slots = None
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+class UpstreamBusy(Exception):
+    """Raised when this worker already has MOBILE_APP_MAX_CONCURRENCY calls in flight to the mobile app"""
+
+
+def _upstream_slots():
+    """
+        Per-worker cap on concurrent calls to the mobile app backend.
+        Each call holds a worker thread until upstream answers, so the cap only leaves threads free
+        for other routes under the gthread profile; a sync worker has a single thread.
+        :return: BoundedSemaphore
+    """
+    global _slots
+    with _lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(current_app.config["MOBILE_APP_MAX_CONCURRENCY"])
+    return _slots
+
+
+def _mobile_client():
+    """
+        One keep-alive client per worker process, shared by its threads, so calls reuse upstream connections.
+        Created on first use in the worker; a client built before a fork is never reused.
+        :return: httpx.Client
+    """
+    global _client, _client_pid
+    import httpx
+    with _lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = httpx.Client(
+                base_url=current_app.config["MOBILE_APP_URL"],
+                timeout=current_app.config["MOBILE_APP_TIMEOUT"],
+                limits=httpx.Limits(max_connections=current_app.config["MOBILE_APP_MAX_CONCURRENCY"])
+            )
+            _client_pid = os.getpid()
+    return _client
+
+
+def fetch_token_from_mobile_app(client):
+    """
+        Fetch the authentication token from the mobile app backend
+        :param client: httpx.Client
+        :return: jwt token
+    """
+    data = {
+        "email": os.environ.get("KINYOZI_MOBILE_EMAIL"),
+        "password": os.environ.get("KINYOZI_MOBILE_PASSWORD")
+    }
+    response = client.post("/auth/login", json=data)
+    return response.json().get("token")
+
+
+def auth_mobile_app(client):
+    """
+        Authentication to access the data from the app.
+        The token is stored in the db and only refreshed once it expires.
+        :param client: httpx.Client
+        :return: JWT Token
+    """
+    bearer_token = BarbersAppToken.query.filter_by(name="bearer_token").first()
+    if not bearer_token:
+        # If no token, authenticate the app and save the token to db
+        token = fetch_token_from_mobile_app(client)
+        db.session.add(BarbersAppToken(name="bearer_token", token=token))
+        db.session.commit()
+        return token
+
+    # Check if the token is expired, if expired/invalid, load new one
+    try:
+        decoded_token = jwt.decode(
+            bearer_token.token,
+            os.environ.get("JWT_SECRET"),
+            algorithms=["HS256"],
+            options={"verify_signature": False}
+        )
+        expired = datetime.datetime.utcnow() > datetime.datetime.utcfromtimestamp(decoded_token.get("exp"))
+    except jwt.exceptions.InvalidTokenError:
+        expired = True
+
+    if expired:
+        bearer_token.token = fetch_token_from_mobile_app(client)
+        db.session.commit()
+    return bearer_token.token
+
+
+def mobile_app_request(method, path, **kwargs):
+    """
+        Authenticated call to the mobile app backend, bounded by MOBILE_APP_TIMEOUT
+        and MOBILE_APP_MAX_CONCURRENCY
+        :param method: HTTP method
+        :param path: Path relative to MOBILE_APP_URL
+        :return: httpx.Response
+    """
+    slots = _upstream_slots()
+    if not slots.acquire(blocking=False):
+        raise UpstreamBusy()
+    try:
+        client = _mobile_client()
+        token = auth_mobile_app(client)
+        return client.request(method, path, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+    finally:
+        slots.release()
+
+
+def mobile_app_errors(func):
+    """
+        Map upstream failures to 503/504/502 responses instead of tying up the worker
+        :param func: route function
+        :return:
+    """
+    @wraps(func)
+    def decorated(*args, **kwargs):
+        import httpx
+        try:
+            return func(*args, **kwargs)
+        except UpstreamBusy:
+            return jsonify(dict(message="Service busy. Please try again")), 503
+        except httpx.TimeoutException:
+            return jsonify(dict(message="Barbers service timed out. Please try again")), 504
+        except httpx.HTTPError:
+            return jsonify(dict(message="Barbers service unavailable")), 502
+    return decorated
@@ -1,10 +1,81 @@
 from API import db
 from datetime import datetime
+from sqlalchemy.orm import joinedload
+
+
+class LoadProfileMixin:
+    """
+        Named eager loading profiles.
+        Each model maps a profile name to a callable returning loader options so that
+        routes walking relationships per row load them in the same query.
+    """
+    load_profiles = {}
+
+    @classmethod
+    def load_profile(cls, name):
+        """
+            Loader options for a named profile
+            :param name: Profile name
+            :return: Tuple of loader options
+        """
+        return cls.load_profiles[name]()
+
+
+class ShopScopedMixin:
+    """
+        Tenant scoped lookups.
+        Ownership checks filter on shop_id in SQL instead of loading every child row of the shop.
+    """
+
+    @classmethod
+    def for_shop(cls, shop):
+        """
+            Query restricted to rows owned by the shop
+            :param shop: BarberShop
+            :return: Query
+        """
+        return cls.query.filter(cls.shop_id == shop.id)
+
+    @classmethod
+    def exists(cls, ident):
+        """
+            Check whether a row exists regardless of owner
+            :param ident: Primary key
+            :return: bool
+        """
+        return db.session.query(cls.id).filter(cls.id == ident).first() is not None
+
+
+class Organization(db.Model):
+    """Owner account grouping several barbershops (branches)"""
+    __tablename__ = "organizations"
+
+    id = db.Column(db.Integer, primary_key=True)
+    public_id = db.Column(db.String(30), unique=True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Branch that created the organization; only it can change the branches or switch into them
+    owner_id = db.Column(
+        db.Integer,
+        db.ForeignKey("barbershops.id", ondelete="SET NULL", use_alter=True, name="fk_organizations_owner_id_barbershops"),
+        nullable=True
+    )
+    shops = db.relationship("BarberShop", backref="organization", lazy="dynamic", foreign_keys="BarberShop.organization_id")
+
+    def __repr__(self):
+        return f"Organization({self.name})"
 
 
 class BarberShop(db.Model):
     """Barbershop model"""
     __tablename__ = "barbershops"
+    __table_args__ = (
+        db.Index(
+            "ix_barbershops_shop_name_trgm", "shop_name",
+            postgresql_using="gin", postgresql_ops={"shop_name": "gin_trgm_ops"}
+        ),
+        db.Index("ix_barbershops_county_city", "county", "city"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     public_id = db.Column(db.String(30), unique=True, nullable=False)
@@ -17,6 +88,7 @@ class BarberShop(db.Model):
     active = db.Column(db.Boolean(), default=False)
     join_date = db.Column(db.DateTime, default=datetime.utcnow)
     modified_date = db.Column(db.DateTime)
+    organization_id = db.Column(db.Integer, db.ForeignKey("organizations.id", ondelete="SET NULL"), index=True)
     services = db.relationship("Service", backref="shop", lazy="dynamic", cascade='all, delete-orphan')
     inventory = db.relationship("Inventory", backref="shop", lazy="dynamic", cascade='all, delete-orphan')
     expense_accounts = db.relationship("ExpenseAccounts", backref="shop", lazy="dynamic", cascade='all, delete-orphan')
@@ -29,21 +101,77 @@ class BarberShop(db.Model):
         return f"({self.name}, {self.email})"
 
 
-class Inventory(db.Model):
+class Inventory(LoadProfileMixin, ShopScopedMixin, db.Model):
     """Shop inventory"""
     __tablename__ = "inventory"
+    load_profiles = {
+        "shop": lambda: (joinedload(Inventory.shop),)
+    }
 
     id = db.Column(db.Integer, primary_key=True)
     product_name = db.Column(db.String(100), nullable=False)
     product_level = db.Column(db.Integer, nullable=False)
+    # Quantity on hand and when full. Products without a capacity are only tracked by level, by hand.
+    stock = db.Column(db.Float, nullable=True)
+    capacity = db.Column(db.Float, nullable=True)
     modified_at = db.Column(db.DateTime)
-    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id"))
+    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id"), index=True)
 
     def __repr__(self):
         return f"Inventory({self.product_name}, {self.product_level})"
 
 
-class Service(db.Model):
+class ServiceRecipe(db.Model):
+    """Inventory a service uses up each time it is sold"""
+    __tablename__ = "service_recipes"
+    __table_args__ = (db.UniqueConstraint("service_id", "inventory_id", name="uq_service_recipes_service_inventory"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    service_id = db.Column(db.Integer, db.ForeignKey("services.id", ondelete="CASCADE"), nullable=False)
+    inventory_id = db.Column(db.Integer, db.ForeignKey("inventory.id", ondelete="CASCADE"), nullable=False, index=True)
+    amount = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f"ServiceRecipe({self.service_id}, {self.inventory_id}, {self.amount})"
+
+
+class InventoryEvent(db.Model):
+    """
+        Append-only history of inventory levels, written on create, update and replenish.
+        Rows are never updated.
+    """
+    __tablename__ = "inventory_events"
+    __table_args__ = (db.Index("ix_inventory_events_inventory_id_created_at", "inventory_id", "created_at"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    inventory_id = db.Column(db.Integer, db.ForeignKey("inventory.id", ondelete="CASCADE"), nullable=False)
+    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id", ondelete="CASCADE"), nullable=False, index=True)
+    event = db.Column(db.String(20), nullable=False)  # created, updated, replenished or snapshot
+    level_before = db.Column(db.Integer, nullable=True)
+    level_after = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"InventoryEvent({self.inventory_id}, {self.event}, {self.level_before}->{self.level_after})"
+
+
+class InventoryConsumption(db.Model):
+    """Consumption rate and predicted low date per product, precomputed by 'flask estimate-inventory'"""
+    __tablename__ = "inventory_consumption"
+
+    inventory_id = db.Column(db.Integer, db.ForeignKey("inventory.id", ondelete="CASCADE"), primary_key=True)
+    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id", ondelete="CASCADE"), nullable=False, index=True)
+    level = db.Column(db.Integer, nullable=False)
+    days_per_level = db.Column(db.Float, nullable=True)  # None until a level drop has been observed
+    predicted_low_at = db.Column(db.DateTime, nullable=True, index=True)
+    predicted_critical_at = db.Column(db.DateTime, nullable=True)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"InventoryConsumption({self.inventory_id}, {self.days_per_level})"
+
+
+class Service(ShopScopedMixin, db.Model):
     """Shop Service"""
     __tablename__ = "services"
 
@@ -52,16 +180,23 @@ class Service(db.Model):
     description = db.Column(db.Text, nullable=True)
     charges = db.Column(db.Integer, nullable=False)
     modified_at = db.Column(db.DateTime)
-    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id"))
+    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id"), index=True)
     sales = db.relationship("Sale", backref="service", lazy="dynamic")
 
     def __str__(self):
         return f"Services({self.service})"
 
 
-class Sale(db.Model):
+class Sale(ShopScopedMixin, db.Model):
     """Sales"""
     __tablename__ = "sales"
+    __table_args__ = (
+        db.Index("ix_sales_shop_id_year_month", "shop_id", "year", "month"),
+        # Partial index of the sales still to apply; elsewhere it would only duplicate the primary key
+        db.Index(
+            "ix_sales_stock_pending", "id", postgresql_where=db.text("NOT stock_applied")
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     payment_method = db.Column(db.String(30), nullable=False)
@@ -69,30 +204,62 @@ class Sale(db.Model):
     date_created = db.Column(db.DateTime, default=datetime.utcnow)
     year = db.Column(db.Integer, nullable=False)
     month = db.Column(db.Integer, nullable=False)
-    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id"))
+    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id"), index=True)
     service_id = db.Column(db.Integer, db.ForeignKey("services.id", ondelete='SET NULL'))
+    # Barber who recorded the sale, None for sales recorded by the shop
+    employee_id = db.Column(db.Integer, db.ForeignKey("employees.id", ondelete='SET NULL'), index=True)
+    # Set once the service recipe has been taken off the stock
+    stock_applied = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
 
     def __repr__(self):
         return f"Sales({self.amount}, {self.payment_method})"
 
 
-class ExpenseAccounts(db.Model):
+class SaleArchive(db.Model):
+    """
+        Sales of closed years moved out of the hot sales table by 'flask archive-sales'.
+        Range partitioned by year on Postgres, a plain table elsewhere.
+    """
+    __tablename__ = "sales_archive"
+    __table_args__ = (
+        db.Index("ix_sales_archive_shop_id_year_month", "shop_id", "year", "month"),
+        {"postgresql_partition_by": "RANGE (year)"},
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    payment_method = db.Column(db.String(30), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    date_created = db.Column(db.DateTime)
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    month = db.Column(db.Integer, nullable=False)
+    shop_id = db.Column(db.Integer, nullable=False)
+    service_id = db.Column(db.Integer, nullable=True)
+    employee_id = db.Column(db.Integer, nullable=True)
+
+    def __repr__(self):
+        return f"SaleArchive({self.id}, {self.year})"
+
+
+class ExpenseAccounts(ShopScopedMixin, db.Model):
     """Barbershop Expense accounts"""
     __tablename__ = "expenseaccounts"
 
     id = db.Column(db.Integer, primary_key=True)
     account_name = db.Column(db.String(50), nullable=False)
     description = db.Column(db.Text)
-    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id"))
+    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id"), index=True)
     expense = db.relationship("Expenses", backref="account", lazy="dynamic")
 
     def __repr__(self):
         return f"ExpenseAccounts({self.account_name})"
 
 
-class Expenses(db.Model):
+class Expenses(LoadProfileMixin, ShopScopedMixin, db.Model):
     """Expenses"""
     __tablename__ = "expenses"
+    load_profiles = {
+        "account": lambda: (joinedload(Expenses.account).joinedload(ExpenseAccounts.shop),)
+    }
 
     id = db.Column(db.Integer, primary_key=True)
     expense = db.Column(db.String(100), nullable=False)
@@ -102,13 +269,23 @@ class Expenses(db.Model):
     year = db.Column(db.Integer, nullable=False)
     month = db.Column(db.Integer, nullable=False)
     modified_at = db.Column(db.DateTime)
-    expense_account = db.Column(db.Integer, db.ForeignKey("expenseaccounts.id", ondelete='SET NULL'))
+    expense_account = db.Column(db.Integer, db.ForeignKey("expenseaccounts.id", ondelete='SET NULL'), index=True)
+
+    @classmethod
+    def for_shop(cls, shop):
+        """
+            Expenses are owned through their expense account
+            :param shop: BarberShop
+            :return: Query
+        """
+        return cls.query.join(ExpenseAccounts, cls.expense_account == ExpenseAccounts.id) \
+            .filter(ExpenseAccounts.shop_id == shop.id)
 
     def __repr__(self):
         return f"Expense({self.expense})"
 
 
-class Equipment(db.Model):
+class Equipment(ShopScopedMixin, db.Model):
     """Barber shop Equipment"""
     __tablename__ = "equipments"
 
@@ -118,27 +295,30 @@ class Equipment(db.Model):
     faulty = db.Column(db.Boolean, default=False)
     bought_on = db.Column(db.DateTime)
     price = db.Column(db.Integer, nullable=False)
-    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id"))
+    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id"), index=True)
 
     def __repr__(self):
         return f"Equipment({self.equipment_name})"
 
 
-class Notification(db.Model):
+class Notification(ShopScopedMixin, db.Model):
     """Notifications"""
     __tablename__ = "notifications"
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     message = db.Column(db.Text, nullable=False)
-    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id"))
+    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id"), index=True)
     read = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 
-class Employee(db.Model):
+class Employee(LoadProfileMixin, ShopScopedMixin, db.Model):
     """Employee table"""
     __tablename__ = "employees"
+    load_profiles = {
+        "shop": lambda: (joinedload(Employee.shop),)
+    }
 
     id = db.Column(db.Integer, primary_key=True)
     public_id = db.Column(db.String(20), nullable=False)
@@ -151,7 +331,7 @@ class Employee(db.Model):
     create_date = db.Column(db.DateTime, default=datetime.utcnow)
     phone = db.Column(db.String(20), nullable=True)
     active = db.Column(db.Boolean, default=False)
-    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id"))
+    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id"), index=True)
 
     def __repr__(self):
         return f"Employee({self.f_name}, {self.l_name})"
@@ -164,3 +344,186 @@ class BarbersAppToken(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(15), default="bearer_token", unique=True)
     token = db.Column(db.String(1000), nullable=True)
+
+
+class IdempotencyKey(db.Model):
+    """Responses of create requests stored by Idempotency-Key so client retries don't write twice"""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (db.UniqueConstraint("key", "scope", name="uq_idempotency_keys_key_scope"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(64), nullable=False)
+    scope = db.Column(db.String(100), nullable=False)  # Shop public_id, or the path for platform wide routes
+    request_hash = db.Column(db.String(64), nullable=False)
+    response_hash = db.Column(db.String(64), nullable=True)
+    status_code = db.Column(db.Integer, nullable=True)  # None while the first request is still in progress
+    response_body = db.Column(db.Text, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"IdempotencyKey({self.key}, {self.scope})"
+
+
+class RevokedToken(db.Model):
+    """Access tokens revoked before they expire, kept until their expiry"""
+    __tablename__ = "revoked_tokens"
+
+    jti = db.Column(db.String(32), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"RevokedToken({self.jti})"
+
+
+class RefreshToken(db.Model):
+    """
+        Long lived refresh tokens, stored as sha256 hashes. Every refresh replaces the token with a new
+        one in the same family; reusing a replaced token revokes the whole family.
+    """
+    __tablename__ = "refresh_tokens"
+    __table_args__ = (db.Index("ix_refresh_tokens_subject", "subject_type", "subject_id"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    token_hash = db.Column(db.String(64), nullable=False, unique=True)
+    family = db.Column(db.String(32), nullable=False, index=True)
+    subject_type = db.Column(db.String(10), nullable=False)  # shop or employee
+    subject_id = db.Column(db.Integer, nullable=False)
+    device = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"RefreshToken({self.subject_type}, {self.subject_id}, {self.device})"
+
+
+class PasswordPolicy(db.Model):
+    """bcrypt costs chosen by 'flask calibrate-password-hash'. The latest row is the policy in use."""
+    __tablename__ = "password_policies"
+
+    id = db.Column(db.Integer, primary_key=True)
+    cost = db.Column(db.Integer, nullable=False)
+    target_ms = db.Column(db.Integer, nullable=False)
+    verify_ms = db.Column(db.Float, nullable=False)  # Measured verification time at this cost
+    host = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"PasswordPolicy({self.cost}, {self.verify_ms}ms)"
+
+
+class SalesForecast(db.Model):
+    """Daily revenue forecasts precomputed by the 'flask forecast-sales' batch job"""
+    __tablename__ = "sales_forecasts"
+    __table_args__ = (db.UniqueConstraint("shop_id", "day", name="uq_sales_forecasts_shop_day"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id", ondelete="CASCADE"), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    revenue = db.Column(db.Float, nullable=False)
+    generated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"SalesForecast({self.shop_id}, {self.day}, {self.revenue})"
+
+
+class ShopKpi(db.Model):
+    """Monthly shop KPIs precomputed by the 'flask compute-kpis' batch job"""
+    __tablename__ = "shop_kpis"
+    __table_args__ = (db.UniqueConstraint("shop_id", "year", "month", name="uq_shop_kpis_shop_period"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id", ondelete="CASCADE"), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    revenue = db.Column(db.Integer, nullable=False, default=0)
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    average_ticket = db.Column(db.Float, nullable=False, default=0)
+    expenses = db.Column(db.Integer, nullable=False, default=0)
+    expense_ratio = db.Column(db.Float, nullable=True)  # None when there is no revenue
+    employees = db.Column(db.Integer, nullable=False, default=0)
+    revenue_per_employee = db.Column(db.Float, nullable=True)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ServiceKpi(db.Model):
+    """Monthly revenue per service"""
+    __tablename__ = "service_kpis"
+
+    id = db.Column(db.Integer, primary_key=True)
+    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id", ondelete="CASCADE"), nullable=False, index=True)
+    service_id = db.Column(db.Integer, db.ForeignKey("services.id", ondelete="CASCADE"), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    sales_count = db.Column(db.Integer, nullable=False)
+    revenue = db.Column(db.Integer, nullable=False)
+
+
+class PaymentMethodKpi(db.Model):
+    """Monthly payment method mix"""
+    __tablename__ = "payment_method_kpis"
+
+    id = db.Column(db.Integer, primary_key=True)
+    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id", ondelete="CASCADE"), nullable=False, index=True)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    payment_method = db.Column(db.String(30), nullable=False)
+    transactions = db.Column(db.Integer, nullable=False)
+    revenue = db.Column(db.Integer, nullable=False)
+
+
+class CommissionRate(db.Model):
+    """
+        Commission paid on sales, in percent of the service charges.
+        service_id and employee_id narrow the rate; the most specific rate applies to each sale.
+    """
+    __tablename__ = "commission_rates"
+    __table_args__ = (
+        db.UniqueConstraint("shop_id", "service_id", "employee_id", name="uq_commission_rates_scope"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id", ondelete="CASCADE"), nullable=False, index=True)
+    service_id = db.Column(db.Integer, db.ForeignKey("services.id", ondelete="CASCADE"), nullable=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey("employees.id", ondelete="CASCADE"), nullable=True)
+    rate = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f"CommissionRate({self.service_id}, {self.employee_id}, {self.rate})"
+
+
+class PayrollRun(db.Model):
+    """Monthly payroll of a shop, recorded as a single expense on the Payroll account"""
+    __tablename__ = "payroll_runs"
+    __table_args__ = (db.UniqueConstraint("shop_id", "year", "month", name="uq_payroll_runs_shop_period"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    shop_id = db.Column(db.Integer, db.ForeignKey("barbershops.id", ondelete="CASCADE"), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    employees = db.Column(db.Integer, nullable=False, default=0)
+    salaries = db.Column(db.Integer, nullable=False, default=0)
+    commissions = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    expense_id = db.Column(db.Integer, db.ForeignKey("expenses.id", ondelete="SET NULL"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expense = db.relationship("Expenses")
+    items = db.relationship("PayrollItem", lazy="dynamic")
+
+    def __repr__(self):
+        return f"PayrollRun({self.shop_id}, {self.year}-{self.month}, {self.total})"
+
+
+class PayrollItem(db.Model):
+    """Pay of one employee in a payroll run"""
+    __tablename__ = "payroll_items"
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey("payroll_runs.id", ondelete="CASCADE"), nullable=False, index=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey("employees.id", ondelete="SET NULL"), nullable=True)
+    salary = db.Column(db.Integer, nullable=False, default=0)
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Integer, nullable=False, default=0)
+    commission = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,101 @@
+import gzip
+import json
+from flask import request, current_app
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+X_MSGPACK = "application/x-msgpack"
+COLUMNAR = "application/vnd.kinyozi.columnar+json"
+FORMATS = (JSON, MSGPACK, X_MSGPACK, COLUMNAR)
+ENCODINGS = ("br", "gzip")
+
+
+def columnar(obj):
+    """
+        Rewrite every non-empty list of objects sharing the same keys as
+        {"columns": [names], "values": [[column values], ...]} so field names are sent once
+        :param obj: Decoded JSON document
+        :return: Columnar document
+    """
+    if isinstance(obj, list):
+        if obj and all(isinstance(item, dict) for item in obj) and all(item.keys() == obj[0].keys() for item in obj):
+            columns = list(obj[0])
+            return dict(columns=columns, values=[[columnar(item[column]) for item in obj] for column in columns])
+        return [columnar(item) for item in obj]
+    if isinstance(obj, dict):
+        return {key: columnar(value) for key, value in obj.items()}
+    return obj
+
+
+def encode_body(data, mimetype):
+    """
+        Serialize a decoded JSON document in the negotiated format
+        :param data: Decoded JSON document
+        :param mimetype: One of FORMATS
+        :return: bytes
+    """
+    if mimetype in (MSGPACK, X_MSGPACK):
+        import msgpack
+        return msgpack.packb(data)
+    if mimetype == COLUMNAR:
+        return json.dumps(columnar(data), separators=(",", ":")).encode("utf-8")
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def compress_body(body, encoding):
+    """
+        :param body: Response bytes
+        :param encoding: "br" or "gzip"
+        :return: Compressed bytes
+    """
+    if encoding == "br":
+        import brotli
+        return brotli.compress(body, quality=current_app.config["COMPRESSION_BROTLI_QUALITY"])
+    return gzip.compress(body, compresslevel=current_app.config["COMPRESSION_GZIP_LEVEL"])
+
+
+def negotiate_response(response):
+    """
+        Re-encode JSON responses as MessagePack or columnar JSON when the Accept header asks for it,
+        then compress them with brotli or gzip once they pass COMPRESSION_MIN_BYTES.
+        Runs after the view so idempotency replays and error responses are negotiated the same way.
+        :param response: Response
+        :return: Response
+    """
+    if response.mimetype != JSON or response.direct_passthrough or response.is_streamed:
+        return response
+    response.vary.add("Accept")
+
+    mimetype = request.accept_mimetypes.best_match(current_app.extensions["response_formats"], default=JSON)
+    if mimetype != JSON:
+        response.set_data(encode_body(json.loads(response.get_data()), mimetype))
+        response.mimetype = mimetype
+
+    response.vary.add("Accept-Encoding")
+    if response.content_length < current_app.config["COMPRESSION_MIN_BYTES"] or "Content-Encoding" in response.headers:
+        return response
+    encoding = next(
+        (e for e in current_app.extensions["response_encodings"] if request.accept_encodings[e]), None
+    )
+    if encoding:
+        response.set_data(compress_body(response.get_data(), encoding))
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def _installed(module):
+    from importlib.util import find_spec
+    return find_spec(module) is not None
+
+
+def init_negotiation(app):
+    """
+        Content negotiation and compression for JSON responses.
+        MessagePack and brotli are only offered when their packages are installed.
+        :param app: Flask app
+        :return: None
+    """
+    msgpack_installed = _installed("msgpack")
+    app.extensions["response_formats"] = [f for f in FORMATS if msgpack_installed or f not in (MSGPACK, X_MSGPACK)]
+    app.extensions["response_encodings"] = [e for e in ENCODINGS if e != "br" or _installed("brotli")]
+    app.after_request(negotiate_response)
@@ -0,0 +1,23 @@
+import datetime
+from API import db
+from API.models import Notification
+
+
+def prune_read_notifications(older_than_days, batch_size=1000):
+    """
+        Delete read notifications older than the retention period in batches,
+        keeping each transaction short
+        :param older_than_days: Retention period in days
+        :param batch_size: Rows deleted per statement
+        :return: Number of deleted rows
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=older_than_days)
+    deleted = 0
+    while True:
+        ids = [row.id for row in db.session.query(Notification.id)
+               .filter(Notification.read.is_(True), Notification.created_at < cutoff)
+               .limit(batch_size)]
+        if not ids:
+            return deleted
+        deleted += Notification.query.filter(Notification.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
@@ -1,14 +1,18 @@
+import datetime
 from flask import Blueprint, request, jsonify
+from sqlalchemy import insert, select, literal
 from API import db
 from API.models import Notification, BarberShop
 from ..utils import shop_login_required, verify_api_key
 from ..serializer import serialize_notification
+from ..idempotency import idempotent
 
 notifications_blueprint = Blueprint("notifications", __name__)
 
 
 @notifications_blueprint.route("/API/notifications/create", methods=["POST"])
 @verify_api_key
+@idempotent
 def create_notification():
     """
         Create New notification
@@ -29,6 +33,44 @@ def create_notification():
     return jsonify(dict(message="Notification Sent")), 201
 
 
+@notifications_blueprint.route("/API/notifications/broadcast", methods=["POST"])
+@verify_api_key
+@idempotent
+def broadcast_notification():
+    """
+        Send a notification to every shop, or to the shops matching the county, city and active filters.
+        The fan-out is a single INSERT ... SELECT so no shop rows are loaded.
+        :return: 400, 201
+    """
+    data = request.get_json()
+    if not data.get("title") or not data.get("message"):
+        return jsonify(dict(message="Missing data")), 400
+    if data.get("active") is not None and not isinstance(data["active"], bool):
+        return jsonify(dict(message="active must be true or false")), 400
+
+    shops_query = select(
+        literal(data["title"].strip().title()),
+        literal(data["message"].strip()),
+        BarberShop.id,
+        literal(False),
+        literal(datetime.datetime.utcnow())
+    )
+    if data.get("county"):
+        shops_query = shops_query.where(BarberShop.county == data["county"].strip().title())
+    if data.get("city"):
+        shops_query = shops_query.where(BarberShop.city == data["city"].strip().title())
+    if data.get("active") is not None:
+        shops_query = shops_query.where(BarberShop.active.is_(data["active"]))
+
+    result = db.session.execute(
+        insert(Notification).from_select(
+            ["title", "message", "shop_id", "read", "created_at"], shops_query
+        )
+    )
+    db.session.commit()
+    return jsonify(dict(message="Notification Sent", recipients=result.rowcount)), 201
+
+
 @notifications_blueprint.route("/API/notifications/read/<int:notification_id>", methods=["PUT"])
 @shop_login_required
 def read_notification(current_user, notification_id):
@@ -38,11 +80,10 @@ def read_notification(current_user, notification_id):
         :param notification_id: Notification ID
         :return: 404, 200
     """
-    notification = Notification.query.filter_by(id=notification_id).first()
+    notification = Notification.for_shop(current_user).filter_by(id=notification_id).first()
     if not notification:
-        return jsonify(dict(message="Notification not FOUND")), 404
-
-    if current_user.public_id != notification.shop.public_id:
+        if not Notification.exists(notification_id):
+            return jsonify(dict(message="Notification not FOUND")), 404
         return jsonify(dict(message="Not Allowed")), 401
 
     notification.read = True
@@ -82,11 +123,10 @@ def fetch_single_notification(current_user, notification_id):
         :param notification_id: Notification ID
         :return: 404, 200
     """
-    notification = Notification.query.filter_by(id=notification_id).first()
+    notification = Notification.for_shop(current_user).filter_by(id=notification_id).first()
     if not notification:
-        return jsonify(dict(message="Not Found")), 404
-
-    if notification.shop.public_id != current_user.public_id:
+        if not Notification.exists(notification_id):
+            return jsonify(dict(message="Not Found")), 404
         return jsonify(dict(message="Not Allowed")), 401
 
     return jsonify(serialize_notification(notification))
@@ -101,11 +141,10 @@ def delete_single_notification(current_user, notification_id):
         :param notification_id: Notification ID
         :return: 404, 200
     """
-    notification = Notification.query.filter_by(id=notification_id).first()
+    notification = Notification.for_shop(current_user).filter_by(id=notification_id).first()
     if not notification:
-        return jsonify(dict(message="Not Found")), 404
-
-    if notification.shop.public_id != current_user.public_id:
+        if not Notification.exists(notification_id):
+            return jsonify(dict(message="Not Found")), 404
         return jsonify(dict(message="Not Allowed")), 401
 
     db.session.delete(notification)
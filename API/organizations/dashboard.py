@@ -0,0 +1,98 @@
+import datetime
+from API import db
+from API.cache import ShopCache
+from API.models import BarberShop, Service
+from API.kpis.jobs import compute_chunk_kpis
+
+DASHBOARD_CACHE_SECONDS = 300
+# Keyed by organization id instead of shop id
+dashboard_cache = ShopCache(ttl=DASHBOARD_CACHE_SECONDS)
+
+BRANCH_FIELDS = (
+    "revenue", "sales_count", "average_ticket", "expenses", "expense_ratio", "employees", "revenue_per_employee"
+)
+
+
+def consolidate(branch_kpis):
+    """
+        Organization totals from the KPIs of its branches
+        :param branch_kpis: list of KPI dicts
+        :return: dict
+    """
+    revenue = sum(kpi["revenue"] for kpi in branch_kpis)
+    sales_count = sum(kpi["sales_count"] for kpi in branch_kpis)
+    expenses = sum(kpi["expenses"] for kpi in branch_kpis)
+    employees = sum(kpi["employees"] for kpi in branch_kpis)
+    return dict(
+        revenue=revenue,
+        sales_count=sales_count,
+        average_ticket=round(revenue / sales_count, 2) if sales_count else 0,
+        expenses=expenses,
+        expense_ratio=round(expenses / revenue, 4) if revenue else None,
+        profit=revenue - expenses,
+        employees=employees,
+        revenue_per_employee=round(revenue / employees, 2) if employees else None
+    )
+
+
+def organization_dashboard(organization_id, year, month):
+    """
+        Sales, expenses and KPIs of every branch for a month and their consolidated totals.
+        Every metric comes from one grouped query over all branches. Cached for DASHBOARD_CACHE_SECONDS.
+        :param organization_id: Organization id
+        :param year: Year of the period
+        :param month: Month of the period
+        :return: dict
+    """
+    dashboard = dashboard_cache.get(organization_id, (year, month))
+    if dashboard is not None:
+        return dashboard
+
+    branches = (
+        db.session.query(BarberShop.id, BarberShop.public_id, BarberShop.shop_name, BarberShop.city)
+        .filter(BarberShop.organization_id == organization_id)
+        .order_by(BarberShop.shop_name)
+        .all()
+    )
+    shop_ids = [branch.id for branch in branches]
+    shop_kpis, service_kpis, payment_kpis, _ = compute_chunk_kpis(shop_ids, year, month)
+    kpis = {kpi["shop_id"]: kpi for kpi in shop_kpis}
+
+    # Branches have their own services, matched across branches by name
+    names = dict(
+        db.session.query(Service.id, Service.service)
+        .filter(Service.id.in_({row["service_id"] for row in service_kpis}))
+        .all()
+    )
+    services = {}
+    for row in service_kpis:
+        name = names[row["service_id"]]
+        totals = services.setdefault(name.lower(), dict(service=name, sales=0, revenue=0))
+        totals["sales"] += row["sales_count"]
+        totals["revenue"] += row["revenue"]
+    payment_methods = {}
+    for row in payment_kpis:
+        totals = payment_methods.setdefault(row["payment_method"], dict(method=row["payment_method"], transactions=0, revenue=0))
+        totals["transactions"] += row["transactions"]
+        totals["revenue"] += row["revenue"]
+
+    dashboard = dict(
+        year=year,
+        month=month,
+        totals=consolidate(shop_kpis),
+        branches=[
+            dict(
+                public_id=branch.public_id,
+                shop_name=branch.shop_name,
+                city=branch.city,
+                profit=kpis[branch.id]["revenue"] - kpis[branch.id]["expenses"],
+                **{field: kpis[branch.id][field] for field in BRANCH_FIELDS}
+            )
+            for branch in branches
+        ],
+        services=sorted(services.values(), key=lambda row: row["revenue"], reverse=True),
+        payment_methods=sorted(payment_methods.values(), key=lambda row: row["transactions"], reverse=True),
+        computed_at=datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    )
+    dashboard_cache.set(organization_id, dashboard, (year, month))
+    return dashboard
@@ -0,0 +1,194 @@
+import datetime
+import secrets
+from flask import Blueprint, jsonify, request
+from API import db
+from API.models import Organization, BarberShop
+from ..utils import shop_login_required
+from ..idempotency import idempotent
+from ..ratelimit import rate_limit_class
+from ..passwords import verify_password
+from ..tokens import issue_session
+from .dashboard import organization_dashboard, dashboard_cache
+
+organizations_blueprint = Blueprint("organizations", __name__, url_prefix="/API/organizations")
+
+
+def member_organization(current_user, public_id):
+    """
+        :param current_user: Logged in shop owner
+        :param public_id: Organization public_id
+        :return: The organization if the shop is one of its branches, else None
+    """
+    organization = Organization.query.filter_by(public_id=public_id).first()
+    if not organization or current_user.organization_id != organization.id:
+        return None
+    return organization
+
+
+def owned_organization(current_user, public_id):
+    """
+        :param current_user: Logged in shop owner
+        :param public_id: Organization public_id
+        :return: The organization if the shop is its owner branch, else None
+    """
+    organization = member_organization(current_user, public_id)
+    if not organization or organization.owner_id != current_user.id:
+        return None
+    return organization
+
+
+@organizations_blueprint.route("/create/<string:public_id>", methods=["POST"])
+@shop_login_required
+@idempotent
+def create_organization(current_user, public_id):
+    """
+        Create an organization with the current shop as its first branch and owner
+        :param current_user: Logged in shop owner
+        :param public_id: Barbershop public_id
+        :return: 401, 409, 201
+    """
+    if current_user.public_id != public_id:
+        return jsonify(dict(message="Not allowed")), 401
+    if current_user.organization_id:
+        return jsonify(dict(message="This shop already belongs to an organization")), 409
+
+    data = request.get_json()
+    organization = Organization(
+        public_id=secrets.token_hex(8), name=data["name"].strip().title(), owner_id=current_user.id
+    )
+    db.session.add(organization)
+    db.session.flush()
+    current_user.organization_id = organization.id
+    db.session.commit()
+    return jsonify(dict(message="Organization created", id=organization.public_id)), 201
+
+
+@organizations_blueprint.route("/<string:public_id>", methods=["GET"])
+@shop_login_required
+def fetch_organization(current_user, public_id):
+    """
+        Organization and its branches
+        :param current_user: Logged in shop owner of a branch
+        :param public_id: Organization public_id
+        :return: 401, 200
+    """
+    organization = member_organization(current_user, public_id)
+    if not organization:
+        return jsonify(dict(message="Not allowed")), 401
+
+    branches = [
+        dict(public_id=shop.public_id, shop_name=shop.shop_name, city=shop.city, county=shop.county,
+             owner=shop.id == organization.owner_id)
+        for shop in organization.shops.order_by(BarberShop.shop_name)
+    ]
+    return jsonify(dict(id=organization.public_id, name=organization.name, branches=branches)), 200
+
+
+@organizations_blueprint.route("/<string:public_id>/branches", methods=["POST"])
+@rate_limit_class("auth")
+@shop_login_required
+def add_branch(current_user, public_id):
+    """
+        Add a shop to the organization. Only the owner branch can add branches,
+        and the new branch's own email and password prove ownership.
+        :param current_user: Logged in shop owner of the owner branch
+        :param public_id: Organization public_id
+        :return: 401, 404, 409, 201
+    """
+    organization = owned_organization(current_user, public_id)
+    if not organization:
+        return jsonify(dict(message="Not allowed")), 401
+
+    data = request.get_json()
+    branch = BarberShop.query.filter_by(email=data["email"].strip()).first()
+    if not branch:
+        return jsonify(dict(message="Barbershop not found")), 404
+    if not verify_password(branch, data["password"].strip()):
+        return jsonify(dict(message="Incorrect Password")), 401
+    if branch.organization_id:
+        return jsonify(dict(message="This shop already belongs to an organization")), 409
+
+    branch.organization_id = organization.id
+    db.session.commit()
+    dashboard_cache.invalidate(organization.id)
+    return jsonify(dict(message="Branch added", public_id=branch.public_id)), 201
+
+
+@organizations_blueprint.route("/<string:public_id>/branches/<string:shop_id>", methods=["DELETE"])
+@rate_limit_class("auth")
+@shop_login_required
+def remove_branch(current_user, public_id, shop_id):
+    """
+        Remove a shop from the organization. The owner branch can remove any other branch,
+        other branches can only leave.
+        :param current_user: Logged in shop owner of a branch
+        :param public_id: Organization public_id
+        :param shop_id: public_id of the branch
+        :return: 401, 404, 409, 200
+    """
+    organization = member_organization(current_user, public_id)
+    if not organization:
+        return jsonify(dict(message="Not allowed")), 401
+    is_owner = organization.owner_id == current_user.id
+    if not is_owner and shop_id != current_user.public_id:
+        return jsonify(dict(message="Not allowed")), 401
+    if is_owner and shop_id == current_user.public_id:
+        return jsonify(dict(message="The owner branch can't leave its organization")), 409
+
+    data = request.get_json()
+    if not verify_password(current_user, data["password"].strip()):
+        return jsonify(dict(message="Incorrect Password")), 401
+
+    branch = organization.shops.filter_by(public_id=shop_id).first()
+    if not branch:
+        return jsonify(dict(message="Branch not found")), 404
+
+    branch.organization_id = None
+    db.session.commit()
+    dashboard_cache.invalidate(organization.id)
+    return jsonify(dict(message="Branch removed")), 200
+
+
+@organizations_blueprint.route("/<string:public_id>/switch/<string:shop_id>", methods=["POST"])
+@rate_limit_class("auth")
+@shop_login_required
+def switch_branch(current_user, public_id, shop_id):
+    """
+        Log the owner branch into another branch of the organization without its password
+        :param current_user: Logged in shop owner of the owner branch
+        :param public_id: Organization public_id
+        :param shop_id: public_id of the branch
+        :return: 401, 404, 200
+    """
+    organization = owned_organization(current_user, public_id)
+    if not organization:
+        return jsonify(dict(message="Not allowed")), 401
+
+    branch = organization.shops.filter_by(public_id=shop_id).first()
+    if not branch:
+        return jsonify(dict(message="Branch not found")), 404
+    return jsonify(dict(issue_session(branch, "shop"), public_id=branch.public_id)), 200
+
+
+@organizations_blueprint.route("/dashboard/<string:public_id>", methods=["GET"])
+@rate_limit_class("dashboard")
+@shop_login_required
+def fetch_organization_dashboard(current_user, public_id):
+    """
+        Consolidated sales, expenses and KPIs of every branch for a month (defaults to the current month)
+        with a per-branch breakdown
+        :param current_user: Logged in shop owner of a branch
+        :param public_id: Organization public_id
+        :return: 401, 400, 200
+    """
+    organization = member_organization(current_user, public_id)
+    if not organization:
+        return jsonify(dict(message="Not allowed")), 401
+
+    now = datetime.datetime.utcnow()
+    year = request.args.get("year", now.year, type=int)
+    month = request.args.get("month", now.month, type=int)
+    if not 1 <= month <= 12:
+        return jsonify(dict(message="Invalid month")), 400
+
+    return jsonify(dict(name=organization.name, **organization_dashboard(organization.id, year, month))), 200
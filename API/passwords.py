@@ -0,0 +1,97 @@
+import socket
+import statistics
+import time
+from flask import current_app
+from API import db, bcrypt
+from API.models import PasswordPolicy
+
+MAX_COST = 16
+
+
+def current_cost():
+    """
+        bcrypt cost new hashes are made with. The recorded policy is cached per worker
+        for PASSWORD_POLICY_REFRESH_SECONDS.
+        :return: int
+    """
+    if current_app.config["PASSWORD_HASH_COST"]:
+        return current_app.config["PASSWORD_HASH_COST"]
+    cached = current_app.extensions.get("password_policy")
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    policy = PasswordPolicy.query.order_by(PasswordPolicy.id.desc()).first()
+    cost = policy.cost if policy else current_app.config["BCRYPT_LOG_ROUNDS"]
+    current_app.extensions["password_policy"] = (cost, time.monotonic() + current_app.config["PASSWORD_POLICY_REFRESH_SECONDS"])
+    return cost
+
+
+def hash_password(password):
+    """
+        :param password: Plain text password
+        :return: bcrypt hash at the current policy cost
+    """
+    return bcrypt.generate_password_hash(password, rounds=current_cost()).decode("utf-8")
+
+
+def hash_cost(password_hash):
+    # $2b$12$<salt+hash>
+    return int(password_hash.split("$")[2])
+
+
+def verify_password(user, password):
+    """
+        Check a login password, rehashing it when its cost no longer matches the policy
+        :param user: BarberShop or Employee
+        :param password: Plain text password
+        :return: bool
+    """
+    if not user.password or not bcrypt.check_password_hash(user.password, password):
+        return False
+    if hash_cost(user.password) != current_cost():
+        user.password = hash_password(password)
+        db.session.commit()
+    return True
+
+
+def measure_cost(cost, samples=3):
+    """
+        :param cost: bcrypt cost
+        :param samples: Verifications timed
+        :return: Median verification time in ms
+    """
+    password_hash = bcrypt.generate_password_hash("calibration-password", rounds=cost)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.check_password_hash(password_hash, "calibration-password")
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(target_ms, min_cost, samples=3):
+    """
+        Time verifications from min_cost upwards until one is slower than target_ms
+        :param target_ms: Target verification time
+        :param min_cost: Lowest cost allowed, used even if it is slower than the target
+        :param samples: Verifications timed per cost
+        :return: (chosen cost, {cost: ms})
+    """
+    timings = {}
+    for cost in range(min_cost, MAX_COST + 1):
+        timings[cost] = measure_cost(cost, samples)
+        if timings[cost] > target_ms:
+            break
+    within_target = [cost for cost, ms in timings.items() if ms <= target_ms]
+    return max(within_target, default=min_cost), timings
+
+
+def record_policy(cost, target_ms, verify_ms):
+    """
+        Make cost the policy for every worker
+        :return: PasswordPolicy
+    """
+    policy = PasswordPolicy(cost=cost, target_ms=target_ms, verify_ms=round(verify_ms, 2), host=socket.gethostname()[:100])
+    db.session.add(policy)
+    db.session.commit()
+    current_app.extensions.pop("password_policy", None)
+    return policy
@@ -0,0 +1,190 @@
+import datetime
+import time
+from sqlalchemy import and_, func, insert
+from sqlalchemy.orm import aliased
+from flask import current_app
+from API import db
+from API.models import (
+    BarberShop, Sale, Service, Employee, Expenses, ExpenseAccounts, CommissionRate, PayrollRun, PayrollItem
+)
+
+
+def commission_rate_expr():
+    """
+        Commission percent of each sale: the employee+service rate, then the employee rate, the service rate
+        and the shop default, in that order
+        :return: (rate expression, list of outer join arguments)
+    """
+    scopes = (
+        (Sale.employee_id, Sale.service_id),
+        (Sale.employee_id, None),
+        (None, Sale.service_id),
+        (None, None),
+    )
+    rates, joins = [], []
+    for employee, service in scopes:
+        rate = aliased(CommissionRate)
+        joins.append((rate, and_(
+            rate.shop_id == Sale.shop_id,
+            rate.employee_id == employee if employee is not None else rate.employee_id.is_(None),
+            rate.service_id == service if service is not None else rate.service_id.is_(None)
+        )))
+        rates.append(rate.rate)
+    return func.coalesce(*rates, 0), joins
+
+
+def compute_chunk_payroll(shop_ids, year, month):
+    """
+        Salary and commission of every employee of a chunk of shops.
+        Commissions come from one grouped query over the month's sales.
+        :param shop_ids: Shop ids in the chunk
+        :param year: Year of the period
+        :param month: Month of the period
+        :return: {shop_id: [item rows]}
+    """
+    rate, joins = commission_rate_expr()
+    query = (
+        db.session.query(
+            Sale.shop_id, Sale.employee_id,
+            func.count(Sale.id).label("sales_count"),
+            func.coalesce(func.sum(Service.charges), 0).label("revenue"),
+            func.coalesce(func.sum(Service.charges * rate / 100.0), 0).label("commission")
+        )
+        .join(Service, Sale.service_id == Service.id)
+    )
+    for target, on in joins:
+        query = query.outerjoin(target, on)
+    commissions = {
+        row.employee_id: row for row in query
+        .filter(Sale.shop_id.in_(shop_ids), Sale.year == year, Sale.month == month, Sale.employee_id.isnot(None))
+        .group_by(Sale.shop_id, Sale.employee_id)
+    }
+    employees = (
+        db.session.query(Employee.id, Employee.shop_id, Employee.salary, Employee.active)
+        .filter(Employee.shop_id.in_(shop_ids))
+        .order_by(Employee.id)
+        .all()
+    )
+
+    items = {}
+    for employee in employees:
+        sales = commissions.get(employee.id)
+        if not employee.active and not sales:
+            continue
+        salary = employee.salary or 0
+        commission = round(sales.commission) if sales else 0
+        items.setdefault(employee.shop_id, []).append(dict(
+            employee_id=employee.id,
+            salary=salary,
+            sales_count=sales.sales_count if sales else 0,
+            revenue=sales.revenue if sales else 0,
+            commission=commission,
+            total=salary + commission
+        ))
+    return items
+
+
+def _payroll_accounts(shop_ids):
+    """
+        Payroll expense account of each shop, created where missing
+        :param shop_ids: Shop ids
+        :return: {shop_id: account id}
+    """
+    name = current_app.config["PAYROLL_EXPENSE_ACCOUNT"]
+    accounts = dict(
+        db.session.query(ExpenseAccounts.shop_id, func.min(ExpenseAccounts.id))
+        .filter(ExpenseAccounts.shop_id.in_(shop_ids), func.lower(ExpenseAccounts.account_name) == name.lower())
+        .group_by(ExpenseAccounts.shop_id)
+        .all()
+    )
+    created = [
+        ExpenseAccounts(account_name=name, description="Salaries And Commissions", shop_id=shop_id)
+        for shop_id in shop_ids if shop_id not in accounts
+    ]
+    if created:
+        db.session.add_all(created)
+        db.session.flush()
+        accounts.update({account.shop_id: account.id for account in created})
+    return accounts
+
+
+def save_chunk_payroll(shop_ids, year, month, items):
+    """
+        Replace the payroll runs of a chunk of shops for a month, each with its expense
+        :param shop_ids: Shop ids in the chunk
+        :param year: Year of the period
+        :param month: Month of the period
+        :param items: Output of compute_chunk_payroll
+        :return: list of PayrollRun
+    """
+    previous = db.session.query(PayrollRun.id, PayrollRun.expense_id).filter(
+        PayrollRun.shop_id.in_(shop_ids), PayrollRun.year == year, PayrollRun.month == month
+    ).all()
+    expense_ids = [run.expense_id for run in previous if run.expense_id]
+    if previous:
+        PayrollItem.query.filter(PayrollItem.run_id.in_([run.id for run in previous])).delete(synchronize_session=False)
+        PayrollRun.query.filter(PayrollRun.id.in_([run.id for run in previous])).delete(synchronize_session=False)
+    if expense_ids:
+        Expenses.query.filter(Expenses.id.in_(expense_ids)).delete(synchronize_session=False)
+    if not items:
+        return []
+
+    accounts = _payroll_accounts(list(items))
+    now = datetime.datetime.utcnow()
+    runs = {}
+    for shop_id, shop_items in items.items():
+        salaries = sum(item["salary"] for item in shop_items)
+        commissions = sum(item["commission"] for item in shop_items)
+        expense = Expenses(
+            expense=f"Payroll {year}-{month:02d}",
+            amount=salaries + commissions,
+            description=f"Salaries {salaries} and commissions {commissions} for {len(shop_items)} employees",
+            created_at=now,
+            modified_at=now,
+            year=year,
+            month=month,
+            expense_account=accounts[shop_id]
+        )
+        runs[shop_id] = PayrollRun(
+            shop_id=shop_id, year=year, month=month,
+            employees=len(shop_items), salaries=salaries, commissions=commissions, total=salaries + commissions,
+            expense=expense, created_at=now
+        )
+    db.session.add_all(runs.values())
+    db.session.flush()
+    db.session.execute(insert(PayrollItem), [
+        dict(item, run_id=runs[shop_id].id) for shop_id, shop_items in items.items() for item in shop_items
+    ])
+    return list(runs.values())
+
+
+def run_payroll(year, month, shop_ids=None, chunk_size=500, progress=None):
+    """
+        Compute and record the payroll of every shop (or of shop_ids) for one month.
+        Running a month again replaces its runs and expenses.
+        :param year: Year of the period
+        :param month: Month of the period
+        :param shop_ids: Optional shop ids, defaults to every shop
+        :param chunk_size: Shops per chunk
+        :param progress: Optional callback(shops_done, total_shops)
+        :return: dict with shops, runs, employees, total paid and seconds
+    """
+    started = time.perf_counter()
+    if shop_ids is None:
+        shop_ids = [row.id for row in db.session.query(BarberShop.id).order_by(BarberShop.id)]
+    runs = employees = total = 0
+
+    for chunk_start in range(0, len(shop_ids), chunk_size):
+        chunk = shop_ids[chunk_start:chunk_start + chunk_size]
+        chunk_runs = save_chunk_payroll(chunk, year, month, compute_chunk_payroll(chunk, year, month))
+        db.session.commit()
+        runs += len(chunk_runs)
+        employees += sum(run.employees for run in chunk_runs)
+        total += sum(run.total for run in chunk_runs)
+        if progress:
+            progress(min(chunk_start + chunk_size, len(shop_ids)), len(shop_ids))
+
+    return dict(
+        shops=len(shop_ids), runs=runs, employees=employees, total=total,
+        seconds=round(time.perf_counter() - started, 2)
+    )
@@ -0,0 +1,159 @@
+import datetime
+from flask import Blueprint, jsonify, request
+from API import db
+from API.models import CommissionRate, PayrollRun, PayrollItem, Employee, Service
+from ..utils import shop_login_required
+from ..idempotency import idempotent
+from ..ratelimit import rate_limit_class
+from .jobs import run_payroll
+
+payroll_blueprint = Blueprint("payroll", __name__, url_prefix="/API/payroll")
+
+
+def serialize_rate(rate):
+    return dict(id=rate.id, serviceId=rate.service_id, employeeId=rate.employee_id, rate=rate.rate)
+
+
+def _optional_id(value):
+    # Ids may arrive as JSON strings; they are compared with integer primary keys
+    return None if value is None else int(value)
+
+
+@payroll_blueprint.route("/commission-rates/<string:public_id>", methods=["GET"])
+@shop_login_required
+def fetch_commission_rates(current_user, public_id):
+    """
+        Commission rates of the shop
+        :param current_user: Logged in shop owner
+        :param public_id: Barbershop public_id
+        :return: 401, 200
+    """
+    if current_user.public_id != public_id:
+        return jsonify(dict(message="Not allowed")), 401
+
+    rates = CommissionRate.query.filter_by(shop_id=current_user.id).order_by(CommissionRate.id).all()
+    return jsonify(dict(rates=[serialize_rate(rate) for rate in rates])), 200
+
+
+@payroll_blueprint.route("/commission-rates/<string:public_id>", methods=["PUT"])
+@shop_login_required
+def update_commission_rates(current_user, public_id):
+    """
+        Replace the commission rates of the shop.
+        Body: {"rates": [{"rate": 10}, {"serviceId": 1, "rate": 20}, {"employeeId": 2, "serviceId": 1, "rate": 25}]}
+        A rate without serviceId or employeeId applies to every service or employee.
+        :param current_user: Logged in shop owner
+        :param public_id: Barbershop public_id
+        :return: 401, 400, 404, 200
+    """
+    if current_user.public_id != public_id:
+        return jsonify(dict(message="Not allowed")), 401
+
+    data = request.get_json()
+    try:
+        rates = {
+            (_optional_id(item.get("serviceId")), _optional_id(item.get("employeeId"))): float(item["rate"])
+            for item in data["rates"]
+        }
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return jsonify(dict(message="Each rate needs a rate in percent and numeric ids")), 400
+    if len(rates) != len(data["rates"]):
+        return jsonify(dict(message="Only one rate per service and employee")), 400
+    if any(not 0 <= rate <= 100 for rate in rates.values()):
+        return jsonify(dict(message="Rates must be between 0 and 100")), 400
+
+    service_ids = {service_id for service_id, _ in rates if service_id is not None}
+    employee_ids = {employee_id for _, employee_id in rates if employee_id is not None}
+    services = {row.id for row in Service.for_shop(current_user).with_entities(Service.id).filter(Service.id.in_(service_ids))}
+    employees = {row.id for row in Employee.for_shop(current_user).with_entities(Employee.id).filter(Employee.id.in_(employee_ids))}
+    if services != service_ids or employees != employee_ids:
+        return jsonify(dict(message="Service or employee not found")), 404
+
+    CommissionRate.query.filter_by(shop_id=current_user.id).delete(synchronize_session=False)
+    db.session.add_all(
+        CommissionRate(shop_id=current_user.id, service_id=service_id, employee_id=employee_id, rate=rate)
+        for (service_id, employee_id), rate in rates.items()
+    )
+    db.session.commit()
+    return jsonify(dict(message="Commission rates updated successfully")), 200
+
+
+@payroll_blueprint.route("/run/<string:public_id>", methods=["POST"])
+@shop_login_required
+@idempotent
+def create_payroll_run(current_user, public_id):
+    """
+        Compute the payroll of a month (defaults to the current month) and record it as an expense.
+        Running a month again replaces its payroll.
+        :param current_user: Logged in shop owner
+        :param public_id: Barbershop public_id
+        :return: 401, 400, 201
+    """
+    if current_user.public_id != public_id:
+        return jsonify(dict(message="Not allowed")), 401
+
+    now = datetime.datetime.utcnow()
+    data = request.get_json(silent=True) or {}
+    try:
+        year = int(data.get("year", now.year))
+        month = int(data.get("month", now.month))
+    except (TypeError, ValueError):
+        return jsonify(dict(message="Year and month must be numbers")), 400
+    if not datetime.MINYEAR <= year < datetime.MAXYEAR:
+        return jsonify(dict(message="Invalid year")), 400
+    if not 1 <= month <= 12:
+        return jsonify(dict(message="Invalid month")), 400
+
+    result = run_payroll(year, month, shop_ids=[current_user.id])
+    return jsonify(dict(message="Payroll has been recorded", employees=result["employees"], total=result["total"])), 201
+
+
+@payroll_blueprint.route("/<string:public_id>", methods=["GET"])
+@rate_limit_class("dashboard")
+@shop_login_required
+def fetch_payroll(current_user, public_id):
+    """
+        Payroll of a month (defaults to the current month) with the pay of each employee
+        :param current_user: Logged in shop owner
+        :param public_id: Barbershop public_id
+        :return: 401, 404, 200
+    """
+    if current_user.public_id != public_id:
+        return jsonify(dict(message="Not allowed")), 401
+
+    now = datetime.datetime.utcnow()
+    year = request.args.get("year", now.year, type=int)
+    month = request.args.get("month", now.month, type=int)
+    run = PayrollRun.query.filter_by(shop_id=current_user.id, year=year, month=month).first()
+    if not run:
+        return jsonify(dict(message="No payroll for this period yet")), 404
+
+    items = (
+        db.session.query(PayrollItem, Employee.f_name, Employee.l_name)
+        .outerjoin(Employee, PayrollItem.employee_id == Employee.id)
+        .filter(PayrollItem.run_id == run.id)
+        .order_by(PayrollItem.total.desc())
+        .all()
+    )
+    return jsonify(dict(
+        year=run.year,
+        month=run.month,
+        employees=run.employees,
+        salaries=run.salaries,
+        commissions=run.commissions,
+        total=run.total,
+        expense_id=run.expense_id,
+        created_at=run.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+        items=[
+            dict(
+                employee_id=item.employee_id,
+                name=f"{f_name} {l_name}" if f_name else None,
+                salary=item.salary,
+                sales_count=item.sales_count,
+                revenue=item.revenue,
+                commission=item.commission,
+                total=item.total
+            )
+            for item, f_name, l_name in items
+        ]
+    )), 200
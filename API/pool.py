@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+        QueuePool that records how long checkouts wait for a connection.
+        Counters are per pool, i.e. per gunicorn worker.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.checkout_timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+
+def engine_options(config):
+    """
+        Build SQLALCHEMY_ENGINE_OPTIONS from the DB_* pool settings.
+        SQLite keeps Flask-SQLAlchemy's defaults since it has no server side pool to size.
+        :param config: Flask config
+        :return: dict of engine options
+    """
+    uri = config.get("SQLALCHEMY_DATABASE_URI")
+    if not uri or make_url(uri).get_backend_name() == "sqlite":
+        return {}
+
+    options = dict(
+        poolclass=InstrumentedQueuePool,
+        pool_size=config["DB_POOL_SIZE"],
+        max_overflow=config["DB_MAX_OVERFLOW"],
+        pool_timeout=config["DB_POOL_TIMEOUT"],
+        pool_recycle=config["DB_POOL_RECYCLE"],
+        pool_pre_ping=config["DB_POOL_PRE_PING"],
+    )
+    if config.get("DB_STATEMENT_TIMEOUT_MS") and make_url(uri).get_backend_name() == "postgresql":
+        options["connect_args"] = {"options": f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+
+def init_engine_options(app):
+    """
+        Merge pool settings into the app config before Flask-SQLAlchemy creates the engine
+        :param app: Flask app
+        :return: None
+    """
+    options = engine_options(app.config)
+    options.update(app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+
+def pool_metrics(engine):
+    """
+        Snapshot of the engine's connection pool for this worker
+        :param engine: SQLAlchemy engine
+        :return: dict
+    """
+    pool = engine.pool
+    metrics = dict(pool=type(pool).__name__, worker_pid=os.getpid())
+    if not isinstance(pool, QueuePool):
+        return metrics
+
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    metrics.update(
+        size=pool.size(),
+        max_overflow=pool._max_overflow,
+        checked_out=pool.checkedout(),
+        checked_in=pool.checkedin(),
+        overflow=pool.overflow(),
+        saturation=round(pool.checkedout() / capacity, 3) if capacity else 0
+    )
+    if isinstance(pool, InstrumentedQueuePool):
+        metrics.update(
+            checkouts=pool.checkouts,
+            checkout_timeouts=pool.checkout_timeouts,
+            wait_avg_ms=round(pool.wait_total / pool.checkouts * 1000, 3) if pool.checkouts else 0,
+            wait_max_ms=round(pool.wait_max * 1000, 3)
+        )
+    return metrics
+
+
+def dispose_engines(app):
+    """
+        Drop pooled connections inherited from the parent process after a fork.
+        close=False leaves the parent's sockets open for it while the child starts a fresh pool.
+        :param app: Flask app
+        :return: None
+    """
+    from API import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,109 @@
+import os
+import sys
+from collections import defaultdict
+from flask import current_app, g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class LazyLoadLimitExceeded(Exception):
+    """Raised when a request triggers more lazy loads than LAZY_LOAD_LIMIT allows"""
+
+
+def count_lazy_loads(orm_execute_state):
+    """
+        Count relationship lazy loads emitted while handling a request
+        :param orm_execute_state: ORM execution state passed by SQLAlchemy
+        :return: None
+    """
+    if not has_request_context() or not orm_execute_state.is_select:
+        return
+    if orm_execute_state.lazy_loaded_from is None:
+        return
+
+    limit = current_app.config.get("LAZY_LOAD_LIMIT")
+    if not current_app.testing or limit is None:
+        return
+
+    g.lazy_loads = g.get("lazy_loads", 0) + 1
+    if g.lazy_loads > limit:
+        raise LazyLoadLimitExceeded(
+            f"Request triggered {g.lazy_loads} lazy loads (limit {limit}). "
+            f"Last load: {orm_execute_state.lazy_loaded_from.class_.__name__}"
+        )
+
+
+def init_lazy_load_guard():
+    """
+        Register the lazy load guard. It only raises when the app is in testing mode
+        and LAZY_LOAD_LIMIT is set, so production requests are never affected.
+        :return: None
+    """
+    if not event.contains(Session, "do_orm_execute", count_lazy_loads):
+        event.listen(Session, "do_orm_execute", count_lazy_loads)
+
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter so every import is cold, like a newly spawned worker
+_STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import API
+imported = time.perf_counter()
+API.create_app()
+print(f"{(imported - start) * 1000:.3f} {(time.perf_counter() - imported) * 1000:.3f}")
+"""
+
+
+def _top_level_imports(stderr):
+    """
+        Parse python -X importtime output into the modules imported directly by the script
+        :param stderr: importtime report
+        :return: {module: (self ms, cumulative ms)}
+    """
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nesting is shown by indentation, top-level imports have a single leading space
+        if len(name) - len(name.lstrip()) == 1:
+            imports[name.strip()] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+    return imports
+
+
+def profile_startup(runs=5, top=15):
+    """
+        Measure worker cold start in fresh interpreters
+        :param runs: Number of cold starts
+        :param top: Number of slowest top-level imports returned
+        :return: Median timings in ms and the slowest imports as (module, self ms, cumulative ms)
+    """
+    import statistics
+    import subprocess
+    import_ms, create_app_ms = [], []
+    modules = defaultdict(list)
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _STARTUP_SCRIPT],
+            cwd=_PROJECT_ROOT, capture_output=True, text=True, check=True
+        )
+        imported, created = result.stdout.split()[-2:]
+        import_ms.append(float(imported))
+        create_app_ms.append(float(created))
+        for name, timings in _top_level_imports(result.stderr).items():
+            modules[name].append(timings)
+
+    breakdown = [
+        (name, statistics.median(t[0] for t in timings), statistics.median(t[1] for t in timings))
+        for name, timings in modules.items()
+    ]
+    breakdown.sort(key=lambda row: row[2], reverse=True)
+    median_import, median_create = statistics.median(import_ms), statistics.median(create_app_ms)
+    return {
+        "import_ms": round(median_import, 1),
+        "create_app_ms": round(median_create, 1),
+        "total_ms": round(median_import + median_create, 1),
+        "imports": breakdown[:top]
+    }
@@ -0,0 +1,172 @@
+import math
+import threading
+import time
+import jwt
+from flask import request, jsonify, current_app, g
+
+EXEMPT = "exempt"
+
+# Atomic token bucket for Redis: KEYS[1] bucket, ARGV capacity, refill rate per second, now
+TOKEN_BUCKET_LUA = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class MemoryBackend:
+    """
+        Token buckets held in this worker's memory. Limits apply per worker.
+        Buckets idle long enough to be full again are dropped every PRUNE_INTERVAL_SECONDS.
+    """
+    PRUNE_INTERVAL_SECONDS = 60
+
+    def __init__(self):
+        self._buckets = {}  # key -> (tokens, updated, full at)
+        self._lock = threading.Lock()
+        self._next_prune = time.monotonic() + self.PRUNE_INTERVAL_SECONDS
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def consume(self, key, capacity, rate):
+        """
+            Take one token from the bucket
+            :param key: Bucket key
+            :param capacity: Bucket size
+            :param rate: Tokens refilled per second
+            :return: (allowed, tokens left)
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_prune:
+                self._prune(now)
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        return allowed, tokens
+
+    def _prune(self, now):
+        # A full bucket behaves like a missing one
+        for key in [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+            del self._buckets[key]
+        self._next_prune = now + self.PRUNE_INTERVAL_SECONDS
+
+
+class RedisBackend:
+    """Token buckets in Redis (or any server speaking its protocol), shared by every worker"""
+
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(TOKEN_BUCKET_LUA)
+
+    def consume(self, key, capacity, rate):
+        allowed, tokens = self._script(keys=[f"ratelimit:{key}"], args=[capacity, rate, time.time()])
+        return bool(allowed), float(tokens)
+
+
+def parse_limit(limit):
+    """
+        Parse "<requests>/<seconds>" into bucket capacity and refill rate
+        :param limit: e.g. "120/60"
+        :return: (capacity, tokens per second)
+    """
+    requests_allowed, seconds = limit.split("/")
+    return int(requests_allowed), int(requests_allowed) / float(seconds)
+
+
+def rate_limit_class(name):
+    """
+        Put a route in a rate limit class (read, write, dashboard, auth or exempt).
+        Must be placed directly below the route decorator.
+        :param name: Class name from RATELIMIT_CLASSES
+        :return: decorator
+    """
+    def decorator(func):
+        func.rate_limit_class = name
+        return func
+    return decorator
+
+
+def _limit_identity():
+    """
+        The logged-in shop or employee when the request carries a valid access token,
+        otherwise the client address (the proxied one when PROXY_FIX_HOPS is set)
+        :return: str
+    """
+    from API.tokens import request_claims, ACCESS_TOKEN_TYPES
+    token = request.headers.get("x-access-token")
+    if token:
+        try:
+            claims = request_claims(token)
+        except jwt.InvalidTokenError:
+            claims = None
+        if claims and "typ" not in claims and claims.get("public_id"):
+            # Older tokens without a typ claim
+            return f"shop:{claims['public_id']}"
+        if claims and claims.get("typ") in ACCESS_TOKEN_TYPES and "uid" in claims:
+            return f"{claims['typ']}:{claims['uid']}"
+    return f"ip:{request.remote_addr}"
+
+
+def check_rate_limit():
+    view = current_app.view_functions.get(request.endpoint)
+    if view is None or request.method == "OPTIONS":
+        return None
+    limit_class = getattr(view, "rate_limit_class", "read" if request.method in ("GET", "HEAD") else "write")
+    if limit_class == EXEMPT:
+        return None
+
+    capacity, rate = parse_limit(current_app.config["RATELIMIT_CLASSES"][limit_class])
+    allowed, tokens = current_app.extensions["ratelimit"].consume(
+        f"{limit_class}:{_limit_identity()}", capacity, rate
+    )
+    reset = math.ceil((1 - tokens) / rate) if not allowed else math.ceil((capacity - tokens) / rate)
+    g.rate_limit_headers = {
+        "RateLimit-Limit": str(capacity),
+        "RateLimit-Remaining": str(int(tokens)),
+        "RateLimit-Reset": str(reset),
+    }
+    if not allowed:
+        response = jsonify(dict(message="Too many requests. Please slow down"))
+        response.status_code = 429
+        response.headers["Retry-After"] = str(reset)
+        return response
+    return None
+
+
+def add_rate_limit_headers(response):
+    for header, value in g.get("rate_limit_headers", {}).items():
+        response.headers[header] = value
+    return response
+
+
+def init_rate_limiter(app):
+    """
+        Token bucket rate limiting keyed by the logged-in shop or employee (or client address) and route class.
+        Uses Redis when RATELIMIT_STORAGE_URL is set, otherwise per-worker memory.
+        :param app: Flask app
+        :return: None
+    """
+    if not app.config["RATELIMIT_ENABLED"]:
+        return
+    storage_url = app.config.get("RATELIMIT_STORAGE_URL")
+    app.extensions["ratelimit"] = RedisBackend(storage_url) if storage_url else MemoryBackend()
+    app.before_request(check_rate_limit)
+    app.after_request(add_rate_limit_headers)
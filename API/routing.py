@@ -0,0 +1,66 @@
+import time
+from flask import g, request, has_request_context, current_app
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = "replica"
+READ_PRIMARY_COOKIE = "kinyozi_read_primary"
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def reads_from_replica():
+    """
+        Whether SELECTs in the current request may go to the read replica.
+        GET requests read from the replica unless the client mutated data within the last
+        REPLICA_STICKY_SECONDS (read-your-writes cookie), asked for X-Read-Primary,
+        or the request has already written through this session.
+        :return: bool
+    """
+    if not has_request_context() or request.method not in READ_METHODS:
+        return False
+    if "read_primary" not in g:
+        sticky_until = request.cookies.get(READ_PRIMARY_COOKIE, type=float) or 0
+        g.read_primary = sticky_until > time.time() or bool(request.headers.get("X-Read-Primary"))
+    return not g.read_primary
+
+
+class RoutingSession(Session):
+    """Session that sends SELECTs in read-only requests to the replica bind when one is configured"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and REPLICA_BIND in self._db.engines and has_request_context():
+            if self._flushing or not getattr(clause, "is_select", False):
+                # Once the request writes, keep it on the primary so it reads its own writes
+                g.read_primary = True
+            elif reads_from_replica():
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def mark_read_primary(response):
+    """
+        After a successful mutation, pin the client's reads to the primary for a few seconds
+        so it doesn't read stale data from a lagging replica.
+        :param response: Flask response
+        :return: response
+    """
+    if request.method not in READ_METHODS and response.status_code < 400:
+        sticky_seconds = current_app.config["REPLICA_STICKY_SECONDS"]
+        response.set_cookie(
+            READ_PRIMARY_COOKIE,
+            str(time.time() + sticky_seconds),
+            max_age=sticky_seconds,
+            httponly=True,
+            samesite="None",
+            secure=True
+        )
+    return response
+
+
+def init_replica_routing(app):
+    """
+        Register the read-your-writes hook when a replica bind is configured
+        :param app: Flask app
+        :return: None
+    """
+    if REPLICA_BIND in app.config.get("SQLALCHEMY_BINDS", {}):
+        app.after_request(mark_read_primary)
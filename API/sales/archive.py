@@ -0,0 +1,98 @@
+import datetime
+import time
+from sqlalchemy import insert, select, text, union
+from API import db
+from API.models import Sale, SaleArchive, Service
+
+SALE_COLUMNS = ("id", "payment_method", "description", "date_created", "year", "month", "shop_id", "service_id", "employee_id")
+
+
+def _ensure_archive_partition(year):
+    """
+        Create the cold partition for a year on Postgres
+        :param year: Sales year
+        :return: None
+    """
+    if db.engine.dialect.name != "postgresql":
+        return
+    db.session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS sales_archive_{int(year)} PARTITION OF sales_archive "
+        f"FOR VALUES FROM ({int(year)}) TO ({int(year) + 1})"
+    ))
+
+
+def archive_sales(before_year, batch_size=5000, progress=None):
+    """
+        Move sales of every year before before_year into sales_archive, in batches
+        :param before_year: First year that stays in the hot table
+        :param batch_size: Rows moved per transaction
+        :param progress: Optional callback(year, rows moved so far)
+        :return: dict with rows moved per year and seconds
+        :raises ValueError: before_year is after the current year
+    """
+    if before_year > datetime.datetime.utcnow().year:
+        raise ValueError("Sales of the current year stay in the hot table")
+    started = time.perf_counter()
+    years = [row.year for row in db.session.query(Sale.year).filter(Sale.year < before_year).distinct()]
+    moved = {}
+    for year in sorted(years):
+        _ensure_archive_partition(year)
+        moved[year] = 0
+        while True:
+            ids = [row.id for row in db.session.query(Sale.id).filter(Sale.year == year).limit(batch_size)]
+            if not ids:
+                break
+            columns = [getattr(Sale, column) for column in SALE_COLUMNS]
+            db.session.execute(
+                insert(SaleArchive).from_select(SALE_COLUMNS, select(*columns).where(Sale.id.in_(ids)))
+            )
+            Sale.query.filter(Sale.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            moved[year] += len(ids)
+            if progress:
+                progress(year, moved[year])
+    return dict(moved=moved, seconds=round(time.perf_counter() - started, 2))
+
+
+def shop_sales_years(shop_id):
+    """
+        Years with sales for the shop, hot and archived
+        :param shop_id: Barbershop id
+        :return: sorted list of years
+    """
+    years = union(
+        select(Sale.year).where(Sale.shop_id == shop_id),
+        select(SaleArchive.year).where(SaleArchive.shop_id == shop_id)
+    )
+    return sorted(row[0] for row in db.session.execute(years))
+
+
+def shop_sales(shop_id, year=None, month=None):
+    """
+        Sales of a shop with their service, newest first within each service.
+        Without a year only the hot table is read; with a year the year/month filters let
+        the planner skip other partitions and both tables are read.
+        :param shop_id: Barbershop id
+        :param year: Optional year
+        :param month: Optional month
+        :return: list of rows
+    """
+    models = (Sale,) if year is None else (Sale, SaleArchive)
+    rows = []
+    for model in models:
+        query = (
+            db.session.query(
+                model.id, model.payment_method, model.description, model.date_created,
+                model.month, model.year, Service.charges, Service.service, Service.id.label("service_id")
+            )
+            .join(Service, model.service_id == Service.id)
+            .filter(model.shop_id == shop_id)
+        )
+        if year is not None:
+            query = query.filter(model.year == year)
+        if month is not None:
+            query = query.filter(model.month == month)
+        rows.extend(query.all())
+    rows.sort(key=lambda row: row.date_created, reverse=True)
+    rows.sort(key=lambda row: row.service_id)
+    return rows
@@ -0,0 +1,126 @@
+import datetime
+from sqlalchemy import func
+from API import db
+from API.models import Sale, SaleArchive, Service
+
+BUCKETS = ("day", "week", "month")
+DEFAULT_BUCKET_COUNT = {"day": 30, "week": 12, "month": 12}
+MAX_BUCKETS = 1000
+
+
+def bucket_start(day, bucket):
+    """
+        :param day: date
+        :param bucket: day, week (starting Monday) or month
+        :return: First day of the bucket holding day
+    """
+    if bucket == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day, bucket):
+    if bucket == "week":
+        return day + datetime.timedelta(days=7)
+    if bucket == "month":
+        return (day.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return day + datetime.timedelta(days=1)
+
+
+def default_start(end, bucket):
+    """
+        :return: Start of the range covering the last DEFAULT_BUCKET_COUNT buckets up to end
+    """
+    start = bucket_start(end, bucket)
+    for _ in range(DEFAULT_BUCKET_COUNT[bucket] - 1):
+        start = bucket_start(start - datetime.timedelta(days=1), bucket)
+    return start
+
+
+def bucket_range(start, end, bucket):
+    """
+        Every bucket between start and end, so days without sales still get a slot
+        :return: list of bucket start dates
+    """
+    buckets = []
+    current = bucket_start(start, bucket)
+    while current <= end:
+        buckets.append(current)
+        current = next_bucket(current, bucket)
+    return buckets
+
+
+def _bucket_expr(column, bucket):
+    if db.engine.dialect.name == "sqlite":
+        if bucket == "week":
+            return func.date(column, "weekday 0", "-6 days")
+        if bucket == "month":
+            return func.date(column, "start of month")
+        return func.date(column)
+    return func.date_trunc(bucket, column)
+
+
+def _as_date(value):
+    # SQLite returns DATE() as a string, Postgres' date_trunc a timestamp
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value if isinstance(value, datetime.date) else datetime.date.fromisoformat(value)
+
+
+def sales_chart(shop_id, start, end, bucket="day", by_service=False):
+    """
+        Revenue and sale counts per bucket as parallel arrays, gap filled with zeros.
+        Archived years are read too when the range reaches them.
+        :param shop_id: Barbershop id
+        :param start: First day (date)
+        :param end: Last day (date), inclusive
+        :param bucket: day, week or month
+        :param by_service: Add one revenue/count series per service
+        :return: dict of columns
+    """
+    buckets = bucket_range(start, end, bucket)
+    index = {day: i for i, day in enumerate(buckets)}
+    revenue, count = [0] * len(buckets), [0] * len(buckets)
+    services = {}
+
+    for model in (Sale, SaleArchive):
+        bucket_column = _bucket_expr(model.date_created, bucket).label("bucket")
+        columns = [bucket_column, func.sum(Service.charges), func.count(model.id)]
+        group_by = [bucket_column]
+        if by_service:
+            columns += [Service.id, Service.service]
+            group_by += [Service.id, Service.service]
+        rows = (
+            db.session.query(*columns)
+            .join(Service, model.service_id == Service.id)
+            .filter(
+                model.shop_id == shop_id,
+                model.year.between(start.year, end.year),
+                model.date_created >= start,
+                model.date_created < end + datetime.timedelta(days=1)
+            )
+            .group_by(*group_by)
+            .all()
+        )
+        for row in rows:
+            i = index[_as_date(row[0])]
+            revenue[i] += row[1] or 0
+            count[i] += row[2]
+            if by_service:
+                series = services.setdefault(row[3], dict(
+                    id=row[3], service=row[4], revenue=[0] * len(buckets), count=[0] * len(buckets)
+                ))
+                series["revenue"][i] += row[1] or 0
+                series["count"][i] += row[2]
+
+    chart = dict(
+        bucket=bucket,
+        days=[day.strftime("%Y-%m-%d") for day in buckets],
+        revenue=revenue,
+        count=count
+    )
+    if by_service:
+        chart["services"] = sorted(services.values(), key=lambda series: series["service"])
+    return chart
@@ -1,15 +1,22 @@
 import datetime
+import jwt
 from flask import Blueprint, request, jsonify
 from API import db, bcrypt
-from API.models import Sale, BarberShop
-from ..utils import shop_login_required, verify_api_key
+from API.models import Sale, BarberShop, Service
+from ..utils import shop_login_required, verify_api_key, request_employee
 from ..serializer import serialize_sales
+from ..idempotency import idempotent
+from ..ratelimit import rate_limit_class
+from .archive import shop_sales, shop_sales_years
+from .charts import BUCKETS, MAX_BUCKETS, default_start, bucket_start, sales_chart
+from ..inventory.consumption import schedule_consumption
 
 sales = Blueprint("sales", __name__)
 
 
 @sales.route("/API/sales/create/<string:public_id>", methods=["POST"])
 @verify_api_key
+@idempotent
 def record_sale(public_id):
     """
         Record a new sale
@@ -21,6 +28,18 @@ def record_sale(public_id):
         return jsonify(dict(message="Barbershop doesn't exist")), 404
 
     data = request.get_json()
+    if not Service.for_shop(shop).filter_by(id=data["service"]).first():
+        return jsonify(dict(message="Service doesn't exist")), 404
+
+    # Sales recorded by a logged-in barber are attributed to them
+    try:
+        employee = request_employee()
+    except jwt.ExpiredSignatureError:
+        return jsonify(dict(message="Expired Session! Login Again")), 401
+    except jwt.InvalidTokenError:
+        return jsonify(dict(message="Invalid Token. Please Login Again")), 401
+    if employee and employee.shop_id != shop.id:
+        return jsonify(dict(message="You do not have permission to perform this action")), 401
 
     new_sale = Sale(
         payment_method=data["paymentMethod"].strip().title(),
@@ -28,18 +47,22 @@ def record_sale(public_id):
         year=datetime.datetime.utcnow().year,
         month=datetime.datetime.utcnow().month,
         service_id=data["service"],
+        employee_id=employee.id if employee else None,
         shop_id=shop.id
     )
     db.session.add(new_sale)
     db.session.commit()
+    schedule_consumption()
     return jsonify(dict(message="Sale has been recorded successfully.")), 201
 
 
 @sales.route("/API/sales/fetch/<string:public_id>", methods=["GET"])
+@rate_limit_class("dashboard")
 @shop_login_required
 def fetch_sales(current_user, public_id):
     """
-        Fetch all sales
+        Fetch the sales in the hot table, or of a single year/month (including archived years)
+        when ?year= and ?month= are given
         :param current_user: Currently logged-in user
         :param public_id: Barbershop public_id
         :return: 401, 200
@@ -47,23 +70,51 @@ def fetch_sales(current_user, public_id):
     if current_user.public_id != public_id:
         return jsonify(dict(message="You do not have permission to perform this action")), 401
 
-    shop_services = current_user.services
     all_shop_sales = []
-    all_years = [sale.year for sale in Sale.query.all()]
-    unique_years = list(set(all_years))
-    all_services = []
-    for service in shop_services:
-        service_sales = service.sales.order_by(Sale.date_created.desc())
-        all_services.append({"id": service.id, "service": service.service})
-        for sale in service_sales:
-            sale_data = serialize_sales(sale)
-            sale_data["amount"] = service.charges
-            sale_data["service"] = service.service
-            all_shop_sales.append(sale_data)
+    unique_years = shop_sales_years(current_user.id)
+    all_services = [{"id": service.id, "service": service.service} for service in current_user.services]
+    year = request.args.get("year", type=int)
+    month = request.args.get("month", type=int)
+    for sale in shop_sales(current_user.id, year=year, month=month):
+        sale_data = serialize_sales(sale)
+        sale_data["amount"] = sale.charges
+        sale_data["service"] = sale.service
+        all_shop_sales.append(sale_data)
 
     return jsonify(dict(sales=all_shop_sales, years=unique_years, services=all_services)), 200
 
 
+@sales.route("/API/sales/chart/<string:public_id>", methods=["GET"])
+@rate_limit_class("dashboard")
+@shop_login_required
+def sales_chart_data(current_user, public_id):
+    """
+        Chart-ready sales: revenue and counts per day, week or month as parallel arrays.
+        Query args: bucket=day|week|month, start/end=YYYY-MM-DD, breakdown=service
+        :param current_user: Currently logged-in user
+        :param public_id: Barbershop public_id
+        :return: 401, 400, 200
+    """
+    if current_user.public_id != public_id:
+        return jsonify(dict(message="You do not have permission to perform this action")), 401
+
+    bucket = request.args.get("bucket", "day")
+    if bucket not in BUCKETS:
+        return jsonify(dict(message=f"bucket must be one of {', '.join(BUCKETS)}")), 400
+    try:
+        end = datetime.date.fromisoformat(request.args["end"]) if "end" in request.args else datetime.datetime.utcnow().date()
+        start = datetime.date.fromisoformat(request.args["start"]) if "start" in request.args else default_start(end, bucket)
+    except ValueError:
+        return jsonify(dict(message="start and end must be dates in YYYY-MM-DD format")), 400
+    if start > end:
+        return jsonify(dict(message="start must not be after end")), 400
+    if (end - bucket_start(start, bucket)).days // {"day": 1, "week": 7, "month": 28}[bucket] >= MAX_BUCKETS:
+        return jsonify(dict(message=f"Range is limited to {MAX_BUCKETS} {bucket}s")), 400
+
+    chart = sales_chart(current_user.id, start, end, bucket, by_service=request.args.get("breakdown") == "service")
+    return jsonify(chart), 200
+
+
 @sales.route("/API/sales/delete/<int:sale_id>", methods=["DELETE"])
 @shop_login_required
 def delete_sale(current_user, sale_id):
@@ -73,10 +124,10 @@ def delete_sale(current_user, sale_id):
         :param sale_id: ID of the sale to be deleted
         :return: 404, 401, 200
     """
-    sale = Sale.query.filter_by(id=sale_id).first()
+    sale = Sale.for_shop(current_user).filter_by(id=sale_id).first()
     if not sale:
-        return jsonify(dict(message="Sale not Found")), 404
-    if current_user.public_id != sale.service.shop.public_id:
+        if not Sale.exists(sale_id):
+            return jsonify(dict(message="Sale not Found")), 404
         return jsonify(dict(message="You do not have permission to perform this action")), 401
 
     data = request.get_json()
@@ -22,6 +22,8 @@ def serialize_inventory(inventory):
         "id": fields.Integer,
         "product_name": fields.String,
         "product_level": fields.Integer,
+        "stock": fields.Float,
+        "capacity": fields.Float,
         "modified_at": fields.DateTime
     }
     return marshal(inventory, inventory_fields)
@@ -1,15 +1,18 @@
 from flask import Blueprint, request, jsonify
-from API.models import Service, BarberShop
+from API.models import Service, BarberShop, ServiceRecipe, Inventory
 from API import db, bcrypt
 import datetime
+from sqlalchemy import func
 from ..utils import shop_login_required, verify_api_key
 from ..serializer import serialize_services
+from ..idempotency import idempotent
 
 services = Blueprint('services', __name__)
 
 
 @services.route("/API/services/<string:public_id>/create-services", methods=["POST"])
 @shop_login_required
+@idempotent
 def add_services(current_user, public_id):
     """
         Add services to the barbershop
@@ -21,7 +24,9 @@ def add_services(current_user, public_id):
     data = request.get_json()
     if current_user.public_id != public_id:
         return jsonify(dict(message="You do not have permissions to access this resource")), 401
-    if data["serviceName"].strip().lower() not in [service.service.lower() for service in current_user.services]:
+    service_exists = Service.for_shop(current_user) \
+        .filter(func.lower(Service.service) == data["serviceName"].strip().lower()).first()
+    if not service_exists:
         new_service = Service(
             service=data["serviceName"].strip().title(),
             charges=data["chargeAmount"],
@@ -46,11 +51,10 @@ def update_service(current_user, service_id):
         :return: 401, 404, 200
     """
 
-    service_info = Service.query.filter_by(id=service_id).first()
+    service_info = Service.for_shop(current_user).filter_by(id=service_id).first()
     if not service_info:
-        return jsonify(dict(message="This service doesn't exist")), 404
-
-    if service_id not in [service.id for service in current_user.services]:
+        if not Service.exists(service_id):
+            return jsonify(dict(message="This service doesn't exist")), 404
         return jsonify(dict(message="You do not have permissions to access this resource")), 401
 
     data = request.get_json()
@@ -72,11 +76,10 @@ def delete_service(current_user, service_id):
         :return: 404, 401, 200
     """
 
-    service = Service.query.filter_by(id=service_id).first()
+    service = Service.for_shop(current_user).filter_by(id=service_id).first()
     if not service:
-        return jsonify(dict(message="No service to delete")), 404
-
-    if service_id not in [service.id for service in current_user.services]:
+        if not Service.exists(service_id):
+            return jsonify(dict(message="No service to delete")), 404
         return jsonify(dict(message="You do not have permissions to access this resource")), 401
     data = request.get_json()
     if not bcrypt.check_password_hash(current_user.password, data["password"].strip()):
@@ -95,3 +98,64 @@ def fetch_all_services(public_id):
     for service in shop.services.order_by(Service.modified_at.desc()):
         all_services.append(serialize_services(service))
     return jsonify(dict(services=all_services))
+
+
+@services.route("/API/service/recipe/<int:service_id>", methods=["GET"])
+@shop_login_required
+def fetch_service_recipe(current_user, service_id):
+    """
+        Inventory taken off the stock each time the service is sold
+        :param current_user: Logged in barbershop owner
+        :param service_id: Service ID
+        :return: 404, 401, 200
+    """
+    service = Service.for_shop(current_user).filter_by(id=service_id).first()
+    if not service:
+        if not Service.exists(service_id):
+            return jsonify(dict(message="This service doesn't exist")), 404
+        return jsonify(dict(message="You do not have permissions to access this resource")), 401
+
+    rows = (
+        db.session.query(ServiceRecipe.inventory_id, ServiceRecipe.amount, Inventory.product_name)
+        .join(Inventory, ServiceRecipe.inventory_id == Inventory.id)
+        .filter(ServiceRecipe.service_id == service.id)
+        .order_by(Inventory.product_name)
+        .all()
+    )
+    items = [dict(inventoryId=row.inventory_id, product=row.product_name, amount=row.amount) for row in rows]
+    return jsonify(dict(service_id=service.id, items=items)), 200
+
+
+@services.route("/API/service/recipe/<int:service_id>", methods=["PUT"])
+@shop_login_required
+def update_service_recipe(current_user, service_id):
+    """
+        Replace the recipe of a service. Body: {"items": [{"inventoryId": 1, "amount": 0.5}]}
+        :param current_user: Logged in barbershop owner
+        :param service_id: Service ID
+        :return: 404, 401, 400, 200
+    """
+    service = Service.for_shop(current_user).filter_by(id=service_id).first()
+    if not service:
+        if not Service.exists(service_id):
+            return jsonify(dict(message="This service doesn't exist")), 404
+        return jsonify(dict(message="You do not have permissions to access this resource")), 401
+
+    data = request.get_json()
+    try:
+        amounts = {int(item["inventoryId"]): float(item["amount"]) for item in data["items"]}
+    except (KeyError, TypeError, ValueError):
+        return jsonify(dict(message="Each item needs an inventoryId and an amount")), 400
+    if any(amount <= 0 for amount in amounts.values()):
+        return jsonify(dict(message="Amounts must be greater than zero")), 400
+    owned = {row.id for row in Inventory.for_shop(current_user).with_entities(Inventory.id).filter(Inventory.id.in_(amounts))}
+    if owned != set(amounts):
+        return jsonify(dict(message="Inventory Item not found")), 404
+
+    ServiceRecipe.query.filter_by(service_id=service.id).delete(synchronize_session=False)
+    db.session.add_all(
+        ServiceRecipe(service_id=service.id, inventory_id=inventory_id, amount=amount)
+        for inventory_id, amount in amounts.items()
+    )
+    db.session.commit()
+    return jsonify(dict(message="Recipe updated successfully")), 200
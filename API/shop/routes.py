@@ -1,11 +1,10 @@
 from flask import Blueprint, request, jsonify, make_response
-from API.models import BarberShop, Sale, Service, Expenses, ExpenseAccounts
+from API.models import BarberShop, Employee, Sale, Service, Expenses, ExpenseAccounts
 from API import db, bcrypt
 from API.serializer import serialize_shop, serialize_services
 import secrets
 import datetime
 import jwt
-import os
 from ..utils import (
     shop_login_required,
     send_password_reset_email,
@@ -14,12 +13,25 @@ from ..utils import (
     verify_api_key,
 )
 from sqlalchemy import func
-from collections import Counter
+from .search import search_shops, autocomplete_shops, DEFAULT_PAGE_SIZE
+from ..idempotency import idempotent
+from ..ratelimit import rate_limit_class
+from ..passwords import hash_password, verify_password
+from ..tokens import (
+    tokens,
+    issue_session,
+    rotate_refresh_token,
+    revoke_refresh_family,
+    revoke_refresh_token,
+    revoke_refresh_tokens,
+    RefreshTokenInvalid,
+)
 
 shops = Blueprint('shops', __name__)
 
 
 @shops.route("/API/shop/<string:public_id>", methods=["GET"])
+@rate_limit_class("dashboard")
 @shop_login_required
 def get_shop(current_user, public_id):
     """
@@ -62,8 +74,13 @@ def get_shop(current_user, public_id):
             unread_notifications += 1
 
     # Payment Methods
-    methods = [sale.payment_method for sale in shop.sales]
-    payment_methods = [{'method': item, 'transactions': count} for item, count in Counter(methods).items()]
+    methods = (
+        db.session.query(Sale.payment_method, func.count(Sale.id))
+        .filter(Sale.shop_id == shop.id)
+        .group_by(Sale.payment_method)
+        .all()
+    )
+    payment_methods = [{'method': item, 'transactions': count} for item, count in methods]
 
     # Expenses
     expenses_result = (
@@ -108,10 +125,13 @@ def get_shop(current_user, public_id):
     for service in shop.services:
         all_services.append(serialize_services(service))
     # Current Month Sales
-    month_sales = 0
-    for sale in shop.sales:
-        if sale.month == current_month and sale.year == current_year:
-            month_sales += sale.service.charges
+    month_sales = (
+        db.session.query(func.coalesce(func.sum(Service.charges), 0))
+        .select_from(Sale)
+        .join(Service, Sale.service_id == Service.id)
+        .filter(Sale.shop_id == shop.id, Sale.year == current_year, Sale.month == current_month)
+        .scalar()
+    )
 
     return jsonify(
         shopInfo=shop_info,
@@ -131,20 +151,44 @@ def get_shop(current_user, public_id):
 @verify_api_key
 def all_shops():
     """
-        Fetch all barbershops
+        Search barbershops by name, county and city
         :return: 200
     """
-    name = request.args.get("name", "").strip().title()
-    shops_all = BarberShop.query.filter(BarberShop.shop_name.ilike(f'%{name}%')) \
-        .order_by(BarberShop.shop_name.desc()).all()
+    limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+    offset = request.args.get("offset", 0, type=int)
+    shops_page, has_more = search_shops(
+        name=request.args.get("name", "").strip(),
+        county=request.args.get("county"),
+        city=request.args.get("city"),
+        limit=limit,
+        offset=offset
+    )
     shops_data = []
-    for shop in shops_all[:10]:
+    for shop in shops_page:
         shops_data.append(serialize_shop(shop))
-    return jsonify(dict(data=shops_data)), 200
+    return jsonify(dict(data=shops_data, offset=offset, has_more=has_more)), 200
+
+
+@shops.route("/API/shops/autocomplete", methods=["GET"])
+@verify_api_key
+def autocomplete():
+    """
+        Shop name suggestions for a prefix
+        :return: 200
+    """
+    prefix = request.args.get("prefix", "").strip()
+    if not prefix:
+        return jsonify(dict(data=[])), 200
+    suggestions = autocomplete_shops(prefix, county=request.args.get("county"), city=request.args.get("city"))
+    return jsonify(dict(data=[
+        dict(public_id=row.public_id, shop_name=row.shop_name, city=row.city, county=row.county)
+        for row in suggestions
+    ])), 200
 
 
 @shops.route("/API/create/shop", methods=["POST"])
 @verify_api_key
+@idempotent
 def shop_signup():
     """
         Create a new barbershop
@@ -156,7 +200,7 @@ def shop_signup():
     if matching_public_id_found:
         public_id = secrets.token_hex(6) + secrets.token_hex(1)
 
-    password_hash = bcrypt.generate_password_hash(data["password"].strip()).decode("utf-8")
+    password_hash = hash_password(data["password"].strip())
 
     # Check email  doesn't exist
     email_exists = BarberShop.query.filter_by(email=data["email"]).first()
@@ -178,6 +222,7 @@ def shop_signup():
 
 
 @shops.route("/API/login/shop", methods=["POST"])
+@rate_limit_class("auth")
 @verify_api_key
 def shop_login():
     """
@@ -190,16 +235,8 @@ def shop_login():
         return make_response("Could not verify", 401, {"WWW.Authenticate": "Basic realm=Login required!"})
     if not shop:
         return make_response("Incorrect Email", 404, {"WWW.Authenticate": "Basic realm=Login required!"})
-    if bcrypt.check_password_hash(shop.password, auth.password.strip()):
-        token = jwt.encode(
-            {
-                "public_id": shop.public_id,
-                "exp": datetime.datetime.utcnow() + datetime.timedelta(minutes=120)
-            },
-            os.environ.get('SECRET'),
-            algorithm="HS256"
-        )
-        return jsonify({"Token": token, "public_id": shop.public_id}), 200
+    if verify_password(shop, auth.password.strip()):
+        return jsonify(dict(issue_session(shop, "shop"), public_id=shop.public_id)), 200
     else:
         return make_response("Incorrect password", 401, {"WWW.Authenticate": "Basic realm=Login required!"})
 
@@ -235,31 +272,59 @@ def verify_login_token():
     """
     data = request.get_json()
     try:
-        payload = jwt.decode(
-            data["token"],
-            os.environ.get('SECRET'),
-            algorithms=['HS256']
-        )
+        tokens().decode(data["token"])
+    except jwt.ExpiredSignatureError:
+        return jsonify(dict(message="Token has expired")), 401
+    except jwt.InvalidTokenError:
+        return jsonify(dict(message="Invalid token")), 401
+    return jsonify(dict(message="Valid Token")), 200
 
-        # Extract the expiration time from the payload
-        expiration_time = payload['exp']
 
-        # Get the current time
-        current_time = datetime.datetime.utcnow().timestamp()
+@shops.route("/API/token/refresh", methods=["POST"])
+@verify_api_key
+def refresh_session():
+    """
+        Swap a refresh token for a new access token and refresh token. No password check.
+        :return: 401, 200
+    """
+    data = request.get_json()
+    try:
+        refresh_token, replaced = rotate_refresh_token(data["refreshToken"])
+    except RefreshTokenInvalid as e:
+        return jsonify(dict(message=str(e))), 401
 
-        # Check if the token has expired
-        if current_time > expiration_time:
-            return jsonify(dict(message="Token has expired")), 401
-        else:
-            return jsonify(dict(message="Valid Token")), 200
+    user = db.session.get(BarberShop if replaced.subject_type == "shop" else Employee, replaced.subject_id)
+    if not user:
+        revoke_refresh_family(replaced.family)
+        return jsonify(dict(message="Account no longer exists")), 401
+    return jsonify(dict(issue_session(user, replaced.subject_type, refresh_token), public_id=user.public_id)), 200
 
-    except jwt.ExpiredSignatureError:
-        return jsonify(dict(message="Token has expired")), 401
+
+@shops.route("/API/token/revoke", methods=["POST"])
+@rate_limit_class("auth")
+@verify_api_key
+def revoke_token():
+    """
+        Log out: revoke the shop or employee access token sent in x-access-token.
+        Body (optional): refreshToken to log this device out, allDevices to log out everywhere
+        :return: 401, 200
+    """
+    try:
+        claims = tokens().decode(request.headers.get("x-access-token", ""))
     except jwt.InvalidTokenError:
         return jsonify(dict(message="Invalid token")), 401
+    tokens().revoke(claims)
+
+    data = request.get_json(silent=True) or {}
+    if data.get("allDevices") and "uid" in claims:
+        revoke_refresh_tokens(claims["typ"], claims["uid"])
+    elif data.get("refreshToken"):
+        revoke_refresh_token(data["refreshToken"])
+    return jsonify(dict(message="Logged out")), 200
 
 
 @shops.route("/API/shop/password/request-reset", methods=["POST"])
+@rate_limit_class("auth")
 @verify_api_key
 def request_password_reset():
     """
@@ -282,6 +347,7 @@ def request_password_reset():
 
 
 @shops.route("/API/shop/password/reset/<string:reset_token>", methods=["POST"])
+@rate_limit_class("auth")
 @verify_api_key
 def reset_password(reset_token):
     """
@@ -294,13 +360,15 @@ def reset_password(reset_token):
         return jsonify(dict(message="Token invalid or expired")), 403
 
     data = request.get_json()
-    password_hash = bcrypt.generate_password_hash(data["password"].strip()).decode("utf-8")
+    password_hash = hash_password(data["password"].strip())
     shop.password = password_hash
     db.session.commit()
+    revoke_refresh_tokens("shop", shop.id)
     return jsonify(dict(message="Password reset successful")), 200
 
 
 @shops.route("/API/shop/password/change/<string:public_id>", methods=["POST"])
+@rate_limit_class("auth")
 @shop_login_required
 def change_password(current_user, public_id):
     """
@@ -314,8 +382,9 @@ def change_password(current_user, public_id):
 
     data = request.get_json()
     if bcrypt.check_password_hash(current_user.password, data["oldPassword"].strip()):
-        current_user.password = bcrypt.generate_password_hash(data["newPassword"].strip()).decode("utf-8")
+        current_user.password = hash_password(data["newPassword"].strip())
         db.session.commit()
+        revoke_refresh_tokens("shop", current_user.id)
         return jsonify(dict(message="Password Change Successful")), 200
     else:
         return jsonify(dict(message="Old password is Incorrect")), 401
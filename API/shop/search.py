@@ -0,0 +1,61 @@
+from API.models import BarberShop
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+AUTOCOMPLETE_SIZE = 8
+
+
+def _escape_like(term):
+    """
+        Escape LIKE wildcards in user input
+        :param term: Raw search term
+        :return: Escaped term
+    """
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_shops(name="", county=None, city=None, limit=DEFAULT_PAGE_SIZE, offset=0):
+    """
+        Search barbershops by name with optional county/city filters.
+        On Postgres the substring match is served by the pg_trgm GIN index on shop_name,
+        filters by the (county, city) index. LIMIT/OFFSET are applied in SQL and one extra
+        row is fetched to tell whether another page exists without a COUNT. id breaks ties between
+        shops with the same name so pages never skip or repeat a shop.
+        :param name: Part of the shop name
+        :param county: County filter
+        :param city: City filter
+        :param limit: Page size
+        :param offset: Rows to skip
+        :return: (list of BarberShop, has_more)
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    offset = max(0, offset)
+
+    query = BarberShop.query
+    if name:
+        query = query.filter(BarberShop.shop_name.ilike(f"%{_escape_like(name)}%", escape="\\"))
+    if county:
+        query = query.filter(BarberShop.county == county.strip().title())
+    if city:
+        query = query.filter(BarberShop.city == city.strip().title())
+
+    results = query.order_by(BarberShop.shop_name.desc(), BarberShop.id.desc()).limit(limit + 1).offset(offset).all()
+    return results[:limit], len(results) > limit
+
+
+def autocomplete_shops(prefix, county=None, city=None):
+    """
+        Shop name suggestions starting with the prefix
+        :param prefix: Start of the shop name
+        :param county: County filter
+        :param city: City filter
+        :return: list of BarberShop rows (id, public_id, shop_name, city, county)
+    """
+    query = BarberShop.query.with_entities(
+        BarberShop.id, BarberShop.public_id, BarberShop.shop_name, BarberShop.city, BarberShop.county
+    ).filter(BarberShop.shop_name.ilike(f"{_escape_like(prefix)}%", escape="\\"))
+    if county:
+        query = query.filter(BarberShop.county == county.strip().title())
+    if city:
+        query = query.filter(BarberShop.city == city.strip().title())
+    return query.order_by(BarberShop.shop_name, BarberShop.id).limit(AUTOCOMPLETE_SIZE).all()
@@ -0,0 +1,363 @@
+import datetime
+import hashlib
+import secrets
+import threading
+import time
+import uuid
+import jwt
+from flask import current_app, jsonify, abort, make_response, request, g
+from API import db
+from API.models import RevokedToken, RefreshToken
+
+ALGORITHM = "HS256"
+# typ claims of access tokens; reset links and other tokens never log in
+ACCESS_TOKEN_TYPES = ("shop", "employee")
+# Concurrent refreshes from one device can race; a replaced token reused within this window is rejected
+# without treating it as stolen
+REFRESH_REUSE_GRACE_SECONDS = 10
+
+
+class TokenRevoked(jwt.InvalidTokenError):
+    """Raised for a token whose jti is on the revocation list"""
+
+
+class RefreshTokenInvalid(Exception):
+    """Raised when a refresh token is unknown, expired, revoked or already used"""
+
+
+class RevocationList:
+    """
+        Revoked token ids held in memory for O(1) checks.
+        The revoked_tokens table is the source of truth; each worker pulls rows revoked by
+        other workers at most every sync_seconds and forgets entries once they expire.
+    """
+
+    def __init__(self, sync_seconds):
+        self._revoked = {}  # jti -> expiry
+        self._lock = threading.Lock()
+        self._sync_seconds = sync_seconds
+        self._next_sync = 0.0
+        self._synced_until = None
+
+    def __contains__(self, jti):
+        if time.monotonic() >= self._next_sync:
+            self.sync()
+        return jti in self._revoked
+
+    def __len__(self):
+        return len(self._revoked)
+
+    def add(self, jti, expires_at):
+        if not db.session.get(RevokedToken, jti):
+            db.session.add(RevokedToken(jti=jti, expires_at=expires_at))
+            db.session.commit()
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def sync(self):
+        """
+            Load revocations made since the last sync and drop expired ones
+            :return: None
+        """
+        with self._lock:
+            if time.monotonic() < self._next_sync:
+                return
+            self._next_sync = time.monotonic() + self._sync_seconds
+        now = datetime.datetime.utcnow()
+        query = RevokedToken.query.with_entities(
+            RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at
+        ).filter(RevokedToken.expires_at > now)
+        if self._synced_until:
+            query = query.filter(RevokedToken.revoked_at >= self._synced_until)
+        rows = query.all()
+        with self._lock:
+            for row in rows:
+                self._revoked[row.jti] = row.expires_at
+                self._synced_until = max(self._synced_until or row.revoked_at, row.revoked_at)
+            for jti in [jti for jti, expires_at in self._revoked.items() if expires_at <= now]:
+                del self._revoked[jti]
+
+
+class TokenService:
+    """
+        Issues and verifies JWTs. Keys are parsed once per worker and picked by the kid header,
+        so several keys can be valid while the signing key is rotated.
+    """
+
+    def __init__(self, keys, active_kid, legacy_key, access_minutes, revocations):
+        self._keys = keys
+        self._active_kid = active_kid
+        self._legacy_key = legacy_key  # Verifies tokens issued before kids were added
+        self.access_minutes = access_minutes
+        self.revocations = revocations
+
+    def issue(self, claims, minutes=None):
+        """
+            :param claims: Token claims
+            :param minutes: Lifetime, defaults to ACCESS_TOKEN_MINUTES
+            :return: Signed token
+        """
+        now = datetime.datetime.utcnow()
+        payload = dict(
+            claims,
+            jti=uuid.uuid4().hex,
+            iat=now,
+            exp=now + datetime.timedelta(minutes=minutes or self.access_minutes)
+        )
+        return jwt.encode(payload, self._keys[self._active_kid], algorithm=ALGORITHM, headers={"kid": self._active_kid})
+
+    def issue_for_shop(self, shop):
+        return self.issue(dict(typ="shop", uid=shop.id, public_id=shop.public_id, role="owner"))
+
+    def issue_for_employee(self, employee):
+        return self.issue(dict(
+            typ="employee", uid=employee.id, public_id=employee.public_id, role=employee.role, shop=employee.shop_id
+        ))
+
+    def decode(self, token):
+        """
+            Verify signature, expiry and revocation
+            :param token: JWT
+            :return: claims
+            :raises jwt.InvalidTokenError: (ExpiredSignatureError, TokenRevoked, ...)
+        """
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self._keys.get(kid) if kid else self._legacy_key
+        if not key:
+            raise jwt.InvalidTokenError("Unknown signing key")
+        claims = jwt.decode(token, key, algorithms=[ALGORITHM])
+        if "jti" in claims and claims["jti"] in self.revocations:
+            raise TokenRevoked("Token has been revoked")
+        return claims
+
+    def revoke(self, claims):
+        """
+            Revoke a decoded token until it expires. Tokens issued before jti was added can't be revoked.
+            :param claims: Decoded claims
+            :return: bool revoked
+        """
+        if "jti" not in claims:
+            return False
+        self.revocations.add(claims["jti"], datetime.datetime.utcfromtimestamp(claims["exp"]))
+        return True
+
+
+class TokenUser:
+    """
+        Logged-in shop or employee built from the token claims.
+        id, public_id and role need no query; any other attribute loads the row once and delegates to it.
+    """
+    __slots__ = ("_model", "_instance", "id", "public_id", "role", "claims")
+
+    def __init__(self, model, claims):
+        object.__setattr__(self, "_model", model)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "id", claims["uid"])
+        object.__setattr__(self, "public_id", claims["public_id"])
+        object.__setattr__(self, "role", claims.get("role"))
+        object.__setattr__(self, "claims", claims)
+
+    @property
+    def instance(self):
+        if self._instance is None:
+            instance = db.session.get(self._model, self.id)
+            if instance is None:
+                abort(make_response(jsonify(dict(message="Account no longer exists. Please Login Again")), 401))
+            object.__setattr__(self, "_instance", instance)
+        return self._instance
+
+    def __getattr__(self, name):
+        return getattr(self.instance, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.instance, name, value)
+
+    def __repr__(self):
+        return f"TokenUser({self._model.__name__}, {self.public_id})"
+
+
+def tokens():
+    """
+        :return: TokenService of the current app
+    """
+    return current_app.extensions["tokens"]
+
+
+def request_claims(token):
+    """
+        Decode a token once per request; the rate limiter and the login decorators share the result
+        :param token: JWT
+        :return: claims
+        :raises jwt.InvalidTokenError:
+    """
+    cached = g.get("token_claims")
+    if cached is None or cached[0] != token:
+        try:
+            cached = (token, tokens().decode(token), None)
+        except jwt.InvalidTokenError as error:
+            cached = (token, None, error)
+        g.token_claims = cached
+    if cached[2] is not None:
+        raise cached[2]
+    return cached[1]
+
+
+def _hash(raw_token):
+    return hashlib.sha256(raw_token.encode("utf-8")).hexdigest()
+
+
+def request_device():
+    """
+        :return: Device label for the refresh token, from X-Device-Id or the user agent
+    """
+    return (request.headers.get("X-Device-Id") or request.user_agent.string or "")[:100] or None
+
+
+def issue_refresh_token(subject_type, subject_id, device=None, family=None):
+    """
+        Create a refresh token. Only its hash is stored.
+        :param subject_type: shop or employee
+        :param subject_id: BarberShop or Employee id
+        :param device: Device label
+        :param family: Family of the token being replaced, new family on login
+        :return: Raw token for the client
+    """
+    raw_token = secrets.token_urlsafe(32)
+    db.session.add(RefreshToken(
+        token_hash=_hash(raw_token),
+        family=family or uuid.uuid4().hex,
+        subject_type=subject_type,
+        subject_id=subject_id,
+        device=device,
+        expires_at=datetime.datetime.utcnow() + datetime.timedelta(days=current_app.config["REFRESH_TOKEN_DAYS"])
+    ))
+    db.session.commit()
+    return raw_token
+
+
+def issue_session(user, subject_type, refresh_token=None):
+    """
+        Access and refresh token pair returned by the login and refresh routes
+        :param user: BarberShop or Employee
+        :param subject_type: shop or employee
+        :param refresh_token: Rotated refresh token, a new family is started when omitted
+        :return: dict
+    """
+    service = tokens()
+    access_token = service.issue_for_shop(user) if subject_type == "shop" else service.issue_for_employee(user)
+    return dict(
+        Token=access_token,
+        RefreshToken=refresh_token or issue_refresh_token(subject_type, user.id, request_device()),
+        expires_in=service.access_minutes * 60
+    )
+
+
+def rotate_refresh_token(raw_token):
+    """
+        Replace a refresh token with a new one in the same family.
+        A replaced token presented again outside the grace window revokes its family.
+        :param raw_token: Refresh token from the client
+        :return: (new raw token, row of the replaced token)
+        :raises RefreshTokenInvalid:
+    """
+    now = datetime.datetime.utcnow()
+    row = RefreshToken.query.filter_by(token_hash=_hash(raw_token)).first()
+    if not row or row.expires_at <= now:
+        raise RefreshTokenInvalid("Refresh token invalid or expired")
+
+    claimed = RefreshToken.query.filter_by(id=row.id, revoked_at=None).update(dict(revoked_at=now))
+    if not claimed:
+        db.session.refresh(row)
+        if (now - row.revoked_at).total_seconds() > REFRESH_REUSE_GRACE_SECONDS:
+            revoke_refresh_family(row.family)
+        db.session.commit()
+        raise RefreshTokenInvalid("Refresh token already used")
+    return issue_refresh_token(row.subject_type, row.subject_id, row.device, family=row.family), row
+
+
+def revoke_refresh_family(family):
+    """
+        Log a device out: revoke every refresh token descending from one login
+        :param family: Token family
+        :return: None
+    """
+    RefreshToken.query.filter_by(family=family, revoked_at=None).update(dict(revoked_at=datetime.datetime.utcnow()))
+    db.session.commit()
+
+
+def revoke_refresh_token(raw_token):
+    """
+        :param raw_token: Refresh token from the client
+        :return: bool found
+    """
+    row = RefreshToken.query.filter_by(token_hash=_hash(raw_token)).first()
+    if row:
+        revoke_refresh_family(row.family)
+    return row is not None
+
+
+def revoke_refresh_tokens(subject_type, subject_id):
+    """
+        Log a shop or employee out of every device
+        :return: None
+    """
+    RefreshToken.query.filter_by(subject_type=subject_type, subject_id=subject_id, revoked_at=None) \
+        .update(dict(revoked_at=datetime.datetime.utcnow()))
+    db.session.commit()
+
+
+def purge_expired_refresh_tokens(batch_size=1000):
+    """
+        Delete expired refresh tokens
+        :param batch_size: Rows deleted per statement
+        :return: Number of deleted rows
+    """
+    deleted = 0
+    while True:
+        ids = [
+            row.id for row in RefreshToken.query.with_entities(RefreshToken.id)
+            .filter(RefreshToken.expires_at <= datetime.datetime.utcnow()).limit(batch_size)
+        ]
+        if not ids:
+            return deleted
+        RefreshToken.query.filter(RefreshToken.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+
+
+def purge_expired_revocations(batch_size=1000):
+    """
+        Delete revocations of tokens that have expired anyway
+        :param batch_size: Rows deleted per statement
+        :return: Number of deleted rows
+    """
+    deleted = 0
+    while True:
+        jtis = [
+            row.jti for row in RevokedToken.query.with_entities(RevokedToken.jti)
+            .filter(RevokedToken.expires_at <= datetime.datetime.utcnow()).limit(batch_size)
+        ]
+        if not jtis:
+            return deleted
+        RevokedToken.query.filter(RevokedToken.jti.in_(jtis)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(jtis)
+
+
+def init_tokens(app):
+    """
+        Build the token service. Without KINYOZI_JWT_KEYS, SECRET signs tokens under the "default" kid.
+        :param app: Flask app
+        :return: None
+    """
+    keys = app.config["JWT_KEYS"] or {"default": app.config["SECRET_KEY"]}
+    active_kid = app.config["JWT_ACTIVE_KID"] or next(iter(keys))
+    if active_kid not in keys:
+        raise RuntimeError(f"JWT_ACTIVE_KID {active_kid} is not in JWT_KEYS")
+    app.extensions["tokens"] = TokenService(
+        keys,
+        active_kid,
+        app.config["SECRET_KEY"],
+        app.config["ACCESS_TOKEN_MINUTES"],
+        RevocationList(app.config["TOKEN_REVOCATION_SYNC_SECONDS"])
+    )
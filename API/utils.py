@@ -1,13 +1,10 @@
 import jwt
 import os
-from API import db
-from API.models import BarberShop, Employee, BarbersAppToken
-from flask import request, jsonify, render_template
+from API.models import BarberShop, Employee
+from flask import request, jsonify, render_template, current_app
 from functools import wraps
-import datetime
-from flask_mail import Message
-from API import mail
-import requests
+from API.integrations import get_mail
+from API.tokens import tokens, TokenUser, request_claims
 
 
 def verify_token(token):
@@ -17,7 +14,9 @@ def verify_token(token):
     :return: The BarberShop object
     """
     try:
-        data = jwt.decode(token, os.environ.get('SECRET'), algorithms=["HS256"])
+        data = tokens().decode(token)
+        if data.get("typ") != "reset":
+            return None
         shop = BarberShop.query.filter_by(public_id=data["public_id"]).first()
     except jwt.ExpiredSignatureError:
         return None
@@ -27,6 +26,41 @@ def verify_token(token):
         return shop
 
 
+def token_user(token, model, typ):
+    """
+        Resolve an access token to the logged-in shop or employee.
+        Typed tokens must be of the expected type and are trusted without a query;
+        only older tokens without a typ claim are looked up by public_id.
+        :param token: JWT
+        :param model: BarberShop or Employee
+        :param typ: Expected token type, "shop" or "employee"
+        :return: TokenUser, model instance or None
+        :raises jwt.InvalidTokenError:
+    """
+    data = request_claims(token)
+    if "typ" not in data:
+        return model.query.filter_by(public_id=data["public_id"]).first()
+    if data["typ"] != typ or "uid" not in data:
+        raise jwt.InvalidTokenError(f"Not a {typ} token")
+    return TokenUser(model, data)
+
+
+def request_employee():
+    """
+        Employee logged in on the current request, for routes that don't require a login.
+        Shop tokens are ignored.
+        :return: TokenUser, Employee or None
+        :raises jwt.InvalidTokenError:
+    """
+    token = request.headers.get("x-access-token")
+    if not token:
+        return None
+    data = request_claims(token)
+    if "typ" not in data:
+        return Employee.query.filter_by(public_id=data["public_id"]).first()
+    return TokenUser(Employee, data) if data["typ"] == "employee" and "uid" in data else None
+
+
 def shop_login_required(f):
     """
         Check is logged in
@@ -51,13 +85,12 @@ def shop_login_required(f):
         if not token:
             return jsonify({"message": "Token is missing"}), 401
         try:
-            data = jwt.decode(token, os.environ.get('SECRET'), algorithms=["HS256"])
-            current_user = BarberShop.query.filter_by(public_id=data["public_id"]).first()
+            current_user = token_user(token, BarberShop, "shop")
         except jwt.ExpiredSignatureError:
             return jsonify({"message": "Expired Session! Login Again"}), 401
         except jwt.InvalidTokenError:
             return jsonify({"message": "Invalid Token. Please Login Again"}), 401
-        return f(current_user, *args, **kwargs)
+        return current_app.ensure_sync(f)(current_user, *args, **kwargs)
     return decorated
 
 
@@ -80,8 +113,7 @@ def employee_login_required(func):
         if not token:
             return jsonify({"message": "Token is missing"}), 401
         try:
-            data = jwt.decode(token, os.environ.get('SECRET'), algorithms=["HS256"])
-            current_user = Employee.query.filter_by(public_id=data["public_id"]).first()
+            current_user = token_user(token, Employee, "employee")
         except jwt.ExpiredSignatureError:
             return jsonify({"message": "Expired Session! Login Again"}), 401
         except jwt.InvalidTokenError:
@@ -115,9 +147,10 @@ def send_password_reset_email(recipient, reset_url, name):
         :param name: Barbershop name
         :return: None
     """
+    from flask_mail import Message
     message = Message("My Kinyozi App password reset", sender="communication@mykinyozi.com", recipients=[recipient])
     message.html = render_template("reset.html", name=name, url=reset_url)
-    mail.send(message)
+    get_mail().send(message)
 
 
 def generate_reset_token(public_id):
@@ -126,15 +159,7 @@ def generate_reset_token(public_id):
     :param public_id: Public id of the user resetting their password
     :return: signed token
     """
-    reset_token = jwt.encode(
-        {
-            "public_id": public_id,
-            "exp": datetime.datetime.utcnow() + datetime.timedelta(minutes=30)
-        },
-        os.environ.get('SECRET'),
-        algorithm="HS256"
-    )
-    return reset_token
+    return tokens().issue(dict(typ="reset", public_id=public_id), minutes=30)
 
 
 def send_low_inventory_email(recipient, inventory_name, shop_name, level):
@@ -152,13 +177,14 @@ def send_low_inventory_email(recipient, inventory_name, shop_name, level):
         "3": "NORMAL"
     }
 
+    from flask_mail import Message
     message = Message(
         f"KINYOZI APP ALERT: PRODUCT RUNNING {levels[level]}",
         sender="communication@mykinyozi.com",
         recipients=[recipient]
     )
     message.html = render_template("inventory.html", name=shop_name, inventory=inventory_name, level=levels[level])
-    mail.send(message)
+    get_mail().send(message)
 
 
 def send_employee_created_email(recipient, name, url, shop_name):
@@ -171,64 +197,11 @@ def send_employee_created_email(recipient, name, url, shop_name):
         :param shop_name: Name of the Barber shop the employee belongs
         :return: None
     """
+    from flask_mail import Message
     message = Message(
         f"{shop_name.upper()} sign up.",
         sender="communication@mykinyozi.com",
         recipients=[recipient]
     )
     message.html = render_template("create_employee_email.html", name=name, url=url, shop_name=shop_name)
-    mail.send(message)
-
-
-def fetch_token_from_mobile_app():
-    """
-        Fetch the authentication token from the mobile app backend
-        :return: jwt token
-    """
-    url = r"https://app.mykinyozi.com/api/auth/login"
-    data = {
-        "email": os.environ.get("KINYOZI_MOBILE_EMAIL"),
-        "password": os.environ.get("KINYOZI_MOBILE_PASSWORD")
-    }
-    response = requests.post(url=url, json=data)
-    token = response.json().get("token")
-    return token
-
-
-def auth_mobile_app():
-    """
-        Authentication to access the data from the app
-        :return: JWT Token
-    """
-
-    bearer_token = BarbersAppToken.query.filter_by(name="bearer_token").first()
-    if not bearer_token:
-        # If no token, authenticate the app and save the token to db
-        token = fetch_token_from_mobile_app()
-        save_token = BarbersAppToken(name="bearer_token", token=token)
-        db.session.add(save_token)
-        db.session.commit()
-        return token
-    else:
-        # Check if the token is expired, if expired/invalid, load new one
-        try:
-            decoded_token = jwt.decode(
-                bearer_token.token,
-                os.environ.get("JWT_SECRET"),
-                algorithms=["HS256"],
-                options={"verify_signature": False}
-            )
-            current_timestamp = datetime.datetime.utcnow()
-            token_expiry = decoded_token.get('exp')
-            # Generate new token if previous one is expired.
-            if current_timestamp > datetime.datetime.utcfromtimestamp(token_expiry):
-                token = fetch_token_from_mobile_app()
-                bearer_token.token = token
-                db.session.commit()
-                return token
-        except jwt.exceptions.InvalidTokenError:
-            token = fetch_token_from_mobile_app()
-            bearer_token.token = token
-            db.session.commit()
-            return token
-    return bearer_token.token
+    get_mail().send(message)
@@ -0,0 +1,60 @@
+# Production serving profile. Loaded automatically by `gunicorn run:app` from the project root.
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', 8000)}")
+
+# "gthread" suits this I/O bound API (database, mail, mobile app calls) and is required by the mobile app
+# proxy routes: each upstream call holds a worker thread, so with "sync" a slow call blocks the whole process.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 4 if worker_class == "gthread" else 1))
+
+# Build the app once in the master so imports and app state are shared copy-on-write by the workers.
+# Preloading makes lazy imports pointless, so the master imports every integration up front.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1").lower() in ("1", "true", "yes")
+if preload_app:
+    os.environ.setdefault("KINYOZI_LAZY_INTEGRATIONS", "0")
+
+# Recycle workers to bound memory growth; jitter stops them all restarting at the same moment
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    """
+        Warn when the mobile app concurrency cap cannot keep threads free for other routes
+        :param server: gunicorn arbiter
+        :return: None
+    """
+    from API.config import Config
+    if worker_class != "gthread":
+        server.log.warning(
+            "Worker class %s serves one request per process: mobile app calls block it. Use gthread.", worker_class
+        )
+    elif Config.MOBILE_APP_MAX_CONCURRENCY >= threads:
+        server.log.warning(
+            "KINYOZI_MOBILE_MAX_CONCURRENCY (%s) is not below GUNICORN_THREADS (%s): mobile app calls can hold "
+            "every thread of a worker", Config.MOBILE_APP_MAX_CONCURRENCY, threads
+        )
+
+
+def post_fork(server, worker):
+    """
+        Give each worker its own database connections instead of the ones opened in the master
+        :param server: gunicorn arbiter
+        :param worker: forked worker
+        :return: None
+    """
+    if server.cfg.preload_app:
+        from API.pool import dispose_engines
+        dispose_engines(server.app.wsgi())
+        server.log.info("Worker %s: disposed inherited database connections", worker.pid)
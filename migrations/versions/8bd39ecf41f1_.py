@@ -0,0 +1,33 @@
+"""shop search indexes
+
+Revision ID: 8bd39ecf41f1
+Revises: d40bd98fb2be
+Create Date: 2026-10-19 10:04:18.552907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8bd39ecf41f1'
+down_revision = 'd40bd98fb2be'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.batch_alter_table('barbershops', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_barbershops_shop_name_trgm', ['shop_name'], unique=False,
+            postgresql_using='gin', postgresql_ops={'shop_name': 'gin_trgm_ops'}
+        )
+        batch_op.create_index('ix_barbershops_county_city', ['county', 'city'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('barbershops', schema=None) as batch_op:
+        batch_op.drop_index('ix_barbershops_county_city')
+        batch_op.drop_index('ix_barbershops_shop_name_trgm')
@@ -4,4 +4,5 @@ app = create_app()
 if __name__ == '__main__':
     # with app.app_context():
     #     db.create_all()
+    # Development server only. Production runs `gunicorn run:app` with gunicorn.conf.py
     app.run(debug=False)
@@ -0,0 +1,5 @@
+import os
+
+# Read by API.config at import time
+os.environ.setdefault("SECRET", "test-secret")
+os.environ.setdefault("API_KEY", "test-key")
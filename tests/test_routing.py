@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import select
+from API import create_app, db
+from API.config import Config
+from API.models import BarberShop
+from API.routing import READ_PRIMARY_COOKIE
+
+HEADERS = {"X-API-KEY": "test-key"}
+
+
+def add_shop(engine, name):
+    with engine.begin() as connection:
+        connection.execute(BarberShop.__table__.insert(), dict(
+            public_id=name.lower(), shop_name=name, email=f"{name.lower()}@example.com", password="x",
+            phone="1", county="Nairobi", city="Nairobi"
+        ))
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        SQLALCHEMY_BINDS = {"replica": f"sqlite:///{tmp_path / 'replica.db'}"}
+        RATELIMIT_ENABLED = False
+        INVENTORY_CONSUMPTION_ASYNC = False
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines["replica"])
+        # Different rows on each side show which database answered
+        add_shop(db.engines[None], "Primary")
+        add_shop(db.engines["replica"], "Replica")
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def shop_names(response):
+    return [shop["shop_name"] for shop in response.get_json()["data"]]
+
+
+def test_get_reads_from_replica(client):
+    assert shop_names(client.get("/API/shops/all", headers=HEADERS)) == ["Replica"]
+
+
+def test_read_primary_header(client):
+    response = client.get("/API/shops/all", headers={**HEADERS, "X-Read-Primary": "1"})
+    assert shop_names(response) == ["Primary"]
+
+
+def test_mutation_sets_sticky_cookie(client):
+    response = client.post("/API/create/shop", headers=HEADERS, json=dict(
+        password="pw", name="New Cuts", email="new@example.com", phone="1", county="Nairobi", city="Nairobi"
+    ))
+    assert response.status_code == 201
+    assert READ_PRIMARY_COOKIE in response.headers["Set-Cookie"]
+
+    cookie = client.get_cookie(READ_PRIMARY_COOKIE)
+    response = client.get("/API/shops/all", headers={**HEADERS, "Cookie": f"{READ_PRIMARY_COOKIE}={cookie.value}"})
+    assert sorted(shop_names(response)) == ["New Cuts", "Primary"]
+
+
+def test_expired_sticky_cookie_reads_from_replica(client):
+    response = client.get("/API/shops/all", headers={**HEADERS, "Cookie": f"{READ_PRIMARY_COOKIE}=1"})
+    assert shop_names(response) == ["Replica"]
+
+
+def test_reads_after_flush_stay_on_primary(app):
+    query = select(BarberShop.shop_name)
+    with app.test_request_context("/API/shops/all", method="GET"):
+        assert db.session.get_bind(clause=query) is db.engines["replica"]
+
+        shop = db.session.scalars(select(BarberShop).filter_by(public_id="primary")).first()
+        assert shop is None  # Only the primary has it, the first read went to the replica
+        db.session.add(BarberShop(
+            public_id="flushed", shop_name="Flushed", email="flushed@example.com", password="x",
+            phone="1", county="Nairobi", city="Nairobi"
+        ))
+        db.session.flush()
+
+        assert db.session.get_bind(clause=query) is db.engines[None]
+        assert sorted(db.session.scalars(query)) == ["Flushed", "Primary"]
+        db.session.rollback()
+
+
+def test_non_get_requests_use_primary(app):
+    with app.test_request_context("/API/shops/all", method="POST"):
+        assert db.session.get_bind(clause=select(BarberShop.id)) is db.engines[None]